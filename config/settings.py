@@ -11,3 +11,13 @@ time_slots = [
     'WED-2:00', 'WED-2:45', 'THU-2:00', 'THU-2:45'
 ]
 
+
+# solution cache (core/solution_cache.py)
+CACHE_DB_PATH = "solution_cache.db"
+CACHE_MAX_ENTRIES = 64
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# SQLite database (models/database.py)
+DB_PATH = "timetable.db"
+DB_CACHE_SIZE_KB = 64 * 1024
+DB_MMAP_SIZE = 256 * 1024 * 1024
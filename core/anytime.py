@@ -0,0 +1,191 @@
+import time
+
+from core.csp_solver import select_unassigned_variable, order_domain_values, forward_checking, unassign
+from core.scoring import score_assignment
+
+
+class ProgressEvent:
+    """
+        Snapshot of an anytime search.
+            status: "running", "solved", "infeasible", "timeout", "node_limit" or "cancelled"
+            restarts: runs restarted by solve_with_restarts before this one
+            best_partial: the deepest assignment found so far (the full timetable once solved)
+            score: soft constraint penalty of best_partial (lower is better)
+    """
+
+    def __init__(self, status, assigned, total, nodes, elapsed, best_partial, score, restarts=0):
+        self.status = status
+        self.assigned = assigned
+        self.total = total
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.best_partial = best_partial
+        self.score = score
+        self.restarts = restarts
+
+    @property
+    def done(self) -> bool:
+        return self.status != "running"
+
+    def __repr__(self):
+        return (f"ProgressEvent({self.status}, {self.assigned}/{self.total} assigned, "
+                f"nodes={self.nodes}, score={self.score}, {self.elapsed:.2f}s)")
+
+
+_EXHAUSTED = object()
+
+
+def solve_anytime(csp, time_budget: float = None, node_budget: int = None, report_every: int = 500,
+                  should_stop=None, fixed: dict = None):
+    """
+        Iterative version of backtrack() (MRV, LCV and forward checking) that can be interrupted.
+
+        Yields a ProgressEvent every `report_every` nodes and a final event (event.done is True)
+        when the search is solved, proven infeasible, out of budget or stopped by should_stop().
+        The final event holds the best timetable found so far.
+
+        fixed: values of variables that are not searched (e.g. the part of a timetable kept by core/lns.py),
+               they are propagated first and are part of every reported assignment.
+
+        The CSP domains are restored before returning unless the search solved the problem.
+    """
+    start = time.perf_counter()
+    total = len(csp.variables)
+    assignment = dict(fixed or {})
+    best = dict(assignment)
+    nodes = 0
+
+    # each frame: [variable, iterator over its ordered values, domains saved before the current value]
+    stack = []
+
+    def event(status):
+        return ProgressEvent(status, len(assignment), total, nodes, time.perf_counter() - start,
+                             dict(best), score_assignment(best, csp))
+
+    def push_next_variable():
+        var = select_unassigned_variable(assignment, csp)
+        stack.append([var, iter(order_domain_values(var, assignment, csp)), None])
+
+    def undo(frame):
+        if frame[2] is not None:
+            csp.domains.update(frame[2])
+            unassign(csp, frame[0].name, assignment)
+            frame[2] = None
+
+    if csp.occupancy is not None:
+        # a previous search may have left its sessions in the grid, the fixed ones are added back below.
+        csp.occupancy.sync({})
+
+    # domains pruned by the fixed values, restored with the search frames.
+    fixed_trail = {}
+    if fixed:
+        variables = {var.name: var for var in csp.variables}
+        for name, value in fixed.items():
+            if not forward_checking(csp, variables[name], value, assignment, fixed_trail):
+                csp.domains.update(fixed_trail)
+                yield event("infeasible")
+                return
+
+    if len(assignment) == total:
+        yield event("solved")
+        return
+
+    push_next_variable()
+    status = "infeasible"
+    while stack:
+        if time_budget is not None and time.perf_counter() - start >= time_budget:
+            status = "timeout"
+            break
+        if node_budget is not None and nodes >= node_budget:
+            status = "node_limit"
+            break
+        if should_stop is not None and should_stop():
+            status = "cancelled"
+            break
+
+        frame = stack[-1]
+        undo(frame)
+
+        value = next(frame[1], _EXHAUSTED)
+        if value is _EXHAUSTED:
+            stack.pop()
+            continue
+
+        var = frame[0]
+        nodes += 1
+        frame[2] = {}
+        assignment[var.name] = value
+
+        if forward_checking(csp, var, value, assignment, frame[2]):
+            if len(assignment) > len(best):
+                best = dict(assignment)
+            if len(assignment) == total:
+                status = "solved"
+                break
+            push_next_variable()
+
+        if nodes % report_every == 0:
+            yield event("running")
+
+    final = event(status)
+    if status != "solved":
+        while stack:
+            undo(stack.pop())
+        csp.domains.update(fixed_trail)
+
+    yield final
+
+
+def solve_with_budget(csp, time_budget: float = None, node_budget: int = None, on_progress=None,
+                      fixed: dict = None):
+    """
+        Run solve_anytime to the end and return its final ProgressEvent.
+            on_progress(event) is called for every intermediate event.
+    """
+    for event in solve_anytime(csp, time_budget, node_budget, fixed=fixed):
+        if event.done:
+            return event
+        if on_progress is not None:
+            on_progress(event)
+
+
+def solve_with_restarts(csp, time_budget: float = None, node_budget: int = None, ordering: str = "dom/wdeg",
+                        first_cutoff: int = 100, growth: float = 1.5, on_progress=None):
+    """
+        Restarted search: each run stops after `cutoff` nodes and the next one starts from scratch with a
+        cutoff `growth` times bigger, until solved, proven infeasible or out of budget.
+            the constraint weights learned by dom/wdeg carry over from run to run, so every restart starts
+            with the variables of the hardest constraints (with "mrv" every run would be the same search).
+        Returns the final ProgressEvent, nodes and elapsed cover every run.
+    """
+    start = time.perf_counter()
+    cutoff = first_cutoff
+    nodes = 0
+    restarts = 0
+    best = None
+
+    # the ordering is only for these runs: the caller's CSP gets its own back.
+    previous_ordering = csp.variable_ordering
+    csp.variable_ordering = ordering
+    try:
+        while True:
+            time_left = None if time_budget is None else max(0.0, time_budget - (time.perf_counter() - start))
+            budget = cutoff if node_budget is None else min(cutoff, node_budget - nodes)
+            final = solve_with_budget(csp, time_left, budget, on_progress)
+            nodes += final.nodes
+            if best is None or final.assigned > best.assigned:
+                best = final
+
+            out_of_nodes = node_budget is not None and nodes >= node_budget
+            if final.status != "node_limit" or out_of_nodes:
+                status = final.status
+                break
+            cutoff = int(cutoff * growth) + 1
+            restarts += 1
+    finally:
+        csp.variable_ordering = previous_ordering
+
+    if status != "solved":
+        final = best
+    return ProgressEvent(status, final.assigned, final.total, nodes, time.perf_counter() - start,
+                         final.best_partial, final.score, restarts)
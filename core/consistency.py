@@ -0,0 +1,289 @@
+"""
+    Optional preprocessing stronger than AC-3, run after apply_ac3 and before the search.
+
+        singleton arc consistency (SAC): every value is tried alone (the variable's domain set to it) and
+            removed when AC-3 + the global constraints then wipe out a domain.
+        restricted path consistency (RPC) on the high degree variables: a value whose support on an arc is
+            unique is removed when a third variable linked to both ends has no value compatible with the two.
+
+    Both only remove values that can't be in any solution, stop at their time cap (the values not checked yet
+    are kept) and return a ConsistencyReport with the domain sizes, so the time spent can be compared with the
+    search time it saves:
+
+        reports = preprocess(csp, ("sac", "rpc"), time_limit=10)
+        print(reports[0])      # values before / after AC-3 / after the pass, probes made and seconds
+"""
+import time
+from collections import defaultdict, deque
+
+from core.csp_solver import apply_ac3, arc_key, propagate_arcs
+
+
+class ConsistencyReport:
+    """
+        values_before: values in the domains before the pass, values_ac3: after its AC-3 step,
+        values_after: after the pass. consistent is False when the pass proved that no solution exists.
+    """
+
+    def __init__(self, method: str, values_before: int, values_ac3: int, values_after: int, consistent: bool,
+                 timed_out: bool, checks: int, elapsed: float):
+        self.method = method
+        self.values_before = values_before
+        self.values_ac3 = values_ac3
+        self.values_after = values_after
+        self.consistent = consistent
+        self.timed_out = timed_out
+        self.checks = checks
+        self.elapsed = elapsed
+
+    @property
+    def removed(self) -> int:
+        """Values removed on top of AC-3."""
+        return self.values_ac3 - self.values_after
+
+    @property
+    def shrink(self) -> float:
+        return self.removed / self.values_ac3 if self.values_ac3 else 0.0
+
+    def __repr__(self):
+        status = "" if self.consistent else ", inconsistent"
+        status += ", timed out" if self.timed_out else ""
+        unit = "probes" if self.method == "sac" else "values checked"
+        return (f"ConsistencyReport({self.method}: {self.values_before} -> {self.values_ac3} -> "
+                f"{self.values_after} values (-{self.shrink:.1%}), {self.checks} {unit}, {self.elapsed:.2f}s"
+                f"{status})")
+
+    def to_dict(self) -> dict:
+        return {"method": self.method, "values_before": self.values_before, "values_ac3": self.values_ac3,
+                "values_after": self.values_after, "removed": self.removed, "consistent": self.consistent,
+                "timed_out": self.timed_out, "checks": self.checks, "seconds": round(self.elapsed, 3)}
+
+
+def domain_values(csp) -> int:
+    return sum(len(csp.domains[var.name]) for var in csp.variables)
+
+
+def _arcs_into(csp, name) -> list:
+    return [(xk.name, name) for xk in csp.neighbor_vars[name]]
+
+
+def _revise_at(csp, xi, xj, slot) -> bool:
+    """revise() when the domain of xj is left with a single timeslot: only the values of xi at it can be removed."""
+    constraints = csp.arc_constraints[(xi, xj)]
+    others = csp.domains[xj]
+    domain = csp.domains[xi]
+    new_domain = [val for val in domain
+                  if val[2] != slot or any(all(fn(val, other) for fn in constraints) for other in others)]
+    if len(new_domain) == len(domain):
+        return False
+    csp.domains[xi] = new_domain
+    return True
+
+
+def _propagate_from(csp, name, changed: set) -> bool:
+    """
+        Propagate a reduction of the domain of `name`: AC-3 on the binary arcs, then the global constraints of the
+        reduced variables (the other ones are still at their fixpoint), until nothing changes.
+            the binary constraints of core/csp_builder.py only forbid two sessions at the same timeslot, so a
+            domain spanning two timeslots supports every value of its neighbours: only the arcs into the
+            domains left with a single timeslot are revised.
+            changed receives the names of the variables whose domain was reduced.
+    """
+    queue = deque([name])
+    queued = {name}
+    pending = {name}
+    while queue:
+        while queue:
+            xj = queue.popleft()
+            queued.discard(xj)
+            domain = csp.domains[xj]
+            slot = domain[0][2]
+            if any(value[2] != slot for value in domain):
+                continue
+            for xk in csp.neighbor_vars[xj]:
+                xi = xk.name
+                if _revise_at(csp, xi, xj, slot):
+                    if not csp.domains[xi]:
+                        csp.constraint_weights[arc_key(xi, xj)] += 1
+                        return False
+                    changed.add(xi)
+                    pending.add(xi)
+                    if xi not in queued:
+                        queue.append(xi)
+                        queued.add(xi)
+
+        constraints = dict.fromkeys(c for x in pending for c in csp.globals_of.get(x, ()))
+        pending = set()
+        for constraint in constraints:
+            if not constraint.propagate(csp, changed=pending) or not all(csp.domains[x] for x in pending):
+                csp.constraint_weights[constraint] += 1
+                return False
+        changed |= pending
+        for x in pending:
+            if x not in queued:
+                queue.append(x)
+                queued.add(x)
+    return True
+
+
+def singleton_arc_consistency(csp, time_limit: float = None, names: list = None) -> ConsistencyReport:
+    """
+        Make the domains singleton arc consistent (SAC-1 with a queue of variables).
+            names: the variables to probe (default all), time_limit: seconds, None = no cap.
+
+        Incremental bookkeeping: a successful probe of x only depends on the domains of the variables it
+        reduced and of their neighbours, so when a removal changes the domain of y only the variables whose
+        probes watched y are probed again. With global constraints every probe watches every variable.
+        The failed probes count in csp.constraint_weights like search failures (dom/wdeg starts from them).
+    """
+    start = time.perf_counter()
+    deadline = start + time_limit if time_limit is not None else None
+    values_before = domain_values(csp)
+    if not apply_ac3(csp):
+        return ConsistencyReport("sac", values_before, 0, 0, False, False, 0, time.perf_counter() - start)
+    values_ac3 = domain_values(csp)
+
+    queue = deque(var.name for var in csp.variables) if names is None else deque(names)
+    queued = set(queue)
+    watchers = defaultdict(set)       # watchers[y] = variables whose probes depend on the domain of y
+    watch_all = bool(csp.global_constraints)
+    probed = set()
+    consistent, timed_out, probes = True, False, 0
+
+    while queue and consistent and not timed_out:
+        x = queue.popleft()
+        queued.discard(x)
+        base = dict(csp.domains)
+        kept, reduced = [], {x}
+        for i, value in enumerate(base[x]):
+            if deadline is not None and time.perf_counter() > deadline:
+                timed_out = True
+                kept.extend(base[x][i:])
+                break
+            probes += 1
+            csp.domains[x] = [value]
+            touched = {x}
+            ok = _propagate_from(csp, x, touched)
+            for name in touched:
+                csp.domains[name] = base[name]
+            if ok:
+                kept.append(value)
+                reduced |= touched
+
+        probed.add(x)
+        if not watch_all:
+            for name in reduced:
+                watchers[name].add(x)
+                for neighbor in csp.neighbor_vars[name]:
+                    watchers[neighbor.name].add(x)
+
+        if len(kept) == len(base[x]):
+            continue
+        csp.domains[x] = kept
+        changed = {x}
+        if not kept or not _propagate_from(csp, x, changed):
+            consistent = False
+            break
+        stale = probed if watch_all else {w for name in changed for w in watchers.get(name, ())}
+        for name in stale:
+            if name not in queued:
+                queue.append(name)
+                queued.add(name)
+
+    return ConsistencyReport("sac", values_before, values_ac3, domain_values(csp) if consistent else 0,
+                             consistent, timed_out, probes, time.perf_counter() - start)
+
+
+def _path_supported(csp, x, value, neighbor_sets) -> bool:
+    """RPC of one value: AC on every arc, and the unique supports extend to the common neighbours."""
+    domains = csp.domains
+    arcs = csp.arc_constraints
+    for y in neighbor_sets[x]:
+        fns = arcs[(x, y)]
+        supports = []
+        for other in domains[y]:
+            if all(fn(value, other) for fn in fns):
+                supports.append(other)
+                if len(supports) > 1:
+                    break
+        if not supports:
+            return False
+        if len(supports) > 1:
+            continue
+
+        support = supports[0]
+        for z in neighbor_sets[x] & neighbor_sets[y]:
+            xz, yz = arcs[(x, z)], arcs[(y, z)]
+            if not any(all(fn(value, c) for fn in xz) and all(fn(support, c) for fn in yz) for c in domains[z]):
+                return False
+    return True
+
+
+def restricted_path_consistency(csp, time_limit: float = None, min_degree: int = None) -> ConsistencyReport:
+    """
+        Make the domains of the high degree variables restricted path consistent.
+            min_degree: the variables checked have at least this many neighbours (default: the mean degree),
+                        the low degree ones rarely have a value RPC removes and AC-3 doesn't.
+            time_limit: seconds, None = no cap.
+        A variable is checked again when the domain of one of its neighbours (or its own) is reduced.
+        Only the binary arcs are used: with the global constraint model the pass is its AC-3 step.
+    """
+    start = time.perf_counter()
+    deadline = start + time_limit if time_limit is not None else None
+    values_before = domain_values(csp)
+    if not apply_ac3(csp):
+        return ConsistencyReport("rpc", values_before, 0, 0, False, False, 0, time.perf_counter() - start)
+    values_ac3 = domain_values(csp)
+
+    if min_degree is None:
+        min_degree = csp.graph_stats()["mean_degree"]
+    neighbor_sets = {name: {n.name for n in nbrs} for name, nbrs in csp.neighbor_vars.items()}
+    targets = {var.name for var in csp.variables if len(neighbor_sets[var.name]) >= min_degree}
+
+    queue = deque(var.name for var in csp.variables if var.name in targets)
+    queued = set(queue)
+    consistent, timed_out, checks = True, False, 0
+
+    while queue and not timed_out:
+        x = queue.popleft()
+        queued.discard(x)
+        domain = csp.domains[x]
+        kept = []
+        for i, value in enumerate(domain):
+            if deadline is not None and time.perf_counter() > deadline:
+                timed_out = True
+                kept.extend(domain[i:])
+                break
+            checks += 1
+            if _path_supported(csp, x, value, neighbor_sets):
+                kept.append(value)
+
+        if len(kept) == len(domain):
+            continue
+        csp.domains[x] = kept
+        changed = {x}
+        if not kept or not propagate_arcs(csp, _arcs_into(csp, x), changed):
+            consistent = False
+            break
+        for name in changed:
+            for other in neighbor_sets[name] | {name}:
+                if other in targets and other not in queued:
+                    queue.append(other)
+                    queued.add(other)
+
+    return ConsistencyReport("rpc", values_before, values_ac3, domain_values(csp) if consistent else 0,
+                             consistent, timed_out, checks, time.perf_counter() - start)
+
+
+PASSES = {"sac": singleton_arc_consistency, "rpc": restricted_path_consistency}
+
+
+def preprocess(csp, passes=("sac",), time_limit: float = None) -> list:
+    """Run the passes (names of PASSES) in order, each with its own time cap, until one proves inconsistency."""
+    reports = []
+    for name in passes:
+        report = PASSES[name](csp, time_limit)
+        reports.append(report)
+        if not report.consistent:
+            break
+    return reports
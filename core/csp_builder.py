@@ -0,0 +1,305 @@
+import math
+from collections import defaultdict
+
+from config.settings import time_slots as default_time_slots
+from core.csp_solver import Variable, CSP
+from core.global_constraints import AllDifferent, Capacity
+from core.lazy_domain import LazyDomain, domain_resources
+
+
+# course type -> room type the sessions have to be held in
+ROOM_TYPE_FOR_COURSE = {
+    "lecture": "Lecture",
+    "lab": "Lab",
+    "tutorial": "Tutorial",
+    "japanese": "Tutorial",
+}
+
+
+"""
+    Constraint functions.
+        values are (room_id, instructor_id, timeslot) tuples.
+        they are plain module level functions (not lambdas) so a CSP can be pickled and sent to worker processes.
+"""
+def different_room_slot(a, b):
+    return not (a[0] == b[0] and a[2] == b[2])
+
+
+def different_instructor_slot(a, b):
+    return not (a[1] == b[1] and a[2] == b[2])
+
+
+def different_slot(a, b):
+    return a[2] != b[2]
+
+
+# type tags of the constraint functions (core/profiler.py).
+different_room_slot.constraint_type = "room"
+different_instructor_slot.constraint_type = "instructor"
+different_slot.constraint_type = "students"
+
+
+"""
+    Key functions of the global constraints (module level for the same reason).
+"""
+def room_slot_key(value):
+    return value[0], value[2]
+
+
+def instructor_slot_key(value):
+    return value[1], value[2]
+
+
+def slot_key(value):
+    return value[2]
+
+
+def room_key(value):
+    return value[0]
+
+
+def instructor_key(value):
+    return value[1]
+
+
+def section_group(level, section: int) -> int:
+    """Return the (1-based) lecture group a (1-based) section belongs to."""
+    if level.sections <= 0 or level.groups <= 0:
+        return 1
+    return (section - 1) * level.groups // level.sections + 1
+
+
+def students_overlap(a: Variable, b: Variable, levels: dict) -> bool:
+    """
+        Two sessions share students if they are for the same level and:
+            - they are for the same group / section, or
+            - one is a lecture group and the other is a section inside this group.
+    """
+    if a.level_id != b.level_id:
+        return False
+    if a.group == b.group:
+        return True
+
+    level = levels[a.level_id]
+    kinds = {a.group[0], b.group[0]}
+    if kinds != {"G", "S"}:
+        return False
+
+    lecture, section = (a, b) if a.group[0] == "G" else (b, a)
+    return section_group(level, int(section.group[1:])) == int(lecture.group[1:])
+
+
+def group_student_units(group: str, level) -> set:
+    """
+        The smallest groups of students attending a session of `group`.
+            a section -> itself, a lecture group -> every section of the group
+            (or the group itself when the level has no sections in it).
+    """
+    if group[0] == "S":
+        return {group}
+
+    sections = {f"S{s}" for s in range(1, level.sections + 1) if section_group(level, s) == int(group[1:])}
+    return sections or {group}
+
+
+def student_units(var: Variable, level) -> set:
+    return group_student_units(var.group, level)
+
+
+def session_units(course, level):
+    """
+        Return the (group label, students per session) units a course needs for a level.
+            lectures are taught per group, everything else per section.
+    """
+    if course.type.lower() == "lecture":
+        size = math.ceil(level.students_count / level.groups) if level.groups else level.students_count
+        return [(f"G{g}", size) for g in range(1, level.groups + 1)]
+
+    return [(f"S{s}", level.max_members_per_section) for s in range(1, level.sections + 1)]
+
+
+def course_instructor_ids(course, instructors: dict) -> list:
+    """
+        Instructors who can take the sessions of a course.
+            prefer the ones chosen by Instructor.map_instructors_to_courses,
+            fall back to every qualified instructor.
+    """
+    assigned = [iid for iid, inst in instructors.items() if course.name in inst.assigned_courses]
+    if assigned:
+        return sorted(assigned)
+
+    qualified = [iid for iid in course.course_instructors if iid in instructors]
+    if not qualified:
+        qualified = [iid for iid, inst in instructors.items() if inst.is_qualified_for(course.code)]
+    return sorted(qualified)
+
+
+def build_csp(courses: list, levels: list, instructors: list, rooms: list, slots: list[str] = None,
+              use_globals: bool = False, occupancy: bool = True, lazy: bool = False):
+    """
+        Build the timetable CSP from the model objects.
+
+        Variables: one per session (course, level, group/section, session_index).
+        Domains:   (room_id, instructor_id, timeslot) with the room type and capacity fitting the session.
+        Constraints:
+            - sessions sharing students can't be in the same timeslot.
+            - a room holds one session per timeslot.
+            - an instructor teaches one session per timeslot.
+
+        Graduation courses are skipped since they don't need a room or an instructor.
+
+        use_globals: model the three rules with AllDifferent / Capacity propagators instead of pairwise
+                     binary constraints (far fewer arcs, earlier failures on tight instances).
+        occupancy: attach an OccupancyGrid (core/occupancy.py), forward checking and LCV then work on the grid
+                   cells instead of calling the constraint functions.
+        lazy: LazyDomain domains (see build_variables), for instances too big to list every value up front.
+    """
+    variables, domains = build_variables(courses, levels, instructors, rooms, slots, lazy)
+    levels_m = {level.id: level for level in levels}
+
+    if not use_globals:
+        csp = CSP(variables, domains, build_constraints(variables, domains, levels_m))
+    else:
+        csp = CSP(variables, domains, {var.name: [] for var in variables})
+        for constraint in build_global_constraints(variables, domains, levels_m, courses, rooms, slots):
+            csp.add_global(constraint)
+
+    if occupancy:
+        from core.occupancy import OccupancyGrid
+        csp.occupancy = OccupancyGrid.for_csp(variables, domains, levels_m, slots,
+                                              sorted(room.id for room in rooms),
+                                              sorted(instructor.instructor_id for instructor in instructors))
+    return csp
+
+
+def build_global_constraints(variables: list, domains: dict, levels_m: dict, courses: list, rooms: list,
+                             slots: list[str] = None) -> list:
+    """
+        The global constraint form of the timetable rules:
+            - AllDifferent on (room, timeslot) and on (instructor, timeslot) over every session.
+            - AllDifferent on the timeslot for every group of students.
+            - Capacity: a room / an instructor has at most len(slots) sessions a week,
+                        and a room type can't hold more sessions in a timeslot than it has rooms.
+    """
+    slots = default_time_slots if slots is None else slots
+    names = [var.name for var in variables]
+    constraints = [
+        AllDifferent(names, room_slot_key, "room_clash", domains),
+        AllDifferent(names, instructor_slot_key, "instructor_clash", domains),
+        Capacity(names, room_key, len(slots), "room_week"),
+        Capacity(names, instructor_key, len(slots), "instructor_week"),
+    ]
+
+    students = defaultdict(list)
+    for var in variables:
+        for unit in student_units(var, levels_m[var.level_id]):
+            students[(var.level_id, unit)].append(var.name)
+    for (level_id, unit), members in sorted(students.items()):
+        if len(members) > 1:
+            constraints.append(AllDifferent(members, slot_key, f"students_{level_id}_{unit}", domains))
+
+    course_types = {course.code: ROOM_TYPE_FOR_COURSE.get(course.type.lower()) for course in courses}
+    by_type = defaultdict(list)
+    for var in variables:
+        by_type[course_types[var.course_id]].append(var.name)
+    for room_type, members in sorted(by_type.items()):
+        rooms_count = sum(1 for room in rooms if room.type == room_type)
+        constraints.append(Capacity(members, slot_key, rooms_count, f"rooms_{room_type}"))
+
+    return constraints
+
+
+def build_variables(courses: list, levels: list, instructors: list, rooms: list, slots: list[str] = None,
+                    lazy: bool = False):
+    """
+        Create the session variables and their domains, returns (variables, domains).
+            lazy: the domains are LazyDomain objects (rooms x instructors x timeslots, core/lazy_domain.py), one
+                  shared by the sessions of a group, instead of the list of every value.
+    """
+    slots = list(default_time_slots if slots is None else slots)
+    levels_m = {level.id: level for level in levels}
+    instructors_m = {instructor.instructor_id: instructor for instructor in instructors}
+
+    variables = []
+    domains = {}
+    # one tuple object per distinct (room, instructor, timeslot), shared by every domain holding it.
+    interned = {}
+    for course in sorted(courses, key=lambda c: c.code):
+        room_type = ROOM_TYPE_FOR_COURSE.get(course.type.lower())
+        if room_type is None:
+            continue
+
+        course_instructors = course_instructor_ids(course, instructors_m)
+        for level_id in sorted(course.course_levels):
+            level = levels_m.get(level_id)
+            if level is None:
+                continue
+
+            for group, size in session_units(course, level):
+                fitting_rooms = sorted(r.id for r in rooms if r.type == room_type and r.capacity >= size)
+                if lazy:
+                    domain = LazyDomain(fitting_rooms, course_instructors, slots)
+                    for i in range(int(course.time_slots)):
+                        var = Variable(f"{course.code}_{level_id}_{group}_{i}", course.code, level_id, i, group)
+                        variables.append(var)
+                        domains[var.name] = domain
+                    continue
+
+                values = [interned.setdefault((room_id, iid, slot), (room_id, iid, slot))
+                          for slot in slots
+                          for room_id in fitting_rooms
+                          for iid in course_instructors]
+
+                for i in range(int(course.time_slots)):
+                    var = Variable(f"{course.code}_{level_id}_{group}_{i}", course.code, level_id, i, group)
+                    variables.append(var)
+                    domains[var.name] = list(values)
+
+    return variables, domains
+
+
+def build_constraints(variables: list, domains: dict, levels_m: dict, link_rooms: bool = True) -> dict:
+    """
+        Link every pair of sessions that can clash.
+            only pairs sharing a level, a possible room or a possible instructor get a constraint,
+            this keeps the graph sparse between unrelated departments.
+            link_rooms=False leaves the room clashes out (the rooms are chosen later, see core/two_phase.py).
+    """
+    by_level = defaultdict(list)
+    by_room = defaultdict(set)
+    by_instructor = defaultdict(set)
+    for idx, var in enumerate(variables):
+        by_level[var.level_id].append(idx)
+        domain_rooms, domain_instructors = domain_resources(domains[var.name])
+        for room_id in domain_rooms:
+            by_room[room_id].add(idx)
+        for iid in domain_instructors:
+            by_instructor[iid].add(idx)
+
+    pair_fns = defaultdict(list)
+    for members in by_level.values():
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                if students_overlap(variables[i], variables[j], levels_m):
+                    pair_fns[(i, j)].append(different_slot)
+
+    indexes = [(by_room, different_room_slot)] if link_rooms else []
+    indexes.append((by_instructor, different_instructor_slot))
+    for index, fn in indexes:
+        for members in index.values():
+            members = sorted(members)
+            for x, i in enumerate(members):
+                for j in members[x + 1:]:
+                    fns = pair_fns[(i, j)]
+                    # different_slot already covers room and instructor clashes.
+                    if different_slot not in fns and fn not in fns:
+                        fns.append(fn)
+
+    constraints = {var.name: [] for var in variables}
+    for (i, j), fns in sorted(pair_fns.items()):
+        a, b = variables[i], variables[j]
+        for fn in fns:
+            constraints[a.name].append((b, fn))
+            constraints[b.name].append((a, fn))
+
+    return constraints
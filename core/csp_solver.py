@@ -1,15 +1,21 @@
 import random
-from collections import defaultdict, deque
+import time
+from collections import Counter, defaultdict, deque
+from collections.abc import MutableMapping
+
+from core.lazy_domain import LazyDomain
 
 
 class Variable:
     # Represents a single timetable session (course instance)
+    __slots__ = ("name", "course_id", "level_id", "session_index", "group")
 
-    def __init__(self, name, course_id, level_id, session_index):
+    def __init__(self, name, course_id, level_id, session_index, group=None):
         self.name = name  
         self.course_id = course_id
         self.level_id = level_id
         self.session_index = session_index
+        self.group = group                    # "G<n>" for lecture groups, "S<n>" for sections
 
     def __repr__(self):
         return f"Var({self.name})"
@@ -20,36 +26,286 @@ class CSP:
 
     def __init__(self, variables, domains, constraints):
         self.variables = variables            # list of Variable
-        self.domains = domains                # dict[var.name] = list of possible (room, instructor, timeslot)
+        self.domains = domains                # dict[var.name] = list (or LazyDomain) of (room, instructor, timeslot)
         self.constraints = constraints        # dict[var.name] = list of (other_var, constraint_fn)
+        self.value_hints = {}                 # dict[var.name] = value to try first (warm start)
+        self.global_constraints = []          # AllDifferent / Capacity propagators (core/global_constraints.py)
+        self.globals_of = {}                  # dict[var.name] = list of the global constraints on the variable
+        self.variable_ordering = "mrv"        # "mrv" or "dom/wdeg" (see select_unassigned_variable)
+        self.constraint_weights = Counter()   # failures per arc (arc_key) or global constraint, for dom/wdeg
+        self.occupancy = None                 # OccupancyGrid of the assigned sessions (core/occupancy.py)
+        self.profiler = None                  # ConstraintProfiler while profiling (core/profiler.py)
+        self.index_constraints()
+
+    def add_global(self, constraint):
+        """Register a global constraint next to the binary ones."""
+        self.global_constraints.append(constraint)
+        for name in constraint.variables:
+            self.globals_of.setdefault(name, []).append(constraint)
+
+    def index_constraints(self):
+        """
+            Build the frozen adjacency once, call it again after changing self.constraints.
+                index[var.name]              -> integer id of the variable
+                neighbor_vars[var.name]      -> tuple of the neighbor variables
+                neighbor_ids[i]              -> tuple of the integer ids of the neighbors of variable i
+                arc_constraints[(xi, xj)]    -> tuple of constraint_fn between xi and xj
+        """
+        self.index = {var.name: i for i, var in enumerate(self.variables)}
+        self.arc_constraints = {}
+        neighbor_vars = {}
+        for var in self.variables:
+            nbrs = {}
+            for other, fn in self.constraints.get(var.name, []):
+                nbrs.setdefault(other.name, other)
+                self.arc_constraints.setdefault((var.name, other.name), []).append(fn)
+            neighbor_vars[var.name] = tuple(nbrs.values())
+
+        self.arc_constraints = {arc: tuple(fns) for arc, fns in self.arc_constraints.items()}
+        self.neighbor_vars = neighbor_vars
+        self.neighbor_ids = [tuple(self.index[n.name] for n in neighbor_vars[var.name]) for var in self.variables]
+
+    def fork(self):
+        """Copy-on-write copy of the CSP for a what-if scenario, see CSPFork."""
+        return CSPFork(self)
 
     def neighbors(self, var):
-        """Return list of neighboring variables connected by constraints."""
-        return [v for v, _ in self.constraints.get(var.name, [])]
+        """Return the neighboring variables connected by constraints (each one once)."""
+        return self.neighbor_vars.get(var.name, ())
+
+    def degree(self, var) -> int:
+        return len(self.neighbor_vars.get(var.name, ()))
+
+    def graph_stats(self) -> dict:
+        """Size, degree, density and connected components of the constraint graph."""
+        n = len(self.variables)
+        degrees = [len(ids) for ids in self.neighbor_ids]
+        edges = sum(degrees) // 2
+
+        # connected components with an iterative DFS over the integer adjacency.
+        seen = [False] * n
+        components = 0
+        for start in range(n):
+            if seen[start]:
+                continue
+            components += 1
+            seen[start] = True
+            stack = [start]
+            while stack:
+                for j in self.neighbor_ids[stack.pop()]:
+                    if not seen[j]:
+                        seen[j] = True
+                        stack.append(j)
+
+        return {
+            "variables": n,
+            "edges": edges,
+            "density": 2 * edges / (n * (n - 1)) if n > 1 else 0.0,
+            "max_degree": max(degrees, default=0),
+            "mean_degree": sum(degrees) / n if n else 0.0,
+            "components": components,
+        }
+
+
+class ForkDomains(MutableMapping):
+    """
+        CSP.domains of a fork: reads fall back to the domains of the base, writes stay in the fork.
+            names: the variables of the fork once it added or removed some (None = the ones of the base).
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.local = {}
+        self.names = None
+
+    def __getitem__(self, name):
+        domain = self.local.get(name)
+        if domain is None:
+            if self.names is not None and name not in self.names:
+                raise KeyError(name)
+            return self.base[name]
+        return domain
+
+    def __setitem__(self, name, domain):
+        if name not in self:
+            raise KeyError(name)
+        self.local[name] = domain
+
+    def __delitem__(self, name):
+        # back to the domain of the base.
+        del self.local[name]
+
+    def __iter__(self):
+        return iter(self.base if self.names is None else self.names)
+
+    def __len__(self):
+        return len(self.base if self.names is None else self.names)
+
+    def __contains__(self, name):
+        return name in (self.base if self.names is None else self.names)
+
+
+class CSPFork(CSP):
+    """
+        What-if copy of a CSP sharing the compiled variables, constraint index, global constraints and domains
+        of its base, only the changes are recorded:
+            - domains: restrict / remove_values (and the search itself) write into domains.local.
+            - variables: change_variables copies the variable list and the constraint index of the fork only.
+            - global constraints: add_global / replace_globals copy the list of the fork only.
+        Forks of forks chain to their base. The base must not change while it has forks: solve a fork of it.
+    """
+
+    def __init__(self, base):
+        # nothing is compiled again, the structure of the base is shared until the fork changes it.
+        self.base = base
+        self.variables = base.variables
+        self.domains = ForkDomains(base.domains)
+        self.constraints = base.constraints
+        self.value_hints = dict(base.value_hints)
+        self.global_constraints = base.global_constraints
+        self.globals_of = base.globals_of
+        self.variable_ordering = base.variable_ordering
+        self.constraint_weights = Counter()
+        self.occupancy = base.occupancy.copy() if base.occupancy is not None else None
+        self.profiler = None
+        self.index = base.index
+        self.arc_constraints = base.arc_constraints
+        self.neighbor_vars = base.neighbor_vars
+        self.neighbor_ids = base.neighbor_ids
+
+    def restrict(self, name: str, values):
+        """Keep only `values` in the domain of a variable."""
+        self.domains[name] = list(values)
+
+    def remove_values(self, predicate, names=None) -> int:
+        """Remove the values matching predicate(value) from the domains (of `names`), returns how many."""
+        removed = 0
+        for name in self.domains if names is None else names:
+            domain = self.domains[name]
+            kept = [value for value in domain if not predicate(value)]
+            if len(kept) != len(domain):
+                self.domains[name] = kept
+                removed += len(domain) - len(kept)
+        return removed
+
+    def change_variables(self, remove=(), add=(), domains: dict = None, constraints: dict = None):
+        """
+            Remove the variables `remove` and add the variables `add`.
+                domains[name] and constraints[name] = [(other_var, constraint_fn)] for the added variables,
+                the reverse arcs to the variables already in the fork are added here.
+                the global constraints are not rescoped, use replace_globals for them.
+        """
+        domains = domains or {}
+        constraints = constraints or {}
+        removed = set(remove)
+        added = {var.name for var in add}
+
+        # copy-on-write: only the arc lists of the neighbors of removed or added variables are copied.
+        own = dict(self.constraints)
+        touched = {neighbor.name for name in removed for neighbor in self.neighbor_vars.get(name, ())} - removed
+        for name in removed:
+            own.pop(name, None)
+        reverse = defaultdict(list)
+        for var in add:
+            own[var.name] = list(constraints.get(var.name, ()))
+            for other, fn in own[var.name]:
+                if other.name not in added:
+                    reverse[other.name].append((var, fn))
+        for name in touched | reverse.keys():
+            own[name] = [(other, fn) for other, fn in own[name] if other.name not in removed] + reverse[name]
+
+        self.variables = [var for var in self.variables if var.name not in removed] + list(add)
+        self.constraints = own
+        self.domains.names = dict.fromkeys(var.name for var in self.variables)
+        for name in removed - added:
+            self.domains.local.pop(name, None)
+        for var in add:
+            self.domains.local[var.name] = list(domains[var.name])
+        for name in removed:
+            self.value_hints.pop(name, None)
+        self.index_constraints()
+
+    def add_global(self, constraint):
+        if self.global_constraints is self.base.global_constraints:
+            self.global_constraints = list(self.global_constraints)
+            self.globals_of = {name: list(constraints) for name, constraints in self.globals_of.items()}
+        super().add_global(constraint)
+
+    def replace_globals(self, constraints):
+        """Use `constraints` as the global constraints of the fork (e.g. rebuilt after change_variables)."""
+        self.global_constraints = []
+        self.globals_of = {}
+        for constraint in constraints:
+            self.add_global(constraint)
+
+
+def arc_key(a: str, b: str) -> tuple:
+    """Key of the binary constraints between two variables in csp.constraint_weights."""
+    return (a, b) if a < b else (b, a)
 
 
 def apply_ac3(csp):
-    """AC-3 algorithm for initial arc consistency."""
-    queue = deque()
-    for var in csp.variables:
-        for (neighbor, _) in csp.constraints[var.name]:
-            queue.append((var.name, neighbor.name))
+    """
+        AC-3 algorithm for initial arc consistency.
+            the global constraints are propagated too, until neither of them removes anything.
+    """
+    return propagate_arcs(csp, csp.arc_constraints)
+
+
+def propagate_arcs(csp, arcs, changed: set = None) -> bool:
+    """
+        AC-3 from the given arcs (xi, xj), then the global constraints, until neither removes anything.
+            changed (optional set) receives the names of the variables whose domain was reduced.
+    """
+    if not _ac3(csp, arcs, changed):
+        return False
+
+    while csp.global_constraints:
+        reduced = set()
+        for constraint in csp.global_constraints:
+            started = csp.profiler.start("ac3", constraint, None) if csp.profiler is not None else None
+            consistent = constraint.propagate(csp, changed=reduced)
+            if started is not None:
+                csp.profiler.stop(started)
+            if not consistent:
+                csp.constraint_weights[constraint] += 1
+                return False
+        if not reduced:
+            break
+        if changed is not None:
+            changed |= reduced
+        if not _ac3(csp, [(xk.name, x) for x in reduced for xk in csp.neighbor_vars[x]], changed):
+            return False
+    return True
+
+
+def _ac3(csp, arcs, changed=None):
+    queue = deque(arcs)
+    queued = set(queue)
 
     while queue:
         xi, xj = queue.popleft()
+        queued.discard((xi, xj))
         if revise(csp, xi, xj):
+            if changed is not None:
+                changed.add(xi)
             if not csp.domains[xi]:
+                csp.constraint_weights[arc_key(xi, xj)] += 1
                 return False 
-            for (xk, _) in csp.constraints[xi]:
-                if xk.name != xj:
-                    queue.append((xk.name, xi))
+            for xk in csp.neighbor_vars[xi]:
+                arc = (xk.name, xi)
+                if xk.name != xj and arc not in queued:
+                    queue.append(arc)
+                    queued.add(arc)
     return True
 
 
 def revise(csp, xi, xj):
     """Revise domain of xi to maintain arc consistency with xj."""
+    if csp.profiler is not None:
+        return _revise_profiled(csp, xi, xj)
     revised = False
-    constraints = [fn for (nbr, fn) in csp.constraints[xi] if nbr.name == xj]
+    constraints = csp.arc_constraints.get((xi, xj), ())
     new_domain = []
     for val in csp.domains[xi]:
         # keep val if there exists some value in xj's domain that satisfies constraint
@@ -57,54 +313,199 @@ def revise(csp, xi, xj):
             new_domain.append(val)
         else:
             revised = True
-    csp.domains[xi] = new_domain
+    # an unchanged domain is kept as it is (a LazyDomain stays lazy).
+    if revised:
+        csp.domains[xi] = new_domain
     return revised
 
 
+def _revise_profiled(csp, xi, xj):
+    """revise() counting the constraint checks for the profiler."""
+    started = time.perf_counter()
+    constraints = csp.arc_constraints.get((xi, xj), ())
+    domain = csp.domains[xi]
+    checks = 0
+    new_domain = []
+    for val in domain:
+        for other in csp.domains[xj]:
+            checks += 1
+            if all(fn(val, other) for fn in constraints):
+                new_domain.append(val)
+                break
+    if len(new_domain) != len(domain):
+        csp.domains[xi] = new_domain
+    csp.profiler.record("ac3", constraints, xi, checks, len(domain) - len(new_domain),
+                        time.perf_counter() - started)
+    return len(new_domain) != len(domain)
+
+
 def select_unassigned_variable(assignment, csp):
-    """MRV heuristic: pick variable with fewest remaining domain values."""
+    """
+        MRV heuristic: pick variable with fewest remaining domain values.
+            with csp.variable_ordering == "dom/wdeg" the domain size is divided by the weighted degree:
+            constraints that keep wiping out domains weigh more, so their variables are tried first.
+    """
     unassigned = [v for v in csp.variables if v.name not in assignment]
+    if csp.variable_ordering == "dom/wdeg":
+        return min(unassigned, key=lambda var: len(csp.domains[var.name]) / weighted_degree(csp, var, assignment))
     return min(unassigned, key=lambda var: len(csp.domains[var.name]))
 
 
+def weighted_degree(csp, var, assignment) -> int:
+    """Sum of the weights (1 + failures) of the constraints linking var to unassigned variables."""
+    weights = csp.constraint_weights
+    wdeg = 0
+    for neighbor in csp.neighbor_vars.get(var.name, ()):
+        if neighbor.name not in assignment:
+            wdeg += 1 + weights[arc_key(var.name, neighbor.name)]
+    for constraint in csp.globals_of.get(var.name, ()):
+        wdeg += 1 + weights[constraint]
+    return wdeg or 1
+
+
 def order_domain_values(var, assignment, csp):
     """LCV heuristic: prefer values that eliminate fewest options from neighbors."""
+    if csp.occupancy is not None:
+        count_conflicts = _grid_conflicts(var, assignment, csp)
+    else:
+        def count_conflicts(value):
+            count = 0
+            for neighbor in csp.neighbors(var):
+                if neighbor.name in assignment:
+                    continue
+                fns = csp.arc_constraints[(var.name, neighbor.name)]
+                for nval in csp.domains[neighbor.name]:
+                    if not all(fn(value, nval) for fn in fns):
+                        count += 1
+            return count
+
+    hint = csp.value_hints.get(var.name)
+    if hint is not None and hint in csp.domains[var.name]:
+        return _hint_first(hint, var, csp, count_conflicts)
+
+    return sorted(csp.domains[var.name], key=count_conflicts)
+
+
+def _grid_conflicts(var, assignment, csp):
+    """
+        The LCV counts of the timetable rules from one pass over the neighbor domains (instead of one per value):
+            a neighbor sharing students loses its values at the slot, any other one the values at the slot
+            with the same room or the same instructor.
+    """
+    grid = csp.occupancy
+    at_slot, rooms, instructors, both = Counter(), Counter(), Counter(), Counter()
+    lazy = []
+    for neighbor in csp.neighbors(var):
+        if neighbor.name in assignment:
+            continue
+        domain = csp.domains[neighbor.name]
+        if isinstance(domain, LazyDomain):
+            # counted from the rooms and instructors left per timeslot, the values are not made.
+            if grid.share_students(var.name, neighbor.name):
+                at_slot.update(domain.slot_counts())
+            else:
+                instructors.update(domain.instructor_counts())
+                rooms.update(domain.room_counts())
+                lazy.append(domain)
+            continue
+        if grid.share_students(var.name, neighbor.name):
+            at_slot.update([val[2] for val in domain])
+        else:
+            instructors.update([(iid, slot) for _, iid, slot in domain])
+            rooms.update([(room, slot) for room, _, slot in domain if room is not None])
+            both.update([val for val in domain if val[0] is not None])
+
     def count_conflicts(value):
-        count = 0
-        for (neighbor, constraint_fn) in csp.constraints.get(var.name, []):
-            if neighbor.name in assignment:
-                continue
-            for nval in csp.domains[neighbor.name]:
-                if not constraint_fn(value, nval):
-                    count += 1
+        room, iid, slot = value
+        count = at_slot[slot] + instructors[(iid, slot)]
+        if room is not None:
+            count += rooms[(room, slot)] - both[value] - sum(1 for domain in lazy if value in domain)
         return count
+    return count_conflicts
 
-    return sorted(csp.domains[var.name], key=count_conflicts)
+
+def _hint_first(hint, var, csp, count_conflicts):
+    """Yield the warm start value first, the LCV ordering of the rest is only computed if the hint fails."""
+    yield hint
+    yield from sorted((val for val in csp.domains[var.name] if val != hint), key=count_conflicts)
 
 
-def forward_checking(csp, var, value, assignment):
-    """Remove inconsistent values from domains of unassigned neighbors."""
-    for (neighbor, constraint_fn) in csp.constraints.get(var.name, []):
+def forward_checking(csp, var, value, assignment, trail=None):
+    """
+        Remove inconsistent values from domains of unassigned neighbors.
+            trail (optional dict) receives the old domain of every variable changed, to undo it on backtrack.
+            the value is added to csp.occupancy (when the CSP has one), unassign() takes it back.
+    """
+    grid = csp.occupancy
+    if grid is not None:
+        grid.assign(var.name, value)
+    profiler = csp.profiler
+
+    for neighbor in csp.neighbors(var):
         if neighbor.name in assignment:
             continue
-        new_domain = [val for val in csp.domains[neighbor.name] if constraint_fn(value, val)]
+        started = time.perf_counter() if profiler is not None else None
+        if grid is not None:
+            # the grid holds every assigned session: one lookup per cell instead of the arc functions.
+            domain = csp.domains[neighbor.name]
+            if isinstance(domain, LazyDomain):
+                new_domain = grid.restrict(neighbor.name, domain)
+            else:
+                allows = grid.allows
+                new_domain = [val for val in domain if allows(neighbor.name, val)]
+        else:
+            fns = csp.arc_constraints[(var.name, neighbor.name)]
+            new_domain = [val for val in csp.domains[neighbor.name] if all(fn(value, val) for fn in fns)]
+        if started is not None:
+            old_size = len(csp.domains[neighbor.name])
+            profiler.record("search", csp.arc_constraints[(var.name, neighbor.name)], neighbor.name, old_size,
+                            old_size - len(new_domain), time.perf_counter() - started)
         if not new_domain:
+            csp.constraint_weights[arc_key(var.name, neighbor.name)] += 1
             return False 
+        if trail is not None:
+            trail.setdefault(neighbor.name, csp.domains[neighbor.name])
         csp.domains[neighbor.name] = new_domain
+
+    for constraint in csp.globals_of.get(var.name, ()):
+        started = profiler.start("search", constraint, var.name) if profiler is not None else None
+        consistent = constraint.on_assign(csp, var.name, value, assignment, trail)
+        if started is not None:
+            profiler.stop(started)
+        if not consistent:
+            csp.constraint_weights[constraint] += 1
+            return False
     return True
 
 
+def unassign(csp, name, assignment):
+    """Take back the value of a variable (from the occupancy grid too)."""
+    del assignment[name]
+    if csp.occupancy is not None:
+        csp.occupancy.unassign(name)
+
+
 def backtrack(assignment, csp):
     """Recursive backtracking search with MRV, LCV, and forward checking."""
+    if csp.occupancy is not None:
+        # a previous search may have left its sessions in the grid.
+        csp.occupancy.sync(assignment)
+    return _backtrack(assignment, csp)
+
+
+def _backtrack(assignment, csp):
     if len(assignment) == len(csp.variables):
         return assignment
 
     var = select_unassigned_variable(assignment, csp)
     for value in order_domain_values(var, assignment, csp):
         assignment[var.name] = value
-        if forward_checking(csp, var, value, assignment):
-            result = backtrack(assignment, csp)
+        # forward_checking replaces the pruned domains, keep the old lists to undo it on failure.
+        trail = {}
+        if forward_checking(csp, var, value, assignment, trail):
+            result = _backtrack(assignment, csp)
             if result is not None:
                 return result
-        del assignment[var.name]
+        csp.domains.update(trail)
+        unassign(csp, var.name, assignment)
     return None
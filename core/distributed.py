@@ -0,0 +1,355 @@
+"""
+    Distributed solving: one coordinator, worker processes on this machine or on other nodes.
+
+    The dataset is partitioned by faculty (groups of levels, see partition_dataset). Sessions of different
+    faculties never share students, they can only clash on a shared instructor or a shared room in the same
+    timeslot: these (resource, timeslot) pairs are the coupling between the parts.
+
+    Each worker builds the CSPs of the parts it is given once, then solves them on request. The coordinator
+    negotiates the coupling in rounds:
+        1. the timeslots of every shared resource are dealt to the parts that can use it (allocate), and every
+           part is solved in parallel with its share only: the timetables found can't clash.
+        2. a part that failed with its share solves again, avoiding only what the other parts actually use.
+        3. the parts are ranked; a part using a shared (resource, timeslot) taken by a part ranked above it
+           solves again without it (its previous timetable as value hints, so it moves as little as possible).
+           A part that still can't be solved goes to the top of the ranking and keeps what it needs, the others
+           make room for it in the next round.
+    until no shared (resource, timeslot) is used twice: the timetables of the parts then merge into one.
+
+    Workers talk to the coordinator over multiprocessing.connection (pickled messages on a socket):
+        coordinator -> worker   ("part", part_id, dataset, slots, use_globals)
+                                ("solve", part_id, blocked_rooms, blocked_instructors, hints, time_budget, node_budget)
+                                ("stop",)
+        worker -> coordinator   ("solved", part_id, status, assignment, elapsed)
+
+    example:
+        result = solve_distributed(dataset, time_budget=120, workers=4)           # local worker processes
+
+        result = solve_distributed(dataset, time_budget=120, workers=8, address=("0.0.0.0", 6000),
+                                   authkey=b"secret")                              # coordinator node
+        python -m core.distributed host:6000 --authkey secret                      # on each worker node
+"""
+import argparse
+import copy
+import os
+import time
+from collections import Counter, defaultdict
+from contextlib import suppress
+from multiprocessing import Process
+from multiprocessing.connection import Client, Listener, wait
+
+from config.settings import time_slots as default_time_slots
+from core.anytime import solve_with_budget
+from core.csp_builder import ROOM_TYPE_FOR_COURSE, build_csp, course_instructor_ids, session_units
+
+
+class Part:
+    """
+        The sub-dataset of one faculty: its levels, their courses, every instructor and the rooms it can use.
+            demand[("type", room type)] / demand[("instructor", iid)] = sessions that can use them.
+    """
+
+    def __init__(self, part_id: str, courses: list, levels: list, instructors: list, rooms: list):
+        self.part_id = part_id
+        self.data = (courses, levels, instructors, rooms)
+        levels_m = {level.id: level for level in levels}
+        instructors_m = {instructor.instructor_id: instructor for instructor in instructors}
+        self.demand = Counter()
+        for course in courses:
+            room_type = ROOM_TYPE_FOR_COURSE.get(course.type.lower())
+            if room_type is None:
+                continue
+            count = sum(int(course.time_slots) * len(session_units(course, levels_m[level_id]))
+                        for level_id in course.course_levels)
+            self.demand[("type", room_type)] += count
+            for iid in course_instructor_ids(course, instructors_m):
+                self.demand[("instructor", iid)] += count
+        self.sessions = sum(count for (kind, _), count in self.demand.items() if kind == "type")
+
+    def __repr__(self):
+        return f"Part({self.part_id}, {len(self.data[1])} levels, {len(self.data[0])} courses)"
+
+
+class DistributedResult:
+    def __init__(self, status, assignment, rounds, parts, shared_rooms, shared_instructors, conflicts,
+                 solve_seconds, elapsed):
+        self.status = status
+        self.assignment = assignment
+        self.rounds = rounds
+        self.parts = parts
+        self.shared_rooms = shared_rooms
+        self.shared_instructors = shared_instructors
+        self.conflicts = conflicts
+        self.solve_seconds = solve_seconds
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f"DistributedResult({self.status}, {len(self.assignment)} sessions, {self.parts} parts, "
+                f"{self.rounds} rounds, {self.conflicts} conflict(s) left, {self.solve_seconds:.2f}s solving "
+                f"in {self.elapsed:.2f}s)")
+
+
+def faculties(courses: list, levels: list) -> dict:
+    """Default faculties: the levels linked by a common course are in the same one. faculty_of[level_id]."""
+    parent = {level.id: level.id for level in levels}
+
+    def find(level_id):
+        while parent[level_id] != level_id:
+            parent[level_id] = parent[parent[level_id]]
+            level_id = parent[level_id]
+        return level_id
+
+    for course in courses:
+        linked = sorted(level_id for level_id in course.course_levels if level_id in parent)
+        for level_id in linked[1:]:
+            parent[find(level_id)] = find(linked[0])
+    return {level.id: find(level.id) for level in levels}
+
+
+def partition_dataset(dataset, faculty_of: dict = None):
+    """
+        Split a mapped dataset (see core/scenarios.mapped_scenario) into one Part per faculty.
+            faculty_of[level_id] = faculty, faculty_of[room_id] = faculty for the rooms of one faculty only;
+            the rooms not in it are shared by every faculty. Default: faculties(), every room shared.
+        Returns (parts, shared rooms, shared instructors).
+    """
+    courses, levels, instructors, rooms = dataset
+    if faculty_of is None:
+        faculty_of = faculties(courses, levels)
+    instructors_m = {instructor.instructor_id: instructor for instructor in instructors}
+
+    levels_of = defaultdict(list)
+    for level in levels:
+        levels_of[faculty_of[level.id]].append(level)
+
+    parts = []
+    for faculty, faculty_levels in sorted(levels_of.items()):
+        level_ids = {level.id for level in faculty_levels}
+        faculty_courses = []
+        for course in courses:
+            if course.course_levels & level_ids:
+                course = copy.copy(course)
+                course.course_levels = course.course_levels & level_ids
+                faculty_courses.append(course)
+        faculty_rooms = [room for room in rooms if faculty_of.get(room.id, faculty) == faculty]
+        parts.append(Part(faculty, faculty_courses, faculty_levels, instructors, faculty_rooms))
+
+    used_by = Counter(iid for part in parts for kind, iid in part.demand if kind == "instructor")
+    shared_rooms = {room.id for room in rooms if room.id not in faculty_of} if len(parts) > 1 else set()
+    shared_instructors = {iid for iid, users in used_by.items() if users > 1}
+    return parts, shared_rooms, shared_instructors
+
+
+def allocate(parts: list, rooms: list, shared_rooms: set, shared_instructors: set, slots: list[str]) -> dict:
+    """
+        First split of the shared resources: the timeslots of every shared room / instructor are dealt to the
+        parts that can use it, in proportion to their sessions that can (rotated per resource, so a part doesn't
+        always get the same timeslots). quota[part_id] = (room keys, instructor keys), keys (id, timeslot).
+    """
+    quota = {part.part_id: (set(), set()) for part in parts}
+    resources = [(0, room.id, ("type", room.type)) for room in rooms if room.id in shared_rooms]
+    resources += [(1, iid, ("instructor", iid)) for iid in sorted(shared_instructors)]
+    for r, (kind, resource, demand_key) in enumerate(resources):
+        weights = {part.part_id: part.demand[demand_key] for part in parts if part.demand[demand_key]}
+        if not weights:
+            continue
+        total = sum(weights.values())
+        given = dict.fromkeys(weights, 0)
+        for i in range(len(slots)):
+            part_id = max(weights, key=lambda p: (weights[p] * (i + 1) / total - given[p], p))
+            given[part_id] += 1
+            quota[part_id][kind].add((resource, slots[(i + r) % len(slots)]))
+    return quota
+
+
+def _solve_part(csp, blocked_rooms, blocked_instructors, hints, time_budget, node_budget):
+    """Solve a part without the blocked (room, timeslot) / (instructor, timeslot) values, the domains are restored."""
+    domains = csp.domains
+    csp.domains = {name: [value for value in domain
+                          if (value[0], value[2]) not in blocked_rooms and (value[1], value[2]) not in blocked_instructors]
+                   for name, domain in domains.items()}
+    csp.value_hints = hints
+    try:
+        return solve_with_budget(csp, time_budget, node_budget)
+    finally:
+        csp.domains = domains
+        csp.value_hints = {}
+
+
+def run_worker(address, authkey: bytes):
+    """Connect to a coordinator, build the parts it sends and solve them until it says stop (or is gone)."""
+    with Client(address, authkey=authkey) as conn:
+        parts = {}
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            if message[0] == "stop":
+                return
+            if message[0] == "part":
+                _, part_id, data, slots, use_globals = message
+                parts[part_id] = build_csp(*data, slots=slots, use_globals=use_globals)
+            elif message[0] == "solve":
+                _, part_id, blocked_rooms, blocked_instructors, hints, time_budget, node_budget = message
+                started = time.perf_counter()
+                final = _solve_part(parts[part_id], blocked_rooms, blocked_instructors, hints, time_budget,
+                                    node_budget)
+                try:
+                    conn.send(("solved", part_id, final.status, final.best_partial, time.perf_counter() - started))
+                except OSError:
+                    return
+
+
+def _shared_keys(assignment: dict, shared_rooms: set, shared_instructors: set):
+    """The shared (room, timeslot) and (instructor, timeslot) pairs a part uses."""
+    rooms, instructors = set(), set()
+    for room_id, iid, timeslot in assignment.values():
+        if room_id in shared_rooms:
+            rooms.add((room_id, timeslot))
+        if iid in shared_instructors:
+            instructors.add((iid, timeslot))
+    return rooms, instructors
+
+
+def solve_distributed(dataset, time_budget: float = None, workers: int = 2, faculty_of: dict = None,
+                      slots: list[str] = None, use_globals: bool = False, node_budget: int = None,
+                      max_rounds: int = 20, address=None, authkey: bytes = None) -> DistributedResult:
+    """
+        Solve a mapped dataset split by faculty on `workers` worker processes.
+            address: None starts the workers on this machine, else (host, port) the coordinator listens on
+                     for `workers` remote workers (run_worker / python -m core.distributed), authkey required.
+                     There is no connection timeout: the call blocks until every worker has connected.
+            time_budget: seconds for the whole negotiation, node_budget: nodes per part and round.
+            status: "solved", "unresolved" (shared resources still used twice after max_rounds), the status of a
+                    part that can't be solved even with nothing blocked ("infeasible", "timeout"), or
+                    "worker_lost" when a worker disconnected (e.g. died): the assignment then only has the parts
+                    solved before.
+    """
+    start = time.perf_counter()
+    parts, shared_rooms, shared_instructors = partition_dataset(dataset, faculty_of)
+    parts_m = {part.part_id: part for part in parts}
+
+    local = address is None
+    if local:
+        authkey = authkey or os.urandom(16)
+        address = ("localhost", 0)
+    elif authkey is None:
+        raise ValueError("solve_distributed: an authkey is needed to accept remote workers")
+
+    processes = []
+    with Listener(address, authkey=authkey) as listener:
+        if local:
+            processes = [Process(target=run_worker, args=(listener.address, authkey), daemon=True)
+                         for _ in range(max(1, workers))]
+            for process in processes:
+                process.start()
+        connections = [listener.accept() for _ in range(max(1, workers))]
+
+    rounds, solve_seconds, status = 0, 0.0, "unresolved"
+    # the ranking: on a conflict the part ranked lower gives way.
+    ranking = [part.part_id for part in sorted(parts, key=lambda p: (-p.sessions, p.part_id))]
+    solutions, keys = {}, {}
+    try:
+        # biggest parts first, each to the least loaded worker.
+        load = [0] * len(connections)
+        worker_of = {}
+        for part in sorted(parts, key=lambda p: (-p.sessions, p.part_id)):
+            w = load.index(min(load))
+            load[w] += part.sessions
+            worker_of[part.part_id] = w
+            connections[w].send(("part", part.part_id, part.data, slots, use_globals))
+
+        quota = allocate(parts, dataset[3], shared_rooms, shared_instructors,
+                         list(default_time_slots if slots is None else slots))
+        insist = set()
+        pending = list(ranking)
+
+        while pending and rounds < max_rounds:
+            left = None if time_budget is None else time_budget - (time.perf_counter() - start)
+            if left is not None and left <= 0:
+                break
+            rounds += 1
+            blocked = {}
+            for part_id in pending:
+                i = ranking.index(part_id)
+                if rounds == 1:
+                    others = [quota[p] for p in ranking if p != part_id]
+                else:
+                    others = [keys[p] for p in ranking[:i] if p in keys]
+                    if part_id not in insist:
+                        others += [keys[p] for p in ranking[i + 1:] if p in keys and p not in pending]
+                blocked[part_id] = (set().union(*(rooms for rooms, _ in others)),
+                                    set().union(*(instructors for _, instructors in others)))
+                connections[worker_of[part_id]].send(("solve", part_id, *blocked[part_id],
+                                                      solutions.get(part_id, {}), left, node_budget))
+
+            results = {}
+            while len(results) < len(pending):
+                for conn in wait(connections):
+                    _, part_id, part_status, assignment, elapsed = conn.recv()
+                    results[part_id] = (part_status, assignment)
+                    solve_seconds += elapsed
+
+            failed = None
+            for part_id in pending:
+                part_status, assignment = results[part_id]
+                if part_status == "solved":
+                    solutions[part_id] = assignment
+                    keys[part_id] = _shared_keys(assignment, shared_rooms, shared_instructors)
+                elif not any(blocked[part_id]):
+                    failed = part_status
+                elif rounds > 1:
+                    # it needs some of what the other parts use: it goes first and keeps it, they make room.
+                    insist.add(part_id)
+                    ranking.remove(part_id)
+                    ranking.insert(0, part_id)
+            if failed is not None:
+                status = failed
+                break
+
+            pending = []
+            for i, part_id in enumerate(ranking):
+                if part_id not in keys:
+                    pending.append(part_id)
+                    continue
+                rooms, instructors = keys[part_id]
+                if any(rooms & keys[p][0] or instructors & keys[p][1] for p in ranking[:i] if p in keys):
+                    pending.append(part_id)
+            if not pending:
+                status = "solved"
+    except (EOFError, OSError):
+        # a worker closed its connection (recv) or can't be reached anymore (send).
+        status = "worker_lost"
+    finally:
+        for conn in connections:
+            with suppress(OSError):
+                conn.send(("stop",))
+            with suppress(OSError):
+                conn.close()
+        for process in processes:
+            process.join()
+
+    usage = defaultdict(int)
+    for rooms, instructors in keys.values():
+        for key in rooms:
+            usage[("room", key)] += 1
+        for key in instructors:
+            usage[("instructor", key)] += 1
+    assignment = {name: value for part_id in ranking for name, value in solutions.get(part_id, {}).items()}
+    return DistributedResult(status, assignment, rounds, len(parts_m), len(shared_rooms), len(shared_instructors),
+                             sum(count - 1 for count in usage.values()), solve_seconds,
+                             time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timetable worker: solve the parts sent by a coordinator.")
+    parser.add_argument("address", help="HOST:PORT of the coordinator")
+    parser.add_argument("--authkey", required=True, help="shared secret of the coordinator")
+    args = parser.parse_args(argv)
+    host, port = args.address.rsplit(":", 1)
+    run_worker((host, int(port)), args.authkey.encode())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+    Export of a solved timetable into per-level, per-instructor and per-room views.
+
+    The solution is indexed once (sessions sorted by timeslot, then bucketed per entity), after that every view
+    is streamed row by row to its file, so exporting thousands of views is linear in the number of sessions.
+
+        export_solution(solution, "results/base", formats=("csv", "html"))
+            -> results/base/level/L1.csv, results/base/instructor/I7.html, ...
+        render_view(solution, "room", "R101", "html")      # one view as a string (GUI)
+"""
+import csv
+import hashlib
+import html
+import io
+import json
+import os
+
+from config.settings import time_slots as default_time_slots
+from core.scoring import slot_day
+
+COLUMNS = ("timeslot", "course_id", "level_id", "group_id", "session_index", "room_id", "instructor_id")
+
+# view -> index of its entity in a row
+VIEWS = {"level": 2, "instructor": 6, "room": 5}
+
+FORMATS = ("csv", "json", "html")
+
+
+class TimetableIndex:
+    """
+        Rows of a solution sorted by timeslot, bucketed per view and entity.
+            rows[i] = (timeslot, course_id, level_id, group_id, session_index, room_id, instructor_id)
+            views[view][entity] = row ids in timeslot order
+    """
+
+    def __init__(self, solution, slots: list[str] = None):
+        self.semester = solution.semester
+        self.slots = default_time_slots if slots is None else slots
+        order = {slot: i for i, slot in enumerate(self.slots)}
+
+        self.rows = sorted(
+            ((timeslot, course_id, level_id, group_id, session_index, room_id, instructor_id)
+             for (course_id, level_id, group_id, session_index), (room_id, instructor_id, timeslot)
+             in solution.entries.items()),
+            key=lambda row: (order.get(row[0], len(order)), row[1:5]))
+
+        self.views = {view: {} for view in VIEWS}
+        for i, row in enumerate(self.rows):
+            for view, column in VIEWS.items():
+                self.views[view].setdefault(row[column], []).append(i)
+
+    def entities(self, view: str) -> list:
+        return sorted(self.views[view])
+
+    def view_rows(self, view: str, entity: str):
+        for i in self.views[view].get(entity, ()):
+            yield self.rows[i]
+
+
+def write_csv(rows, f):
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    writer.writerows(rows)
+
+
+def write_json(rows, f, meta: dict):
+    """Streams {"...meta", "sessions": [...]} one session at a time."""
+    f.write(json.dumps(meta)[:-1] + (", " if meta else "") + '"sessions": [')
+    for i, row in enumerate(rows):
+        f.write((",\n  " if i else "\n  ") + json.dumps(dict(zip(COLUMNS, row))))
+    f.write("\n]}\n")
+
+
+def write_html(rows, f, title: str, slots: list[str]):
+    """Weekly grid: one line per day, one column per time of day."""
+    days = list(dict.fromkeys(slot_day(slot) for slot in slots))
+    times = list(dict.fromkeys(slot.split("-", 1)[1] for slot in slots))
+
+    # a view is small (one entity), only its cells are kept.
+    cells = {}
+    for timeslot, course_id, level_id, group_id, _, room_id, instructor_id in rows:
+        day, time = timeslot.split("-", 1)
+        cells.setdefault((day, time), []).append(
+            f"{html.escape(course_id)} {html.escape(level_id)}/{html.escape(str(group_id))}<br>"
+            f"<small>{html.escape(room_id)} &middot; {html.escape(instructor_id)}</small>")
+
+    f.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title></head>\n"
+            f"<body><h1>{html.escape(title)}</h1>\n<table border=\"1\">\n")
+    f.write("<tr><th></th>" + "".join(f"<th>{html.escape(time)}</th>" for time in times) + "</tr>\n")
+    for day in days:
+        f.write(f"<tr><th>{html.escape(day)}</th>")
+        for time in times:
+            f.write("<td>" + "<hr>".join(cells.get((day, time), ())) + "</td>")
+        f.write("</tr>\n")
+    f.write("</table></body></html>\n")
+
+
+def _write_view(index: TimetableIndex, view: str, entity: str, fmt: str, f):
+    rows = index.view_rows(view, entity)
+    if fmt == "csv":
+        write_csv(rows, f)
+    elif fmt == "json":
+        write_json(rows, f, {"semester": index.semester, "view": view, "entity": entity})
+    elif fmt == "html":
+        write_html(rows, f, f"{index.semester} {view} {entity}".strip(), index.slots)
+    else:
+        raise ValueError(f"unknown export format: {fmt}")
+
+
+def render_view(solution, view: str, entity: str, fmt: str = "html", slots: list[str] = None,
+                index: TimetableIndex = None) -> str:
+    """
+        One view as a string, e.g. for the GUI.
+            pass an index built once when rendering many views of the same solution.
+    """
+    index = index or TimetableIndex(solution, slots)
+    f = io.StringIO()
+    _write_view(index, view, entity, fmt, f)
+    return f.getvalue()
+
+
+def export_solution(solution, out_dir: str, formats=("csv",), views=tuple(VIEWS), slots: list[str] = None) -> list:
+    """Write <out_dir>/<view>/<entity>.<format> for every entity of every view, returns the written paths."""
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown export format: {fmt}")
+
+    index = TimetableIndex(solution, slots)
+    paths = []
+    for view in views:
+        view_dir = os.path.join(out_dir, view)
+        os.makedirs(view_dir, exist_ok=True)
+        for entity in index.entities(view):
+            for fmt in formats:
+                path = os.path.join(view_dir, f"{_file_name(entity)}.{fmt}")
+                with open(path, "w", newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+                    _write_view(index, view, entity, fmt, f)
+                paths.append(path)
+    return paths
+
+
+def _file_name(entity) -> str:
+    """The entity id as a file name, ids that had to be changed get a hash of the original ("A/B" -> "A_B-<hash>")."""
+    raw = str(entity)
+    name = "".join(c if c.isalnum() or c in "-_." else "_" for c in raw)
+    if name != raw:
+        name += "-" + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:8]
+    return name
@@ -0,0 +1,122 @@
+import time
+from collections import Counter, defaultdict
+
+from config.settings import time_slots as default_time_slots
+from core.csp_builder import ROOM_TYPE_FOR_COURSE, course_instructor_ids, group_student_units, session_units
+
+
+class Bottleneck:
+    """One counting check that can't be satisfied: `required` units of something but only `available`."""
+
+    def __init__(self, kind: str, subject: str, required: int, available: int, detail: str = ""):
+        self.kind = kind
+        self.subject = subject
+        self.required = required
+        self.available = available
+        self.detail = detail
+
+    def __repr__(self):
+        return f"Bottleneck({self.kind}, {self.subject}: needs {self.required}, has {self.available})"
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "subject": self.subject, "required": self.required,
+                "available": self.available, "detail": self.detail}
+
+
+class FeasibilityReport:
+    def __init__(self, bottlenecks: list, elapsed: float):
+        self.bottlenecks = bottlenecks
+        self.elapsed = elapsed
+
+    @property
+    def feasible(self) -> bool:
+        """False means the dataset is proven infeasible, True only means no counting check failed."""
+        return not self.bottlenecks
+
+    def __str__(self):
+        if self.feasible:
+            return f"no bottleneck found ({self.elapsed * 1000:.1f} ms)"
+        lines = [f"{len(self.bottlenecks)} bottleneck(s) found ({self.elapsed * 1000:.1f} ms):"]
+        for b in self.bottlenecks:
+            lines.append(f"  - [{b.kind}] {b.subject}: needs {b.required}, has {b.available}"
+                         + (f" ({b.detail})" if b.detail else ""))
+        return "\n".join(lines)
+
+
+def analyze(courses: list, levels: list, instructors: list, rooms: list, slots: list[str] = None):
+    """
+        Counting checks run before the search, each failing one is a proof that no timetable exists:
+            - a session with no room big enough, no instructor, or an unknown level.
+            - per room type and size: sessions needing such a room vs rooms * timeslots.
+            - per team of instructors (the ones who can take the sessions of a course): sessions only the team
+              can take vs its instructors * timeslots. A team of one is an instructor's own sessions; a course
+              mapped to several instructors (map_instructors_to_courses) shares its sessions between them.
+            - per group of students: sessions they attend vs timeslots.
+        Only counts are used (no domains are built), so it runs in milliseconds.
+    """
+    start = time.perf_counter()
+    slots_count = len(default_time_slots if slots is None else slots)
+    levels_m = {level.id: level for level in levels}
+    instructors_m = {instructor.instructor_id: instructor for instructor in instructors}
+    bottlenecks = []
+
+    demand = defaultdict(Counter)          # room type -> Counter(session size -> sessions)
+    instructor_load = Counter()            # team (sorted instructor ids) -> sessions only it can teach
+    student_load = Counter()               # (level, section or group) -> sessions
+    for course in courses:
+        room_type = ROOM_TYPE_FOR_COURSE.get(course.type.lower())
+        if room_type is None:
+            continue
+
+        course_instructors = course_instructor_ids(course, instructors_m)
+        course_sessions = 0
+        for level_id in sorted(course.course_levels):
+            level = levels_m.get(level_id)
+            if level is None:
+                bottlenecks.append(Bottleneck("unknown_level", course.code, 1, 0, f"level {level_id}"))
+                continue
+
+            sessions = int(course.time_slots)
+            for group, size in session_units(course, level):
+                demand[room_type][size] += sessions
+
+                course_sessions += sessions
+                if course_instructors:
+                    instructor_load[tuple(course_instructors)] += sessions
+
+                for unit in group_student_units(group, level):
+                    student_load[(level_id, unit)] += sessions
+
+        if not course_instructors and course_sessions:
+            bottlenecks.append(Bottleneck("no_instructor", course.code, course_sessions, 0))
+
+    for room_type, sizes in sorted(demand.items()):
+        capacities = sorted((room.capacity for room in rooms if room.type == room_type), reverse=True)
+        for threshold in sorted(sizes):
+            # sessions needing at least `threshold` seats vs the rooms having them.
+            required = sum(count for size, count in sizes.items() if size >= threshold)
+            fitting = sum(1 for capacity in capacities if capacity >= threshold)
+            if required > fitting * slots_count:
+                kind = "no_room" if fitting == 0 else "room_capacity"
+                bottlenecks.append(Bottleneck(kind, f"{room_type} rooms >= {threshold} seats",
+                                              required, fitting * slots_count,
+                                              f"{fitting} room(s) x {slots_count} timeslots"))
+
+    for team in sorted(instructor_load):
+        # the sessions of the teams inside this one can't go to anyone else either.
+        load = sum(count for other, count in instructor_load.items() if set(other) <= set(team))
+        available = len(team) * slots_count
+        if load > available:
+            if len(team) == 1:
+                bottlenecks.append(Bottleneck("instructor_load", team[0], load, available,
+                                              "sessions no other instructor can teach"))
+            else:
+                bottlenecks.append(Bottleneck("instructor_load", " + ".join(team), load, available,
+                                              f"sessions only these {len(team)} instructors can teach"))
+
+    for (level_id, unit), load in sorted(student_load.items()):
+        if load > slots_count:
+            bottlenecks.append(Bottleneck("student_load", f"{level_id} {unit}", load, slots_count))
+
+    return FeasibilityReport(bottlenecks, time.perf_counter() - start)
+
@@ -0,0 +1,261 @@
+from collections import Counter, defaultdict
+
+
+def max_matching(adjacency: dict) -> dict:
+    """
+        Maximum bipartite matching (augmenting paths, iterative so big scopes don't hit the recursion limit).
+            adjacency[left] = iterable of right vertices
+            returns dict[left] = right for every matched left vertex.
+    """
+    match_left, match_right = {}, {}
+
+    for root in adjacency:
+        visited = set()
+        # each entry: (left vertex, iterator over its right vertices, right vertex used to reach it)
+        stack = [(root, iter(adjacency[root]), None)]
+        while stack:
+            left, rights, _ = stack[-1]
+            for right in rights:
+                if right in visited:
+                    continue
+                visited.add(right)
+                if right not in match_right:
+                    # free right vertex: flip the matching along the path.
+                    for path_left, _, _ in reversed(stack):
+                        previous = match_left.get(path_left)
+                        match_left[path_left] = right
+                        match_right[right] = path_left
+                        right = previous
+                    stack = []
+                else:
+                    nxt = match_right[right]
+                    stack.append((nxt, iter(adjacency[nxt]), right))
+                break
+            else:
+                stack.pop()
+
+    return match_left
+
+
+def _strongly_connected(nodes, edges: dict) -> dict:
+    """Tarjan's algorithm (iterative), returns dict[node] = component id."""
+    index, low, component = {}, {}, {}
+    stack, on_stack = [], set()
+    counter = 0
+
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(edges.get(root, ())))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(edges.get(child, ()))))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component[member] = node
+                        if member == node:
+                            break
+
+    return component
+
+
+def _set_domain(csp, name, new_domain, trail, changed):
+    if csp.profiler is not None:
+        csp.profiler.pruned(len(csp.domains[name]) - len(new_domain))
+    if trail is not None:
+        trail.setdefault(name, csp.domains[name])
+    csp.domains[name] = new_domain
+    if changed is not None:
+        changed.add(name)
+
+
+class AllDifferent:
+    """
+        No two variables of the scope take values with the same key.
+            e.g. key (room, timeslot): a room holds one session per timeslot.
+
+        Replaces the n*(n-1) pairwise "not equal" arcs with one propagator:
+            - on_assign removes the key of the assigned value from the rest of the scope.
+            - propagate runs Régin's matching based filtering: it fails when the variables
+              can't all get different keys, and removes keys that are in no maximum matching.
+    """
+    constraint_type = "all_different"
+
+    def __init__(self, variables: list[str], key_fn, name: str = None, domains: dict = None):
+        """
+            domains: the initial domains of the scope, before any pruning. on_assign then only visits the
+                     variables that have a value with the key assigned (index built here, so the values a
+                     backtrack restores are in it); without them it visits the whole scope.
+        """
+        self.variables = list(variables)
+        self.key_fn = key_fn
+        self.name = name or self.constraint_type
+        self._key_vars = None
+        if domains is not None:
+            self._key_vars = defaultdict(list)
+            for var_name in self.variables:
+                for key in {key_fn(value) for value in domains[var_name]}:
+                    self._key_vars[key].append(var_name)
+
+    def on_assign(self, csp, var_name, value, assignment, trail=None, changed=None) -> bool:
+        key = self.key_fn(value)
+        scope = self.variables if self._key_vars is None else self._key_vars.get(key, ())
+        for name in scope:
+            if name == var_name or name in assignment:
+                continue
+            domain = csp.domains[name]
+            new_domain = [val for val in domain if self.key_fn(val) != key]
+            if len(new_domain) != len(domain):
+                if not new_domain:
+                    return False
+                _set_domain(csp, name, new_domain, trail, changed)
+        return True
+
+    def propagate(self, csp, assignment=None, trail=None, changed=None) -> bool:
+        assignment = assignment or {}
+        keys_of = {}
+        for name in self.variables:
+            if name in assignment:
+                keys_of[name] = {self.key_fn(assignment[name])}
+            else:
+                keys_of[name] = {self.key_fn(value) for value in csp.domains[name]}
+
+        matching = max_matching(keys_of)
+        if len(matching) < len(self.variables):
+            return False
+
+        # Régin: direct matched edges var -> key and the other edges key -> var.
+        # an edge is kept if it is matched, inside a strongly connected component,
+        # or on an alternating path starting at a free key.
+        matched_keys = set(matching.values())
+        edges = defaultdict(list)
+        for name, keys in keys_of.items():
+            edges[("v", name)].append(("k", matching[name]))
+            for key in keys:
+                if key != matching[name]:
+                    edges[("k", key)].append(("v", name))
+
+        all_keys = {("k", key) for keys in keys_of.values() for key in keys}
+        reachable = {node for node in all_keys if node[1] not in matched_keys}
+        frontier = list(reachable)
+        while frontier:
+            for nxt in edges.get(frontier.pop(), ()):
+                if nxt not in reachable:
+                    reachable.add(nxt)
+                    frontier.append(nxt)
+
+        nodes = [("v", name) for name in self.variables] + list(all_keys)
+        component = _strongly_connected(nodes, edges)
+
+        for name, keys in keys_of.items():
+            if name in assignment:
+                continue
+            kept = set()
+            for key in keys:
+                node = ("k", key)
+                if (key == matching[name] or node in reachable
+                        or component[node] == component[("v", name)]):
+                    kept.add(key)
+            if len(kept) != len(keys):
+                _set_domain(csp, name, [val for val in csp.domains[name] if self.key_fn(val) in kept],
+                            trail, changed)
+        return True
+
+
+class Capacity:
+    """
+        At most `capacity` variables of the scope may use the same resource.
+            e.g. resource = timeslot over the Lab sessions, capacity = number of lab rooms.
+
+        Counts the variables forced onto a resource (assigned, or every value left uses it):
+            - more than the capacity -> fail.
+            - exactly the capacity   -> the resource is removed from the other variables.
+        capacity is an int, or a dict[resource] = int.
+    """
+    constraint_type = "capacity"
+
+    def __init__(self, variables: list[str], resource_fn, capacity, name: str = None):
+        self.variables = list(variables)
+        self.resource_fn = resource_fn
+        self.capacity = capacity
+        self.name = name or self.constraint_type
+
+    def _capacity_of(self, resource) -> int:
+        if isinstance(self.capacity, dict):
+            return self.capacity.get(resource, 0)
+        return self.capacity
+
+    def _forced_resource(self, csp, name, assignment):
+        if name in assignment:
+            return self.resource_fn(assignment[name])
+        resources = {self.resource_fn(value) for value in csp.domains[name]}
+        return resources.pop() if len(resources) == 1 else None
+
+    def propagate(self, csp, assignment=None, trail=None, changed=None) -> bool:
+        assignment = assignment or {}
+        forced = {name: self._forced_resource(csp, name, assignment) for name in self.variables}
+        usage = Counter(resource for resource in forced.values() if resource is not None)
+
+        full = set()
+        for resource, count in usage.items():
+            if count > self._capacity_of(resource):
+                return False
+            if count == self._capacity_of(resource):
+                full.add(resource)
+
+        if not full:
+            return True
+
+        for name, resource in forced.items():
+            if resource is not None:
+                continue
+            domain = csp.domains[name]
+            new_domain = [val for val in domain if self.resource_fn(val) not in full]
+            if len(new_domain) != len(domain):
+                if not new_domain:
+                    return False
+                _set_domain(csp, name, new_domain, trail, changed)
+        return True
+
+    def on_assign(self, csp, var_name, value, assignment, trail=None, changed=None) -> bool:
+        """Cheap check during search: only the resource of the new value is counted."""
+        resource = self.resource_fn(value)
+        used = sum(1 for name in self.variables
+                   if name in assignment and self.resource_fn(assignment[name]) == resource)
+        capacity = self._capacity_of(resource)
+        if used > capacity:
+            return False
+        if used < capacity:
+            return True
+
+        for name in self.variables:
+            if name in assignment:
+                continue
+            domain = csp.domains[name]
+            new_domain = [val for val in domain if self.resource_fn(val) != resource]
+            if len(new_domain) != len(domain):
+                if not new_domain:
+                    return False
+                _set_domain(csp, name, new_domain, trail, changed)
+        return True
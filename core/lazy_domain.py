@@ -0,0 +1,164 @@
+"""
+    Lazy domains for very large instances.
+
+    The domain of a session is rooms x instructors x timeslots (build_variables), so it is stored as the three
+    sets plus exclusion masks instead of the list of every value:
+        slot_mask            bit s set: the s-th timeslot is excluded
+        room_masks[s]        bit k set: the k-th room is excluded at the s-th timeslot
+        instructor_masks[s]  bit j set: the j-th instructor is excluded at the s-th timeslot
+    The size is computed from the masks (MRV never makes the values) and the values are only made when the
+    domain is iterated (value ordering, AC-3). Forward checking on the occupancy grid adds exclusions
+    (OccupancyGrid.restrict); the code that filters a domain with a list comprehension gets a plain list back,
+    which is always a valid domain too.
+
+    A LazyDomain is immutable: exclude() returns a new one, so the search trail keeps the old one as it is.
+
+        domain = LazyDomain(["R1", "R2"], ["I1"], ["SUN-10:45", "SUN-11:30"])
+        len(domain)                                        # 4
+        domain = domain.exclude(rooms=[("R1", "SUN-10:45")])
+        list(domain)   # [("R2", "I1", "SUN-10:45"), ("R1", "I1", "SUN-11:30"), ("R2", "I1", "SUN-11:30")]
+"""
+from collections.abc import Sequence
+from itertools import islice
+
+
+class LazyDomain(Sequence):
+    __slots__ = ("rooms", "instructors", "slots", "slot_mask", "room_masks", "instructor_masks", "_index", "_len")
+
+    def __init__(self, rooms, instructors, slots, slot_mask: int = 0, room_masks: tuple = None,
+                 instructor_masks: tuple = None, _index=None):
+        """Values in the order of build_variables: timeslot, then room, then instructor."""
+        self.rooms = tuple(rooms)
+        self.instructors = tuple(instructors)
+        self.slots = tuple(slots)
+        self.slot_mask = slot_mask
+        self.room_masks = room_masks or (0,) * len(self.slots)
+        self.instructor_masks = instructor_masks or (0,) * len(self.slots)
+        # the position of every room / instructor / timeslot, shared by the domains derived from this one.
+        self._index = _index or ({room: k for k, room in enumerate(self.rooms)},
+                                 {iid: j for j, iid in enumerate(self.instructors)},
+                                 {slot: s for s, slot in enumerate(self.slots)})
+        rooms_count, instructors_count = len(self.rooms), len(self.instructors)
+        self._len = sum((rooms_count - self.room_masks[s].bit_count())
+                        * (instructors_count - self.instructor_masks[s].bit_count())
+                        for s in range(len(self.slots)) if not slot_mask >> s & 1)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for s, slot in enumerate(self.slots):
+            if self.slot_mask >> s & 1:
+                continue
+            room_mask, instructor_mask = self.room_masks[s], self.instructor_masks[s]
+            instructors = [iid for j, iid in enumerate(self.instructors) if not instructor_mask >> j & 1]
+            for k, room in enumerate(self.rooms):
+                if not room_mask >> k & 1:
+                    for iid in instructors:
+                        yield room, iid, slot
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("LazyDomain index out of range")
+        return next(islice(iter(self), i, None))
+
+    def __contains__(self, value):
+        try:
+            room, iid, slot = value
+        except (TypeError, ValueError):
+            return False
+        room_index, instructor_index, slot_index = self._index
+        k, j, s = room_index.get(room), instructor_index.get(iid), slot_index.get(slot)
+        if k is None or j is None or s is None or self.slot_mask >> s & 1:
+            return False
+        return not (self.room_masks[s] >> k & 1 or self.instructor_masks[s] >> j & 1)
+
+    def __eq__(self, other):
+        if isinstance(other, (LazyDomain, list, tuple)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"LazyDomain({len(self.rooms)} rooms x {len(self.instructors)} instructors x "
+                f"{len(self.slots)} timeslots, {self._len} values)")
+
+    def exclude(self, slots=(), rooms=(), instructors=()):
+        """
+            The domain without the timeslots `slots`, the (room, timeslot) pairs `rooms` and the
+            (instructor, timeslot) pairs `instructors` (the ones it doesn't hold are ignored).
+            Returns self when nothing changes.
+        """
+        room_index, instructor_index, slot_index = self._index
+        slot_mask = self.slot_mask
+        for slot in slots:
+            s = slot_index.get(slot)
+            if s is not None:
+                slot_mask |= 1 << s
+
+        room_masks, instructor_masks = list(self.room_masks), list(self.instructor_masks)
+        for masks, pairs, index in ((room_masks, rooms, room_index), (instructor_masks, instructors, instructor_index)):
+            for key, slot in pairs:
+                k, s = index.get(key), slot_index.get(slot)
+                if k is not None and s is not None:
+                    masks[s] |= 1 << k
+
+        room_masks, instructor_masks = tuple(room_masks), tuple(instructor_masks)
+        if (slot_mask, room_masks, instructor_masks) == (self.slot_mask, self.room_masks, self.instructor_masks):
+            return self
+        return LazyDomain(self.rooms, self.instructors, self.slots, slot_mask, room_masks, instructor_masks,
+                          self._index)
+
+    def free(self, s: int):
+        """(rooms, instructors) left at the s-th timeslot, empty if it is excluded."""
+        if self.slot_mask >> s & 1:
+            return (), ()
+        room_mask, instructor_mask = self.room_masks[s], self.instructor_masks[s]
+        return ([room for k, room in enumerate(self.rooms) if not room_mask >> k & 1],
+                [iid for j, iid in enumerate(self.instructors) if not instructor_mask >> j & 1])
+
+    def slot_counts(self) -> dict:
+        """Values per timeslot."""
+        counts = {}
+        for s, slot in enumerate(self.slots):
+            rooms, instructors = self.free(s)
+            if rooms and instructors:
+                counts[slot] = len(rooms) * len(instructors)
+        return counts
+
+    def room_counts(self) -> dict:
+        """Values per (room, timeslot), the None room (core/two_phase.py) is left out."""
+        counts = {}
+        for s, slot in enumerate(self.slots):
+            rooms, instructors = self.free(s)
+            if instructors:
+                for room in rooms:
+                    if room is not None:
+                        counts[(room, slot)] = len(instructors)
+        return counts
+
+    def instructor_counts(self) -> dict:
+        """Values per (instructor, timeslot)."""
+        counts = {}
+        for s, slot in enumerate(self.slots):
+            rooms, instructors = self.free(s)
+            if rooms:
+                for iid in instructors:
+                    counts[(iid, slot)] = len(rooms)
+        return counts
+
+    def resources(self):
+        """(rooms, instructors) of the domain without making the values (a superset once some are excluded)."""
+        return set(self.rooms), set(self.instructors)
+
+
+def domain_resources(domain):
+    """(rooms, instructors) used by the values of a domain, a list or a LazyDomain."""
+    if isinstance(domain, LazyDomain):
+        return domain.resources()
+    return {room for room, _, _ in domain}, {iid for _, iid, _ in domain}
@@ -0,0 +1,173 @@
+"""
+    Large Neighbourhood Search on the soft constraint score of a feasible timetable.
+
+    Each move frees a structured part of the timetable (the sessions of one day, of one level or of one
+    instructor), keeps every other session fixed and re-solves the freed part with the anytime search
+    (MRV, LCV, forward checking) under a small node limit. The preferred timeslots are tried first and the
+    value order is shuffled per move, so repeated moves explore different repairs. A move is kept when the
+    score of the whole timetable goes down.
+
+    Moves are solved in parallel: the CSP is put once in shared memory (core/shared_state.py), every worker
+    process maps it in the pool initializer and each round submits one neighbourhood per worker. The best repair of the round is applied, then the other repairs
+    whose changes don't overlap it are merged in when the result is still consistent and scores better.
+"""
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core.anytime import solve_with_budget
+from core.scoring import PREFERRED_SLOTS, score_assignment, slot_day
+from core.shared_state import SharedInstance, attach_worker, shared_csp
+
+
+class LNSResult:
+    def __init__(self, assignment, score, initial_score, rounds, moves, improvements, elapsed):
+        self.assignment = assignment
+        self.score = score
+        self.initial_score = initial_score
+        self.rounds = rounds
+        self.moves = moves
+        self.improvements = improvements
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f"LNSResult(score {self.initial_score} -> {self.score}, {self.improvements} improvement(s), "
+                f"{self.moves} moves in {self.rounds} rounds, {self.elapsed:.2f}s)")
+
+
+def neighbourhoods(csp, assignment: dict) -> list:
+    """(label, variable names) for every day, level and instructor of the timetable."""
+    groups = {}
+    for var in csp.variables:
+        _, instructor, timeslot = assignment[var.name]
+        for label in (f"day {slot_day(timeslot)}", f"level {var.level_id}", f"instructor {instructor}"):
+            groups.setdefault(label, []).append(var.name)
+    return sorted(groups.items())
+
+
+def repair(csp, assignment: dict, names: list, node_limit: int, seed: int, time_budget: float = None,
+           preferred_slots=PREFERRED_SLOTS):
+    """
+        Re-solve the variables `names` with the rest of the assignment fixed.
+            returns the new full assignment, or None if no repair was found within the node limit.
+            the CSP domains are left as they were.
+    """
+    rng = random.Random(seed)
+    free = set(names)
+    fixed = {name: value for name, value in assignment.items() if name not in free}
+    domains = csp.domains
+
+    shuffled = {}
+    for name in names:
+        values = list(domains[name])
+        rng.shuffle(values)
+        shuffled[name] = values
+
+    # first only the preferred timeslots (where the score can go down), then every value.
+    attempts = [{name: [v for v in values if v[2] in preferred_slots] or values
+                 for name, values in shuffled.items()}, shuffled]
+    try:
+        for restricted in attempts:
+            csp.domains = {**domains, **restricted}
+            final = solve_with_budget(csp, time_budget, node_limit, fixed=fixed)
+            if final.status == "solved":
+                return final.best_partial
+        return None
+    finally:
+        csp.domains = domains
+
+
+def consistent(csp, assignment: dict, names) -> bool:
+    """Check the constraints of the variables `names` in a complete assignment."""
+    for name in names:
+        value = assignment[name]
+        for neighbor in csp.neighbor_vars.get(name, ()):
+            other = assignment[neighbor.name]
+            if not all(fn(value, other) for fn in csp.arc_constraints[(name, neighbor.name)]):
+                return False
+
+    # with every variable assigned, propagate only checks (nothing is left to prune).
+    constraints = dict.fromkeys(c for name in names for c in csp.globals_of.get(name, ()))
+    return all(constraint.propagate(csp, assignment) for constraint in constraints)
+
+
+def merge(csp, current: dict, score: int, repairs: list):
+    """Apply the best repair, then every other one changing other variables if it still improves."""
+    changed = set()
+    for repair_score, repaired in sorted(repairs, key=lambda item: item[0]):
+        diff = {name: value for name, value in repaired.items() if current[name] != value}
+        if not diff or changed & diff.keys():
+            continue
+        candidate = {**current, **diff}
+        if changed and not consistent(csp, candidate, diff):
+            continue
+        candidate_score = repair_score if not changed else score_assignment(candidate, csp)
+        if candidate_score < score:
+            current, score = candidate, candidate_score
+            changed |= diff.keys()
+    return current, score, bool(changed)
+
+
+_worker_csp = None
+
+
+def _init_worker(instance_name: str, variable_ordering: str, occupancy):
+    """Pool initializer: the worker CSP reads its domains from the parent's SharedInstance."""
+    global _worker_csp
+    _worker_csp = shared_csp(attach_worker(instance_name))
+    _worker_csp.variable_ordering = variable_ordering
+    _worker_csp.occupancy = occupancy
+
+
+def _repair_task(assignment, names, node_limit, seed, time_budget):
+    return repair(_worker_csp, assignment, names, node_limit, seed, time_budget)
+
+
+def optimize(csp, assignment: dict, time_budget: float, workers: int = 0, node_limit: int = 200, seed: int = 0,
+             on_improve=None) -> LNSResult:
+    """
+        Improve a complete assignment until time_budget seconds are spent.
+            workers: processes solving the moves in parallel, 0 solves them in this process. The workers map
+                     the CSP from shared memory, so it must be one a snapshot can store (core/snapshot.py).
+            on_improve(assignment, score) is called after every kept move.
+    """
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    current = dict(assignment)
+    score = initial_score = score_assignment(current, csp)
+    rounds = moves = improvements = 0
+
+    instance = pool = None
+    if workers:
+        instance = SharedInstance(csp)
+        # the grid goes empty (a few cells per resource and timeslot), each worker fills its own.
+        occupancy = csp.occupancy.empty() if csp.occupancy is not None else None
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                   initargs=(instance.name, csp.variable_ordering, occupancy))
+    try:
+        while time.perf_counter() - start < time_budget and score > 0:
+            candidates = neighbourhoods(csp, current)
+            batch = rng.sample(candidates, min(len(candidates), max(1, workers)))
+            left = time_budget - (time.perf_counter() - start)
+            tasks = [(current, names, node_limit, rng.randrange(1 << 30), left) for _, names in batch]
+
+            if pool is None:
+                repairs = [repair(csp, *task) for task in tasks]
+            else:
+                repairs = list(pool.map(_repair_task, *zip(*tasks)))
+            rounds += 1
+            moves += len(tasks)
+
+            scored = [(score_assignment(r, csp), r) for r in repairs if r is not None]
+            current, score, improved = merge(csp, current, score, scored)
+            if improved:
+                improvements += 1
+                if on_improve is not None:
+                    on_improve(current, score)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+            instance.close()
+            instance.unlink()
+
+    return LNSResult(current, score, initial_score, rounds, moves, improvements, time.perf_counter() - start)
@@ -0,0 +1,88 @@
+from array import array
+
+
+class ModelStore:
+    """
+        Columnar (struct of arrays) form of a CSP, everything is an integer ID.
+
+            var_names[i]                      -> name of variable i
+            var_course / var_level / var_group / var_session[i] -> integer IDs of the variable's session
+            domains[i]                        -> array('i') of encoded values
+
+        A value (room, instructor, timeslot) is encoded as
+            (room_idx * n_instructors + instructor_idx) * n_slots + slot_idx
+        so room / instructor / slot can be read back with integer arithmetic.
+
+        Compared to a list of tuples a domain costs 4 bytes per value instead of an 8 bytes pointer
+        (plus the tuple), and it can be copied to shared memory or a file as is.
+    """
+
+    __slots__ = ("var_names", "var_index", "courses", "levels", "groups", "rooms", "instructors", "slots",
+                 "room_index", "instructor_index", "slot_index",
+                 "var_course", "var_level", "var_group", "var_session", "domains")
+
+    def __init__(self, variables, rooms, instructors, slots):
+        self.var_names = [var.name for var in variables]
+        self.var_index = {name: i for i, name in enumerate(self.var_names)}
+
+        self.courses = sorted({var.course_id for var in variables})
+        self.levels = sorted({var.level_id for var in variables})
+        self.groups = sorted({var.group for var in variables if var.group is not None})
+        self.rooms = list(rooms)
+        self.instructors = list(instructors)
+        self.slots = list(slots)
+
+        self.room_index = {room: i for i, room in enumerate(self.rooms)}
+        self.instructor_index = {iid: i for i, iid in enumerate(self.instructors)}
+        self.slot_index = {slot: i for i, slot in enumerate(self.slots)}
+
+        course_index = {course: i for i, course in enumerate(self.courses)}
+        level_index = {level: i for i, level in enumerate(self.levels)}
+        group_index = {group: i for i, group in enumerate(self.groups)}
+
+        self.var_course = array("i", (course_index[var.course_id] for var in variables))
+        self.var_level = array("i", (level_index[var.level_id] for var in variables))
+        self.var_group = array("i", (group_index.get(var.group, -1) for var in variables))
+        self.var_session = array("i", (var.session_index for var in variables))
+        self.domains = [array("i") for _ in variables]
+
+    @classmethod
+    def from_csp(cls, csp, slots=None):
+        """Compile the variables and current domains of a CSP."""
+        rooms, instructors, seen_slots = set(), set(), {}
+        for values in csp.domains.values():
+            for room, iid, slot in values:
+                rooms.add(room)
+                instructors.add(iid)
+                seen_slots.setdefault(slot, None)
+
+        store = cls(csp.variables, sorted(rooms), sorted(instructors), slots or list(seen_slots))
+        for i, name in enumerate(store.var_names):
+            store.domains[i] = array("i", map(store.encode, csp.domains[name]))
+        return store
+
+    def encode(self, value) -> int:
+        room, iid, slot = value
+        return ((self.room_index[room] * len(self.instructors) + self.instructor_index[iid])
+                * len(self.slots) + self.slot_index[slot])
+
+    def decode(self, code: int):
+        rest, slot = divmod(code, len(self.slots))
+        room, iid = divmod(rest, len(self.instructors))
+        return self.rooms[room], self.instructors[iid], self.slots[slot]
+
+    def room_of(self, code: int) -> int:
+        return code // (len(self.slots) * len(self.instructors))
+
+    def instructor_of(self, code: int) -> int:
+        return code // len(self.slots) % len(self.instructors)
+
+    def slot_of(self, code: int) -> int:
+        return code % len(self.slots)
+
+    def domain_values(self, name: str) -> list:
+        """Decode the domain of a variable back to (room, instructor, timeslot) tuples."""
+        return [self.decode(code) for code in self.domains[self.var_index[name]]]
+
+    def to_domains(self) -> dict:
+        return {name: self.domain_values(name) for name in self.var_names}
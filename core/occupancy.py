@@ -0,0 +1,235 @@
+"""
+    Occupancy grid: sessions per (room, slot), (instructor, slot) and (student unit, slot).
+
+    The three grids are stored flat (row * slots + slot), as NumPy int32 arrays when NumPy is installed and as
+    plain lists otherwise. Every distinct value (room, instructor, timeslot) is encoded once into its two cell
+    ids, so assign / unassign and the availability checks are a few array lookups:
+
+        grid = OccupancyGrid.for_csp(variables, domains, levels_m)      # build_csp attaches it as csp.occupancy
+        grid.assign(name, value); grid.allows(other, value); grid.unassign(name)
+
+        grid = OccupancyGrid.from_solution(solution, levels)     # GUI queries on a solved timetable
+        grid.free_rooms("MON-10:45"); grid.instructor_busy("I7", "MON-10:45")
+
+    A value whose room is None (phase 1 of core/two_phase.py) only occupies the instructor and the students.
+"""
+from config.settings import time_slots as default_time_slots
+from core.csp_builder import group_student_units
+from core.lazy_domain import domain_resources
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class OccupancyGrid:
+
+    def __init__(self, room_ids: list, instructor_ids: list, units: dict, slots: list[str] = None,
+                 use_numpy: bool = None):
+        """
+            units[session] = the student units (level_id, unit) of the session, sessions are variable names
+            (or Solution keys). use_numpy: None = when installed.
+        """
+        np = _numpy() if use_numpy is not False else None
+        if use_numpy and np is None:
+            raise ImportError("OccupancyGrid(use_numpy=True) needs numpy")
+
+        self.slots = list(default_time_slots if slots is None else slots)
+        self.room_ids = list(room_ids)
+        self.instructor_ids = list(instructor_ids)
+        self.unit_ids = sorted({unit for session_units in units.values() for unit in session_units})
+
+        self.slot_index = {slot: i for i, slot in enumerate(self.slots)}
+        self.room_index = {room_id: i for i, room_id in enumerate(self.room_ids)}
+        self.instructor_index = {iid: i for i, iid in enumerate(self.instructor_ids)}
+        unit_index = {unit: i for i, unit in enumerate(self.unit_ids)}
+        n = len(self.slots)
+        # units[session] = tuple of the first cell of each of its units, + slot gives the cell.
+        self.units = {session: tuple(unit_index[unit] * n for unit in sorted(session_units))
+                      for session, session_units in units.items()}
+
+        def zeros(rows):
+            return np.zeros(rows * n, dtype=np.int32) if np is not None else [0] * (rows * n)
+
+        self.np = np
+        self.rooms = zeros(len(self.room_ids))
+        self.instructors = zeros(len(self.instructor_ids))
+        self.students = zeros(len(self.unit_ids))
+        self.assigned = {}
+        # value -> (room cell or -1, instructor cell, slot)
+        self._codes = {}
+
+    @classmethod
+    def for_csp(cls, variables: list, domains: dict, levels_m: dict, slots: list[str] = None,
+                room_ids: list = None, instructor_ids: list = None, use_numpy: bool = None):
+        """Grid of a CSP, the rooms and instructors default to the ones found in the domains."""
+        if room_ids is None or instructor_ids is None:
+            rooms, instructors = set(), set()
+            for domain in domains.values():
+                domain_rooms, domain_instructors = domain_resources(domain)
+                rooms |= domain_rooms
+                instructors |= domain_instructors
+            room_ids = sorted(rooms - {None}) if room_ids is None else room_ids
+            instructor_ids = sorted(instructors) if instructor_ids is None else instructor_ids
+        units = {var.name: {(var.level_id, unit) for unit in group_student_units(var.group, levels_m[var.level_id])}
+                 for var in variables}
+        return cls(room_ids, instructor_ids, units, slots, use_numpy)
+
+    @classmethod
+    def from_solution(cls, solution, levels: list, slots: list[str] = None, use_numpy: bool = None):
+        """Grid filled with a solved timetable, the sessions are the Solution keys."""
+        levels_m = {level.id: level for level in levels}
+        entries = solution.entries
+        units = {key: {(key[1], unit) for unit in group_student_units(key[2], levels_m[key[1]])}
+                 for key in entries if key[1] in levels_m}
+        grid = cls(sorted({room for room, _, _ in entries.values()}),
+                   sorted({iid for _, iid, _ in entries.values()}), units, slots, use_numpy)
+        for key, value in entries.items():
+            grid.assign(key, value)
+        return grid
+
+    def copy(self):
+        grid = object.__new__(OccupancyGrid)
+        grid.__dict__.update(self.__dict__)
+        grid.rooms = self.rooms.copy()
+        grid.instructors = self.instructors.copy()
+        grid.students = self.students.copy()
+        grid.assigned = dict(self.assigned)
+        grid._codes = dict(self._codes)
+        return grid
+
+    def empty(self):
+        """Copy with nothing assigned: the same rooms, instructors, student units and timeslots."""
+        grid = self.copy()
+        grid.sync({})
+        grid._codes = {}
+        return grid
+
+    def __getstate__(self):
+        # the numpy module itself can't be pickled, the worker imports it again.
+        return {**self.__dict__, "np": self.np is not None}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.np = _numpy() if state["np"] else None
+
+    def _code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            room_id, iid, timeslot = value
+            s = self.slot_index[timeslot]
+            n = len(self.slots)
+            room = self.room_index[room_id] * n + s if room_id is not None else -1
+            code = self._codes[value] = (room, self.instructor_index[iid] * n + s, s)
+        return code
+
+    def assign(self, session, value):
+        if session in self.assigned:
+            self.unassign(session)
+        room, instructor, s = self._code(value)
+        if room >= 0:
+            self.rooms[room] += 1
+        self.instructors[instructor] += 1
+        students = self.students
+        for unit in self.units.get(session, ()):
+            students[unit + s] += 1
+        self.assigned[session] = value
+
+    def unassign(self, session):
+        value = self.assigned.pop(session, None)
+        if value is None:
+            return
+        room, instructor, s = self._code(value)
+        if room >= 0:
+            self.rooms[room] -= 1
+        self.instructors[instructor] -= 1
+        students = self.students
+        for unit in self.units.get(session, ()):
+            students[unit + s] -= 1
+
+    def sync(self, assignment: dict):
+        """Make the grid hold exactly `assignment` (only the sessions that differ are changed)."""
+        for session in [session for session, value in self.assigned.items() if assignment.get(session) != value]:
+            self.unassign(session)
+        for session, value in assignment.items():
+            if session not in self.assigned:
+                self.assign(session, value)
+
+    def allows(self, session, value) -> bool:
+        """True if the room, the instructor and the students of the session are all free at the value's slot."""
+        room, instructor, s = self._code(value)
+        if (room >= 0 and self.rooms[room]) or self.instructors[instructor]:
+            return False
+        students = self.students
+        for unit in self.units[session]:
+            if students[unit + s]:
+                return False
+        return True
+
+    def restrict(self, session, domain):
+        """
+            The LazyDomain of the session without the values allows() rejects, checked per timeslot, room and
+            instructor (slots * (rooms + instructors) cells instead of one check per value).
+        """
+        n = len(self.slots)
+        students, units = self.students, self.units[session]
+        slots, rooms, instructors = [], [], []
+        for slot in domain.slots:
+            s = self.slot_index[slot]
+            if any(students[unit + s] for unit in units):
+                slots.append(slot)
+                continue
+            for room_id in domain.rooms:
+                if room_id is not None and self.rooms[self.room_index[room_id] * n + s]:
+                    rooms.append((room_id, slot))
+            for iid in domain.instructors:
+                if self.instructors[self.instructor_index[iid] * n + s]:
+                    instructors.append((iid, slot))
+        return domain.exclude(slots, rooms, instructors)
+
+    def share_students(self, a, b) -> bool:
+        units = self.units[a]
+        return any(unit in units for unit in self.units[b])
+
+    # queries (GUI, reports)
+
+    def room_busy(self, room_id, timeslot) -> bool:
+        return bool(self.rooms[self.room_index[room_id] * len(self.slots) + self.slot_index[timeslot]])
+
+    def instructor_busy(self, iid, timeslot) -> bool:
+        return bool(self.instructors[self.instructor_index[iid] * len(self.slots) + self.slot_index[timeslot]])
+
+    def free_rooms(self, timeslot, room_ids=None) -> list:
+        """The rooms (of room_ids, default all) with no session at timeslot."""
+        n, s = len(self.slots), self.slot_index[timeslot]
+        if self.np is not None and room_ids is None:
+            column = self.rooms.reshape(-1, n)[:, s]
+            return [self.room_ids[i] for i in self.np.flatnonzero(column == 0).tolist()]
+        rooms = self.room_ids if room_ids is None else room_ids
+        return [room_id for room_id in rooms if not self.rooms[self.room_index[room_id] * n + s]]
+
+    def free_slots(self, room_id=None, iid=None) -> list:
+        """The timeslots where the room and / or the instructor are both free."""
+        n = len(self.slots)
+        rows = []
+        if room_id is not None:
+            start = self.room_index[room_id] * n
+            rows.append(self.rooms[start:start + n])
+        if iid is not None:
+            start = self.instructor_index[iid] * n
+            rows.append(self.instructors[start:start + n])
+        return [slot for s, slot in enumerate(self.slots) if not any(row[s] for row in rows)]
+
+    def as_arrays(self) -> dict:
+        """The three grids as 2-D arrays (rows = rooms / instructors / units, columns = slots)."""
+        n = len(self.slots)
+        if self.np is not None:
+            return {"rooms": self.rooms.reshape(-1, n), "instructors": self.instructors.reshape(-1, n),
+                    "students": self.students.reshape(-1, n)}
+        return {name: [list(cells[i:i + n]) for i in range(0, len(cells), n)]
+                for name, cells in (("rooms", self.rooms), ("instructors", self.instructors),
+                                    ("students", self.students))}
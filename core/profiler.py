@@ -0,0 +1,152 @@
+"""
+    Constraint hot-spot profiler.
+
+    While attached to a CSP (csp.profiler), AC-3, forward checking and the global constraints report every
+    constraint evaluation they make:
+        phase   "ac3" (apply_ac3) or "search" (forward checking during the search)
+        type    the type tag of the constraint, see constraint_type()
+        group   (course, level) of the variable revised / assigned
+    and the profiler sums per (phase, type, group): calls, constraint checks, pruned values and seconds.
+
+    example:
+        profiler = ConstraintProfiler()
+        with profiler.attached(csp):
+            apply_ac3(csp)
+            solve_with_budget(csp, time_budget=60)
+        print(profiler.report(by="type"))
+        profiler.write_folded("profile.folded")      # flamegraph.pl / speedscope input
+
+    The profiler adds a timer per revision / assignment, the absolute times are a bit higher than without it.
+"""
+import time
+from contextlib import contextmanager
+
+
+def constraint_type(constraint) -> str:
+    """
+        Type tag of a constraint:
+            binary constraint functions: "binary:<fn.constraint_type>" (e.g. binary:room), the function name
+            when it has no tag. Several functions on one arc: "binary:instructor+room".
+            global constraints: "<constraint_type>:<first word of its name>" (e.g. all_different:students).
+    """
+    if isinstance(constraint, tuple):
+        return "binary:" + "+".join(sorted({getattr(fn, "constraint_type", fn.__name__) for fn in constraint}))
+    if callable(constraint) and not hasattr(constraint, "variables"):
+        return "binary:" + getattr(constraint, "constraint_type", constraint.__name__)
+    return f"{constraint.constraint_type}:{constraint.name.split('_')[0]}"
+
+
+class ConstraintStats:
+    __slots__ = ("calls", "checks", "pruned", "seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.checks = 0
+        self.pruned = 0
+        self.seconds = 0.0
+
+    def add(self, other):
+        self.calls += other.calls
+        self.checks += other.checks
+        self.pruned += other.pruned
+        self.seconds += other.seconds
+
+    def to_dict(self) -> dict:
+        return {"calls": self.calls, "checks": self.checks, "pruned": self.pruned, "seconds": self.seconds}
+
+
+class ConstraintProfiler:
+
+    def __init__(self):
+        # stats[(phase, type, (course, level))]
+        self.stats = {}
+        self._groups = {}
+        self._types = {}
+        # entries of the global constraints being run, their _set_domain calls add to the top one.
+        self._open = []
+
+    def attach(self, csp):
+        self._groups.update({var.name: (var.course_id, var.level_id) for var in csp.variables})
+        csp.profiler = self
+
+    def detach(self, csp):
+        csp.profiler = None
+
+    @contextmanager
+    def attached(self, csp):
+        self.attach(csp)
+        try:
+            yield self
+        finally:
+            self.detach(csp)
+
+    def _entry(self, phase, constraint, name) -> ConstraintStats:
+        tag = self._types.get(constraint)
+        if tag is None:
+            tag = self._types[constraint] = constraint_type(constraint)
+        # a global constraint propagated on its whole scope has no group: ("*", "*").
+        key = (phase, tag, self._groups.get(name, ("*", "*")))
+        entry = self.stats.get(key)
+        if entry is None:
+            entry = self.stats[key] = ConstraintStats()
+        return entry
+
+    def record(self, phase: str, constraint, name: str, checks: int, pruned: int, seconds: float):
+        """One revision of the domain of `name` (binary arcs: constraint is the tuple of arc functions)."""
+        entry = self._entry(phase, constraint, name)
+        entry.calls += 1
+        entry.checks += checks
+        entry.pruned += pruned
+        entry.seconds += seconds
+
+    def start(self, phase: str, constraint, name: str):
+        """Open the entry of a global constraint run, the values it prunes are counted until stop()."""
+        entry = self._entry(phase, constraint, name)
+        entry.calls += 1
+        self._open.append(entry)
+        return time.perf_counter()
+
+    def stop(self, started: float):
+        self._open.pop().seconds += time.perf_counter() - started
+
+    def pruned(self, count: int):
+        if self._open:
+            self._open[-1].pruned += count
+
+    def totals(self, by: str = "type") -> dict:
+        """Stats summed per "type", "group", "phase" or "type_group"."""
+        totals = {}
+        for (phase, tag, group), stats in self.stats.items():
+            key = {"type": tag, "group": group, "phase": phase, "type_group": (tag, group)}[by]
+            totals.setdefault(key, ConstraintStats()).add(stats)
+        return totals
+
+    def report(self, by: str = "type", sort: str = "seconds", limit: int = None) -> str:
+        """Text table of totals(by), sorted by seconds / calls / checks / pruned (highest first)."""
+        rows = sorted(self.totals(by).items(), key=lambda item: getattr(item[1], sort), reverse=True)
+        total = sum(stats.seconds for _, stats in rows) or 1.0
+
+        def label(key):
+            if by == "group":
+                return " ".join(key)
+            if by == "type_group":
+                return f"{key[0]} {' '.join(key[1])}"
+            return key
+
+        lines = [f"{by:<40} {'calls':>10} {'checks':>12} {'pruned':>10} {'seconds':>9} {'share':>6}"]
+        for key, stats in rows[:limit]:
+            lines.append(f"{label(key):<40} {stats.calls:>10} {stats.checks:>12} {stats.pruned:>10} "
+                         f"{stats.seconds:>9.3f} {stats.seconds / total:>6.1%}")
+        return "\n".join(lines)
+
+    def folded(self):
+        """Folded stacks "phase;type;course;level microseconds", one line per entry (flame graph input)."""
+        for (phase, tag, (course, level)), stats in sorted(self.stats.items()):
+            micros = round(stats.seconds * 1e6)
+            if micros:
+                yield f"{phase};{tag};{course};{level} {micros}"
+
+    def write_folded(self, path: str):
+        with open(path, "w") as f:
+            for line in self.folded():
+                f.write(line + "\n")
@@ -0,0 +1,197 @@
+"""
+    What-if scenarios as forks of a base CSP compiled once.
+
+    A scenario (see main.py) closes rooms, removes instructors or adds sections / groups to levels. Instead of
+    building its CSP from the models again, ScenarioBase.fork changes a copy-on-write fork of the base CSP
+    (CSP.fork, core/csp_solver.py):
+        - closed rooms: their values are removed from the domains.
+        - the sessions of a (course, level) whose groups or instructors change (more sections, a removed
+          instructor taking the course) are rebuilt: new variables and domains, linked to the rest through an
+          index of the rooms and instructors of the base sessions.
+        - with the global constraint model, the global constraints are rebuilt (linear in the sessions).
+    Every other session shares its domain and its constraints with the base.
+
+    example:
+        base = ScenarioBase(dataset)
+        csp, data = base.fork({"close_rooms": ["R101"]})
+        solve_with_budget(csp, time_budget=60)
+"""
+import copy
+from collections import defaultdict
+
+from core.csp_builder import (ROOM_TYPE_FOR_COURSE, build_csp, build_global_constraints, build_variables,
+                              course_instructor_ids, different_instructor_slot, different_room_slot,
+                              different_slot, session_units, students_overlap)
+from core.lazy_domain import domain_resources
+from core.occupancy import OccupancyGrid
+from models.course import Course
+from models.instructor import Instructor
+from models.levels import Level
+
+
+def apply_scenario(dataset, scenario: dict):
+    """Return a copy of the dataset with the scenario changes applied."""
+    courses, levels, instructors, rooms = copy.deepcopy(dataset)
+
+    closed = set(scenario.get("close_rooms", []))
+    rooms = [room for room in rooms if room.id not in closed]
+
+    removed = set(scenario.get("remove_instructors", []))
+    instructors = [inst for inst in instructors if inst.instructor_id not in removed]
+    for course in courses:
+        course.course_instructors -= removed
+
+    levels_m = {level.id: level for level in levels}
+    for level_id, count in scenario.get("add_sections", {}).items():
+        levels_m[level_id].sections += count
+    for level_id, count in scenario.get("add_groups", {}).items():
+        levels_m[level_id].groups += count
+
+    return courses, levels, instructors, rooms
+
+
+def mapped_scenario(dataset, scenario: dict):
+    """apply_scenario, then the instructors are mapped to the courses of the copy."""
+    courses, levels, instructors, rooms = apply_scenario(dataset, scenario)
+    Instructor.map_instructors_to_courses(Instructor.build_data_representation(instructors),
+                                          Course.build_data_representation(courses),
+                                          Level.build_data_representation(levels))
+    return courses, levels, instructors, rooms
+
+
+def session_plan(courses: list, levels: list, instructors: list) -> dict:
+    """plan[(course, level)] = (session units, instructor ids): what the sessions of the pair are built from."""
+    levels_m = {level.id: level for level in levels}
+    instructors_m = {instructor.instructor_id: instructor for instructor in instructors}
+    plan = {}
+    for course in courses:
+        if ROOM_TYPE_FOR_COURSE.get(course.type.lower()) is None:
+            continue
+        course_instructors = course_instructor_ids(course, instructors_m)
+        for level_id in course.course_levels:
+            if level_id in levels_m:
+                plan[(course.code, level_id)] = (session_units(course, levels_m[level_id]), course_instructors)
+    return plan
+
+
+class ScenarioBase:
+    """
+        The base dataset mapped and compiled once, every scenario is a fork of its CSP.
+            the dataset given is not changed (the base works on a mapped copy).
+    """
+
+    def __init__(self, dataset, slots: list[str] = None, use_globals: bool = False, csp=None):
+        """
+            csp: the base CSP already compiled from the dataset (e.g. core.shared_state.shared_csp of the block
+                 holding ScenarioBase(dataset).csp), built here when None. Its occupancy grid is added if missing.
+        """
+        self.dataset = dataset
+        self.slots = slots
+        self.data = mapped_scenario(dataset, {})
+        if csp is None:
+            csp = build_csp(*self.data, slots=slots, use_globals=use_globals)
+        elif csp.occupancy is None:
+            _, levels, instructors, rooms = self.data
+            csp.occupancy = OccupancyGrid.for_csp(csp.variables, csp.domains, {level.id: level for level in levels},
+                                                  slots, sorted(room.id for room in rooms),
+                                                  sorted(instructor.instructor_id for instructor in instructors))
+        self.csp = csp
+        self.plan = session_plan(*self.data[:3])
+        self._resources = None
+
+    def resources(self):
+        """(sessions per room, sessions per instructor) of the base domains, built on first use."""
+        if self._resources is None:
+            by_room, by_instructor = defaultdict(set), defaultdict(set)
+            for name, domain in self.csp.domains.items():
+                domain_rooms, domain_instructors = domain_resources(domain)
+                for room_id in domain_rooms:
+                    by_room[room_id].add(name)
+                for iid in domain_instructors:
+                    by_instructor[iid].add(name)
+            self._resources = ({room_id: sorted(names) for room_id, names in by_room.items()},
+                               {iid: sorted(names) for iid, names in by_instructor.items()})
+        return self._resources
+
+    def fork(self, scenario: dict):
+        """Returns (CSPFork of the base CSP for the scenario, scenario dataset (courses, levels, instructors, rooms))."""
+        data = mapped_scenario(self.dataset, scenario)
+        courses, levels, instructors, rooms = data
+        csp = self.csp.fork()
+
+        plan = session_plan(courses, levels, instructors)
+        changed = {pair for pair in plan.keys() | self.plan.keys() if plan.get(pair) != self.plan.get(pair)}
+        if changed:
+            self._rebuild(csp, changed, data)
+
+        # only the sessions that could use a closed room are filtered (the rebuilt ones don't have it).
+        closed = set(scenario.get("close_rooms", []))
+        by_room = self.resources()[0]
+        names = sorted({name for room_id in closed for name in by_room.get(room_id, ()) if name in csp.domains})
+        csp.remove_values(lambda value: value[0] in closed, names)
+        if self.csp.global_constraints:
+            levels_m = {level.id: level for level in levels}
+            csp.replace_globals(build_global_constraints(csp.variables, csp.domains, levels_m, courses, rooms,
+                                                         self.slots))
+        return csp, data
+
+    def _rebuild(self, csp, changed: set, data):
+        """Replace the sessions of the changed (course, level) pairs by the ones of the scenario data."""
+        courses, levels, instructors, rooms = data
+        codes = {code for code, _ in changed}
+        level_ids = {level_id for _, level_id in changed}
+        variables, domains = build_variables([course for course in courses if course.code in codes],
+                                             [level for level in levels if level.id in level_ids],
+                                             instructors, rooms, self.slots)
+        added = [var for var in variables if (var.course_id, var.level_id) in changed]
+        removed = {var.name for var in csp.variables if (var.course_id, var.level_id) in changed}
+
+        constraints = {}
+        if not self.csp.global_constraints:
+            kept = [var for var in csp.variables if var.name not in removed]
+            constraints = self._link(added, domains, kept, {level.id: level for level in levels})
+        csp.change_variables(removed, added, domains, constraints)
+        if csp.occupancy is not None:
+            # new sections are new student units, the grid of the fork is built again.
+            csp.occupancy = OccupancyGrid.for_csp(csp.variables, csp.domains, {level.id: level for level in levels},
+                                                  self.slots, sorted(room.id for room in rooms),
+                                                  sorted(instructor.instructor_id for instructor in instructors))
+
+    def _link(self, added: list, domains: dict, kept: list, levels_m: dict) -> dict:
+        """
+            The constraints of the added sessions, same rules as build_constraints.
+                the base index of rooms / instructors is a superset for the kept sessions (their domains only
+                shrink in a fork), so a few redundant arcs can be added, never a missing one.
+        """
+        by_room, by_instructor = self.resources()
+        kept_m = {var.name: var for var in kept}
+        added_room, added_instructor = defaultdict(list), defaultdict(list)
+        for var in added:
+            for room_id in {room_id for room_id, _, _ in domains[var.name]}:
+                added_room[room_id].append(var)
+            for iid in {iid for _, iid, _ in domains[var.name]}:
+                added_instructor[iid].append(var)
+
+        by_level = defaultdict(list)
+        for var in kept + added:
+            by_level[var.level_id].append(var)
+
+        constraints = {}
+        for var in added:
+            pair_fns = {}
+            for other in by_level[var.level_id]:
+                if other is not var and students_overlap(var, other, levels_m):
+                    pair_fns[other] = [different_slot]
+            for index, added_index, fn, position in ((by_room, added_room, different_room_slot, 0),
+                                                     (by_instructor, added_instructor, different_instructor_slot, 1)):
+                for key in sorted({value[position] for value in domains[var.name]}):
+                    others = [kept_m[name] for name in index.get(key, ()) if name in kept_m] + added_index[key]
+                    for other in others:
+                        if other is var:
+                            continue
+                        fns = pair_fns.setdefault(other, [])
+                        # different_slot already covers room and instructor clashes.
+                        if different_slot not in fns and fn not in fns:
+                            fns.append(fn)
+            constraints[var.name] = [(other, fn) for other, fns in pair_fns.items() for fn in fns]
+        return constraints
@@ -0,0 +1,31 @@
+from collections import Counter
+
+from config.settings import time_slots as default_time_slots
+
+
+# the first 20 slots (10:45 -> 1:15) are the core hours, the 9:00 and 2:00 slots are only used when needed.
+PREFERRED_SLOTS = frozenset(default_time_slots[:20])
+
+
+def slot_day(timeslot: str) -> str:
+    return timeslot.split("-")[0]
+
+
+def score_assignment(assignment: dict, csp, preferred_slots=PREFERRED_SLOTS) -> int:
+    """
+        Soft constraint penalty of a (partial) assignment, lower is better.
+            - 1 for every session outside the preferred slots.
+            - 1 for every extra session of the same course and group on the same day.
+    """
+    variables = {var.name: var for var in csp.variables}
+
+    penalty = 0
+    per_day = Counter()
+    for name, (_, _, timeslot) in assignment.items():
+        var = variables[name]
+        if timeslot not in preferred_slots:
+            penalty += 1
+        per_day[(var.course_id, var.level_id, var.group, slot_day(timeslot))] += 1
+
+    penalty += sum(count - 1 for count in per_day.values())
+    return penalty
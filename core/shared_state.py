@@ -0,0 +1,149 @@
+"""
+    Shared memory instance for multi-process solvers.
+
+    The parent compiles the CSP once into a shared memory block (same layout as a snapshot file, see
+    core/snapshot.py). Workers attach to it by name instead of receiving a pickled CSP: the initial domains
+    (the bulk of an instance) stay in the block, read-only, and each worker only holds the domains its search
+    currently changes (a domain the trail restores goes back to the block).
+    The constraint graph is not shared: every worker decodes it from the block into the usual Python objects
+    (CSP.constraints and its arc index), which the search reads directly.
+
+    example:
+        with SharedInstance(csp) as instance:                   # parent, owns the block
+            pool = ProcessPoolExecutor(initializer=init, initargs=(instance.name,))
+
+        def init(name):                                         # pool initializer
+            global worker_csp
+            worker_csp = shared_csp(attach_worker(name))
+
+        def task(name, ...):                                    # or one task with its own block
+            with attach(name) as snapshot:
+                csp = shared_csp(snapshot)
+                ...
+"""
+from collections.abc import MutableMapping, Sequence
+from multiprocessing import shared_memory, util
+
+from core.snapshot import Snapshot, snapshot_bytes
+
+
+class SharedDomain(Sequence):
+    """
+        Read-only domain of one variable, decoded from the shared block on access.
+            no view into the block is kept between calls, so the block can be closed once the search is done.
+    """
+    __slots__ = ("_snapshot", "_i")
+
+    def __init__(self, snapshot, i: int):
+        self._snapshot = snapshot
+        self._i = i
+
+    def __len__(self):
+        return len(self._snapshot.domain_codes(self._i))
+
+    def __getitem__(self, k):
+        codes = self._snapshot.domain_codes(self._i)
+        if isinstance(k, slice):
+            return [self._snapshot.decode(code) for code in codes[k]]
+        return self._snapshot.decode(codes[k])
+
+    def __iter__(self):
+        decode = self._snapshot.decode
+        for code in self._snapshot.domain_codes(self._i).tolist():
+            yield decode(code)
+
+    def __repr__(self):
+        return f"SharedDomain({len(self)} values)"
+
+
+class SharedDomains(MutableMapping):
+    """
+        CSP.domains backed by a shared snapshot.
+            reads fall back to the shared initial domain, writes (pruning) stay local. Writing back the
+            shared domain (a trail restore) drops the local one, so local only holds the current changes.
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._index = {name: i for i, name in enumerate(snapshot.var_names)}
+        self.local = {}
+
+    def __getitem__(self, name):
+        domain = self.local.get(name)
+        if domain is None:
+            return SharedDomain(self._snapshot, self._index[name])
+        return domain
+
+    def __setitem__(self, name, domain):
+        i = self._index[name]
+        if isinstance(domain, SharedDomain) and domain._snapshot is self._snapshot and domain._i == i:
+            self.local.pop(name, None)
+        else:
+            self.local[name] = domain
+
+    def __delitem__(self, name):
+        # back to the shared initial domain.
+        del self.local[name]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+
+class SharedInstance:
+    """
+        Shared memory block holding a compiled CSP, owned by the process that created it.
+            close() unmaps it here, unlink() frees it (both are done when used as a context manager).
+    """
+
+    def __init__(self, csp, slots: list[str] = None):
+        data = snapshot_bytes(csp, slots)
+        self._shm = shared_memory.SharedMemory(create=True, size=len(data))
+        self._shm.buf[:len(data)] = data
+        self.name = self._shm.name
+        self.size = len(data)
+
+    def close(self):
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        self.unlink()
+
+
+def _open_block(name: str):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before python 3.13 attaching registers the block again with the resource tracker. Child processes
+        # share the tracker of their parent, which keeps one entry per name, so that's harmless for a pool.
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach(name: str) -> Snapshot:
+    """Attach to a SharedInstance by name, the snapshot must be closed before the process exits."""
+    shm = _open_block(name)
+    return Snapshot(shm.buf, on_close=shm.close)
+
+
+def attach_worker(name: str) -> Snapshot:
+    """attach() for the lifetime of a pool worker process: the snapshot is closed when the process exits."""
+    snapshot = attach(name)
+    util.Finalize(snapshot, snapshot.close, exitpriority=0)
+    return snapshot
+
+
+def shared_csp(snapshot):
+    """CSP whose domains are read from the shared block until the search changes them."""
+    return snapshot.to_csp(domains=SharedDomains(snapshot))
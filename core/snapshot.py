@@ -0,0 +1,242 @@
+"""
+    Compiled binary snapshot of a CSP instance.
+
+    Building the CSP means loading every model from SQLite, mapping the instructors and expanding the domains.
+    A snapshot is written once and every worker process maps the same file read-only (mmap): the integer arrays
+    are used in place through memoryviews, nothing is parsed or unpickled except a small JSON header.
+    The same bytes can be put in a shared memory block instead of a file (core/shared_state.py).
+
+    File layout (little endian, every array section is int32 and 8-byte aligned):
+        MAGIC                       8 bytes
+        header length               uint64
+        header                      JSON: names, model IDs, rooms / instructors / slots, section sizes
+        domain_offsets              n + 1        domain of variable i = domain_codes[offsets[i]:offsets[i+1]]
+        domain_codes                total values ModelStore encoded (room, instructor, slot)
+        neighbor_offsets            n + 1        CSR adjacency
+        neighbor_ids                edges * 2
+        neighbor_kinds              edges * 2    bit mask of the binary constraints on the arc (CONSTRAINT_KINDS)
+"""
+import io
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from core.csp_builder import (different_slot, different_room_slot, different_instructor_slot,
+                              room_slot_key, instructor_slot_key, slot_key, room_key, instructor_key)
+from core.csp_solver import Variable, CSP
+from core.global_constraints import AllDifferent, Capacity
+from core.model_store import ModelStore
+
+MAGIC = b"TTSNAP01"
+
+CONSTRAINT_KINDS = {different_slot: 1, different_room_slot: 2, different_instructor_slot: 4}
+KEY_FUNCTIONS = {fn.__name__: fn for fn in (room_slot_key, instructor_slot_key, slot_key, room_key, instructor_key)}
+
+_SECTIONS = ("domain_offsets", "domain_codes", "neighbor_offsets", "neighbor_ids", "neighbor_kinds")
+
+
+def _as_little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _pad(size: int) -> int:
+    return (8 - size % 8) % 8
+
+
+def _global_spec(csp, constraint) -> dict:
+    if constraint.constraint_type == "all_different":
+        fn, extra = constraint.key_fn, {}
+    else:
+        fn, extra = constraint.resource_fn, {"capacity": constraint.capacity}
+        if not isinstance(constraint.capacity, int):
+            raise ValueError(f"snapshot: capacity of {constraint.name} must be an int")
+
+    if KEY_FUNCTIONS.get(fn.__name__) is not fn:
+        raise ValueError(f"snapshot: unknown key function {fn.__name__} in {constraint.name}")
+
+    return {"type": constraint.constraint_type, "name": constraint.name, "fn": fn.__name__,
+            "variables": [csp.index[name] for name in constraint.variables], **extra}
+
+
+def save_snapshot(csp, path: str, slots: list[str] = None):
+    """
+        Write the compiled CSP (variables, current domains, constraint graph and global constraints).
+            only the constraint functions of core/csp_builder.py can be stored.
+    """
+    with open(path, "wb") as f:
+        f.write(snapshot_bytes(csp, slots))
+
+
+def snapshot_bytes(csp, slots: list[str] = None) -> bytes:
+    """The snapshot of a CSP as bytes (the content save_snapshot writes)."""
+    store = ModelStore.from_csp(csp, slots)
+
+    sections = {name: array("i") for name in _SECTIONS}
+    sections["domain_offsets"].append(0)
+    for codes in store.domains:
+        sections["domain_codes"].extend(codes)
+        sections["domain_offsets"].append(len(sections["domain_codes"]))
+
+    sections["neighbor_offsets"].append(0)
+    for i, var in enumerate(csp.variables):
+        for j in csp.neighbor_ids[i]:
+            kinds = 0
+            for fn in csp.arc_constraints[(var.name, csp.variables[j].name)]:
+                if fn not in CONSTRAINT_KINDS:
+                    raise ValueError(f"snapshot: unknown constraint function {fn!r}")
+                kinds |= CONSTRAINT_KINDS[fn]
+            sections["neighbor_ids"].append(j)
+            sections["neighbor_kinds"].append(kinds)
+        sections["neighbor_offsets"].append(len(sections["neighbor_ids"]))
+
+    header = {
+        "var_names": store.var_names,
+        "courses": store.courses, "levels": store.levels, "groups": store.groups,
+        "var_course": list(store.var_course), "var_level": list(store.var_level),
+        "var_group": list(store.var_group), "var_session": list(store.var_session),
+        "rooms": store.rooms, "instructors": store.instructors, "slots": store.slots,
+        "globals": [_global_spec(csp, constraint) for constraint in csp.global_constraints],
+        "sections": {name: len(values) for name, values in sections.items()},
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    f = io.BytesIO()
+    f.write(MAGIC)
+    f.write(struct.pack("<Q", len(header_bytes)))
+    f.write(header_bytes)
+    f.write(b"\0" * _pad(len(MAGIC) + 8 + len(header_bytes)))
+    for name in _SECTIONS:
+        data = _as_little_endian(sections[name])
+        f.write(data)
+        f.write(b"\0" * _pad(len(data)))
+    return f.getvalue()
+
+
+class Snapshot:
+    """
+        Read-only view of a snapshot held in a buffer (a memory mapped file or a shared memory block).
+            domain_codes(i) / neighbors(i) are zero-copy views into the buffer,
+            to_csp() decodes everything into a regular CSP for the solver.
+    """
+
+    def __init__(self, buffer, on_close=None):
+        self._on_close = on_close
+        self._view = memoryview(buffer)
+
+        if bytes(self._view[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError("not a timetable snapshot")
+        if sys.byteorder != "little":
+            self.close()
+            raise ValueError("snapshot: the arrays are used in place, this needs a little endian machine")
+
+        (header_size,) = struct.unpack_from("<Q", self._view, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(self._view[start:start + header_size]).decode("utf-8"))
+
+        self._arrays = {}
+        offset = start + header_size + _pad(start + header_size)
+        for name in _SECTIONS:
+            size = self.header["sections"][name] * 4
+            self._arrays[name] = self._view[offset:offset + size].cast("i")
+            offset += size + _pad(size)
+
+        self.var_names = self.header["var_names"]
+        self.rooms = self.header["rooms"]
+        self.instructors = self.header["instructors"]
+        self.slots = self.header["slots"]
+
+    @classmethod
+    def open(cls, path: str):
+        """Memory map a snapshot file."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, on_close=mapped.close)
+
+    def close(self):
+        for view in getattr(self, "_arrays", {}).values():
+            view.release()
+        self._view.release()
+        if self._on_close is not None:
+            self._on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.var_names)
+
+    def domain_codes(self, i: int):
+        offsets = self._arrays["domain_offsets"]
+        return self._arrays["domain_codes"][offsets[i]:offsets[i + 1]]
+
+    def neighbors(self, i: int):
+        """Returns (neighbor ids, constraint kind masks) of variable i."""
+        offsets = self._arrays["neighbor_offsets"]
+        start, end = offsets[i], offsets[i + 1]
+        return self._arrays["neighbor_ids"][start:end], self._arrays["neighbor_kinds"][start:end]
+
+    def decode(self, code: int):
+        rest, slot = divmod(code, len(self.slots))
+        room, iid = divmod(rest, len(self.instructors))
+        return self.rooms[room], self.instructors[iid], self.slots[slot]
+
+    def variables(self) -> list:
+        h = self.header
+        return [
+            Variable(name, h["courses"][h["var_course"][i]], h["levels"][h["var_level"][i]], h["var_session"][i],
+                     h["groups"][h["var_group"][i]] if h["var_group"][i] >= 0 else None)
+            for i, name in enumerate(self.var_names)
+        ]
+
+    def to_csp(self, domains=None):
+        """
+            Decode the snapshot into a CSP.
+                domains: mapping to use instead of decoding every domain into lists
+                         (e.g. core.shared_state.SharedDomains, which reads them from the buffer on demand).
+        """
+        variables = self.variables()
+
+        if domains is None:
+            # decode every distinct code once, so the domains share their value tuples.
+            values = {}
+            domains = {}
+            for i, var in enumerate(variables):
+                domain = []
+                for code in self.domain_codes(i):
+                    value = values.get(code)
+                    if value is None:
+                        value = values[code] = self.decode(code)
+                    domain.append(value)
+                domains[var.name] = domain
+
+        kinds = [(bit, fn) for fn, bit in CONSTRAINT_KINDS.items()]
+        constraints = {}
+        for i, var in enumerate(variables):
+            ids, masks = self.neighbors(i)
+            constraints[var.name] = [(variables[j], fn) for j, mask in zip(ids, masks)
+                                     for bit, fn in kinds if mask & bit]
+
+        csp = CSP(variables, domains, constraints)
+        for spec in self.header["globals"]:
+            names = [variables[i].name for i in spec["variables"]]
+            fn = KEY_FUNCTIONS[spec["fn"]]
+            if spec["type"] == "capacity":
+                csp.add_global(Capacity(names, fn, spec["capacity"], spec["name"]))
+            else:
+                csp.add_global(AllDifferent(names, fn, spec["name"], domains))
+        return csp
+
+
+def load_snapshot(path: str):
+    """Map a snapshot and decode it into a CSP."""
+    with Snapshot.open(path) as snapshot:
+        return snapshot.to_csp()
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+from config.settings import CACHE_DB_PATH, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES
+from config.settings import time_slots as default_time_slots
+from core.csp_builder import build_csp
+from core.csp_solver import apply_ac3, backtrack
+
+
+def _normalize_inputs(courses, levels, instructors, rooms, slots, config):
+    """
+        Turn the model objects into plain sorted structures,
+        so the same dataset always gives the same hash whatever order it was loaded in.
+    """
+    return {
+        "courses": sorted(
+            [c.code, c.name, c.type, int(c.time_slots), sorted(map(str, c.course_levels)),
+             sorted(map(str, c.course_instructors))]
+            for c in courses
+        ),
+        "levels": sorted(
+            [str(l.id), l.groups, l.sections, l.max_members_per_section, l.students_count]
+            for l in levels
+        ),
+        "instructors": sorted(
+            [str(i.instructor_id), i.name, i.role, sorted(map(str, i.qualified_courses)),
+             sorted(map(str, i.assigned_courses))]
+            for i in instructors
+        ),
+        "rooms": sorted([str(r.id), r.type, r.capacity] for r in rooms),
+        # the order of the time slots matters (it is the preference order), so it isn't sorted.
+        "time_slots": list(slots),
+        "config": config or {},
+    }
+
+
+def dataset_hash(courses, levels, instructors, rooms, slots=None, config=None) -> str:
+    """Stable sha256 of the normalized inputs and the solver configuration."""
+    slots = default_time_slots if slots is None else slots
+    data = _normalize_inputs(courses, levels, instructors, rooms, slots, config)
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _encode_values(values):
+    return [list(v) for v in values]
+
+
+def _decode_values(values):
+    return [tuple(v) for v in values]
+
+
+class SolutionCache:
+    """
+        SQLite backed cache of solved timetables.
+            key   -> dataset_hash of the inputs
+            value -> the assignment (or None when the dataset is infeasible) and the post AC-3 domains.
+
+        The least recently used entries are evicted once the cache grows over max_entries or max_bytes.
+    """
+
+    def __init__(self, path: str = CACHE_DB_PATH, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS SolutionCache (
+                key TEXT PRIMARY KEY,
+                assignment TEXT,
+                domains TEXT,
+                size INTEGER,
+                last_used REAL
+            );
+        """)
+        self.conn.commit()
+        self._last_tick = 0.0
+
+    def close(self):
+        self.conn.close()
+
+    def _tick(self) -> float:
+        # strictly increasing timestamps, so entries touched within the same clock tick still keep their order.
+        self._last_tick = max(time.time(), self._last_tick + 1e-6)
+        return self._last_tick
+
+    def get(self, key: str):
+        """Return (assignment, domains) for the key or None on a miss."""
+        row = self.conn.execute(
+            "SELECT assignment, domains FROM SolutionCache WHERE key = ?;", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.conn.execute("UPDATE SolutionCache SET last_used = ? WHERE key = ?;", (self._tick(), key))
+        self.conn.commit()
+
+        assignment = json.loads(row[0])
+        if assignment is not None:
+            assignment = {name: tuple(value) for name, value in assignment.items()}
+        domains = {name: _decode_values(values) for name, values in json.loads(row[1]).items()}
+        return assignment, domains
+
+    def put(self, key: str, assignment, domains):
+        encoded_assignment = None
+        if assignment is not None:
+            encoded_assignment = {name: list(value) for name, value in assignment.items()}
+
+        assignment_json = json.dumps(encoded_assignment)
+        domains_json = json.dumps({name: _encode_values(values) for name, values in domains.items()})
+        size = len(assignment_json) + len(domains_json)
+
+        self.conn.execute("""
+            INSERT OR REPLACE INTO SolutionCache (key, assignment, domains, size, last_used)
+            VALUES (?, ?, ?, ?, ?);
+        """, (key, assignment_json, domains_json, size, self._tick()))
+        self._evict()
+        self.conn.commit()
+
+    def _evict(self):
+        """Drop the least recently used entries until the cache fits its limits."""
+        count, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM SolutionCache;"
+        ).fetchone()
+
+        rows = self.conn.execute("SELECT key, size FROM SolutionCache ORDER BY last_used ASC;").fetchall()
+        for key, size in rows:
+            # always keep the newest entry, even if it is bigger than max_bytes on its own.
+            if count <= 1 or (count <= self.max_entries and total <= self.max_bytes):
+                break
+            self.conn.execute("DELETE FROM SolutionCache WHERE key = ?;", (key,))
+            count -= 1
+            total -= size
+
+
+def solve_cached(courses, levels, instructors, rooms, slots=None, cache: SolutionCache = None, config=None):
+    """
+        Build the CSP, run AC-3 and backtracking, unless the same inputs were solved before.
+            returns the assignment dict (var name -> (room, instructor, timeslot)) or None if infeasible.
+    """
+    config = dict(config or {})
+    config.setdefault("ac3", True)
+
+    key = dataset_hash(courses, levels, instructors, rooms, slots, config)
+    if cache is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            return hit[0]
+
+    csp = build_csp(courses, levels, instructors, rooms, slots)
+    consistent = apply_ac3(csp) if config["ac3"] else True
+    domains = {name: list(values) for name, values in csp.domains.items()}
+
+    assignment = backtrack({}, csp) if consistent else None
+    if cache is not None:
+        cache.put(key, assignment, domains)
+    return assignment
@@ -0,0 +1,138 @@
+import asyncio
+import multiprocessing
+import queue
+from contextlib import aclosing
+from concurrent.futures import ProcessPoolExecutor
+
+from models.course import Course
+from models.database import get_connection
+from models.instructor import Instructor
+from models.levels import Level
+from models.room import Room
+
+
+def load_models(db_path: str):
+    """Load every model from the database, returns (courses, levels, instructors, rooms)."""
+    cur = get_connection(db_path).cursor()
+    try:
+        return Course.load_db(cur), Level.load_db(cur), Instructor.load_db(cur), Room.load_db(cur)
+    finally:
+        cur.close()
+
+
+def _solve_job(courses, levels, instructors, rooms, slots, time_budget, node_budget, ac3,
+               progress_queue, stop_event):
+    """Runs inside a worker process: build the CSP and stream the anytime search events back."""
+    # imported here so the worker only pays for the solver modules when it actually solves.
+    from core.anytime import ProgressEvent, solve_anytime
+    from core.csp_builder import build_csp
+    from core.csp_solver import apply_ac3
+
+    csp = build_csp(courses, levels, instructors, rooms, slots)
+    if ac3 and not apply_ac3(csp):
+        return ProgressEvent("infeasible", 0, len(csp.variables), 0, 0.0, {}, 0)
+
+    for event in solve_anytime(csp, time_budget, node_budget, should_stop=stop_event.is_set):
+        if event.done:
+            return event
+        progress_queue.put(event)
+
+
+class SolverService:
+    """
+        asyncio facade over the solver, so the GUI event loop never runs the CPU heavy search itself.
+            - solving runs in a process pool.
+            - DB loading runs in a thread pool.
+            - progress events are streamed back while the search runs.
+
+        usage:
+            async with SolverService() as service:
+                courses, levels, instructors, rooms = await service.load_models("timetable.db")
+                final = await service.solve(courses, levels, instructors, rooms, time_budget=60,
+                                            on_progress=update_progress_bar)
+
+        Cancelling the task awaiting solve() (or calling cancel()) stops the worker search.
+        Leaving the async with (aclose()) waits for the pool in a thread, the event loop keeps running.
+    """
+
+    def __init__(self, max_workers: int = None, poll_interval: float = 0.1):
+        self.poll_interval = poll_interval
+        self._pool = ProcessPoolExecutor(max_workers=max_workers)
+        self._manager = multiprocessing.Manager()
+        self._stop_events = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def close(self):
+        self.cancel()
+        self._shutdown()
+
+    async def aclose(self):
+        """close() for the event loop: waiting for the workers to notice their stop event runs in a thread."""
+        self.cancel()
+        await asyncio.get_running_loop().run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._manager.shutdown()
+
+    def cancel(self):
+        """Stop every running solve, they finish with a "cancelled" event."""
+        for stop_event in self._stop_events:
+            stop_event.set()
+
+    async def load_models(self, db_path: str):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, load_models, db_path)
+
+    async def solve_stream(self, courses, levels, instructors, rooms, slots=None, time_budget: float = None,
+                           node_budget: int = None, ac3: bool = True):
+        """Async generator of ProgressEvents, the last one is the final result (event.done is True)."""
+        loop = asyncio.get_running_loop()
+        progress_queue = self._manager.Queue()
+        stop_event = self._manager.Event()
+        self._stop_events.add(stop_event)
+
+        future = loop.run_in_executor(self._pool, _solve_job, courses, levels, instructors, rooms, slots,
+                                      time_budget, node_budget, ac3, progress_queue, stop_event)
+        try:
+            while not future.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                for event in self._drain(progress_queue):
+                    yield event
+
+            for event in self._drain(progress_queue):
+                yield event
+            yield future.result()
+
+        finally:
+            # runs on cancellation too: tell the worker to stop instead of leaving it searching.
+            stop_event.set()
+            self._stop_events.discard(stop_event)
+
+    async def solve(self, courses, levels, instructors, rooms, slots=None, time_budget: float = None,
+                    node_budget: int = None, ac3: bool = True, on_progress=None):
+        """Solve in a worker process and return the final ProgressEvent."""
+        stream = self.solve_stream(courses, levels, instructors, rooms, slots, time_budget, node_budget, ac3)
+        async with aclosing(stream):
+            async for event in stream:
+                if event.done:
+                    return event
+                if on_progress is not None:
+                    on_progress(event)
+
+    @staticmethod
+    def _drain(progress_queue):
+        events = []
+        while True:
+            try:
+                events.append(progress_queue.get_nowait())
+            except queue.Empty:
+                return events
@@ -0,0 +1,139 @@
+"""
+    Two-phase solving: timeslots (and instructors) first, rooms second.
+
+    Phase 1 searches (instructor, timeslot) for every session, the value is (None, instructor, timeslot) so the
+    rest of the solver (constraints, scoring, anytime search) works unchanged. The room clashes are replaced by
+    counting constraints. The class c(x) of a session is the capacity of the smallest room it fits in, and for
+    each room type and each class t used by that type:
+
+        sessions of the type with c(x) >= t in a timeslot  <=  rooms of the type with capacity >= t
+
+    Phase 2 assigns the rooms of each timeslot with a bipartite matching (max_matching).
+
+    Why phase 2 can't fail once phase 1 holds: a session x can use exactly the rooms of its type with
+    capacity >= c(x), so within a type the room sets of the sessions are nested. For a set S of sessions in one
+    timeslot the rooms they can use together are N(S) = rooms with capacity >= m, m = min c(x) over S, and
+    |S| <= sessions with c(x) >= m <= |N(S)| by the count of class m. This is Hall's condition for every S,
+    so a matching covering every session exists and max_matching finds it.
+"""
+from collections import defaultdict
+
+from core.csp_builder import (ROOM_TYPE_FOR_COURSE, build_variables, build_constraints, instructor_slot_key,
+                              instructor_key, slot_key, student_units, session_units)
+from core.csp_solver import CSP, apply_ac3, backtrack
+from core.global_constraints import AllDifferent, Capacity, max_matching
+from core.occupancy import OccupancyGrid
+from config.settings import time_slots as default_time_slots
+
+
+def room_options(courses: list, levels: list, rooms: list, variables: list) -> dict:
+    """room_options[var] = the rooms the session fits in, smallest first (the matching tries them in this order)."""
+    courses_m = {course.code: course for course in courses}
+    levels_m = {level.id: level for level in levels}
+
+    sizes = {}
+    options = {}
+    for var in variables:
+        course, level = courses_m[var.course_id], levels_m[var.level_id]
+        if (course.code, level.id) not in sizes:
+            sizes[(course.code, level.id)] = dict(session_units(course, level))
+        size = sizes[(course.code, level.id)][var.group]
+        room_type = ROOM_TYPE_FOR_COURSE[course.type.lower()]
+        options[var.name] = [room.id for room in sorted(rooms, key=lambda r: (r.capacity, r.id))
+                             if room.type == room_type and room.capacity >= size]
+    return options
+
+
+def room_count_constraints(variables: list, options: dict, rooms: list) -> list:
+    """One Capacity on the timeslot per (room type, capacity class), see the module docstring."""
+    rooms_m = {room.id: room for room in rooms}
+    by_type = defaultdict(list)
+    for var in variables:
+        fitting = options[var.name]
+        if fitting:
+            room_type = rooms_m[fitting[0]].type
+            # the smallest fitting room gives the threshold class of the session.
+            by_type[room_type].append((rooms_m[fitting[0]].capacity, var.name))
+
+    constraints = []
+    for room_type, members in sorted(by_type.items()):
+        capacities = sorted(room.capacity for room in rooms if room.type == room_type)
+        for threshold in sorted({capacity for capacity, _ in members}):
+            scope = [name for capacity, name in members if capacity >= threshold]
+            available = sum(1 for capacity in capacities if capacity >= threshold)
+            constraints.append(Capacity(scope, slot_key, available, f"rooms_{room_type}_{threshold}"))
+    return constraints
+
+
+def build_phase1(courses: list, levels: list, instructors: list, rooms: list, slots: list[str] = None,
+                 use_globals: bool = False):
+    """
+        The timeslot / instructor CSP of phase 1, returns (csp, room options per session).
+            use_globals: students and instructors as AllDifferent propagators, like build_csp.
+    """
+    variables, full_domains = build_variables(courses, levels, instructors, rooms, slots)
+    levels_m = {level.id: level for level in levels}
+    options = room_options(courses, levels, rooms, variables)
+
+    interned = {}
+    domains = {
+        name: list(dict.fromkeys(interned.setdefault((iid, slot), (None, iid, slot)) for _, iid, slot in values))
+        for name, values in full_domains.items()
+    }
+    del full_domains
+
+    if use_globals:
+        names = [var.name for var in variables]
+        csp = CSP(variables, domains, {name: [] for name in names})
+        csp.add_global(AllDifferent(names, instructor_slot_key, "instructor_clash", domains))
+        csp.add_global(Capacity(names, instructor_key, len(default_time_slots if slots is None else slots),
+                                "instructor_week"))
+        students = defaultdict(list)
+        for var in variables:
+            for unit in student_units(var, levels_m[var.level_id]):
+                students[(var.level_id, unit)].append(var.name)
+        for (level_id, unit), members in sorted(students.items()):
+            if len(members) > 1:
+                csp.add_global(AllDifferent(members, slot_key, f"students_{level_id}_{unit}", domains))
+    else:
+        csp = CSP(variables, domains, build_constraints(variables, domains, levels_m, link_rooms=False))
+
+    for constraint in room_count_constraints(variables, options, rooms):
+        csp.add_global(constraint)
+    # the values have no room yet: the grid only tracks the instructors and the students.
+    csp.occupancy = OccupancyGrid.for_csp(variables, domains, levels_m, slots, [],
+                                          sorted(instructor.instructor_id for instructor in instructors))
+    return csp, options
+
+
+def assign_rooms(assignment: dict, options: dict):
+    """
+        Phase 2: complete a phase 1 assignment with rooms, one matching per timeslot.
+            returns the (room, instructor, timeslot) assignment, None if a timeslot has no perfect matching
+            (only possible when the phase 1 counts were not enforced).
+    """
+    by_slot = defaultdict(list)
+    for name, (_, _, slot) in assignment.items():
+        by_slot[slot].append(name)
+
+    result = {}
+    for slot, names in by_slot.items():
+        matching = max_matching({name: options[name] for name in names})
+        if len(matching) < len(names):
+            return None
+        for name in names:
+            _, iid, _ = assignment[name]
+            result[name] = (matching[name], iid, slot)
+    return result
+
+
+def solve_two_phase(courses: list, levels: list, instructors: list, rooms: list, slots: list[str] = None,
+                    use_globals: bool = False, ac3: bool = True):
+    """Build and solve phase 1, then assign the rooms. Returns the full assignment or None if infeasible."""
+    csp, options = build_phase1(courses, levels, instructors, rooms, slots, use_globals)
+    if ac3 and not apply_ac3(csp):
+        return None
+    assignment = backtrack({}, csp)
+    if assignment is None:
+        return None
+    return assign_rooms(assignment, options)
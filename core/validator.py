@@ -0,0 +1,245 @@
+"""
+    Independent check of a whole timetable (solver output or an imported schedule).
+
+    Every session is encoded once into integer columns (room, instructor, slot, required room type, size),
+    then each rule is one pass over the columns: clashes are duplicate combined keys (room * slots + slot, ...),
+    capacity / room type / qualification are element-wise comparisons. NumPy is used when installed
+    (sorted keys, boolean masks), otherwise the same passes run on plain lists.
+"""
+import time
+
+from config.settings import time_slots as default_time_slots
+from core.csp_builder import ROOM_TYPE_FOR_COURSE, group_student_units, session_units
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class Violation:
+    """One broken rule and the sessions involved, sessions are Solution keys (course, level, group, index)."""
+
+    def __init__(self, kind: str, sessions: list, detail: str = ""):
+        self.kind = kind
+        self.sessions = sessions
+        self.detail = detail
+
+    def __repr__(self):
+        return f"Violation({self.kind}, {len(self.sessions)} session(s), {self.detail})"
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "sessions": [list(key) for key in self.sessions], "detail": self.detail}
+
+
+class ValidationReport:
+    def __init__(self, violations: list, sessions: int, elapsed: float):
+        self.violations = violations
+        self.sessions = sessions
+        self.elapsed = elapsed
+
+    @property
+    def valid(self) -> bool:
+        return not self.violations
+
+    def by_kind(self) -> dict:
+        kinds = {}
+        for violation in self.violations:
+            kinds.setdefault(violation.kind, []).append(violation)
+        return kinds
+
+    def __str__(self):
+        if self.valid:
+            return f"{self.sessions} sessions, no violation ({self.elapsed * 1000:.1f} ms)"
+        lines = [f"{self.sessions} sessions, {len(self.violations)} violation(s) ({self.elapsed * 1000:.1f} ms):"]
+        for kind, violations in sorted(self.by_kind().items()):
+            lines.append(f"  - {kind}: {len(violations)}")
+        return "\n".join(lines)
+
+
+class _Columns:
+    """The sessions of a solution as parallel integer columns (-1 = unknown id)."""
+
+    def __init__(self, entries: dict, courses_m: dict, levels_m: dict, rooms: list, slots: list[str]):
+        self.keys = list(entries)
+        self.room_ids = sorted({room for room, _, _ in entries.values()})
+        self.instructor_ids = sorted({instructor for _, instructor, _ in entries.values()})
+        self.slots = slots
+
+        room_index = {room: i for i, room in enumerate(self.room_ids)}
+        instructor_index = {iid: i for i, iid in enumerate(self.instructor_ids)}
+        slot_index = {slot: i for i, slot in enumerate(slots)}
+        types = sorted(set(ROOM_TYPE_FOR_COURSE.values()) | {room.type for room in rooms})
+        type_index = {room_type: i for i, room_type in enumerate(types)}
+
+        rooms_m = {room.id: room for room in rooms}
+        self.room_capacity = [rooms_m[r].capacity if r in rooms_m else -1 for r in self.room_ids]
+        self.room_type = [type_index[rooms_m[r].type] if r in rooms_m else -1 for r in self.room_ids]
+
+        self.room, self.instructor, self.slot = [], [], []
+        self.need_type, self.size, self.qualified = [], [], []
+        # student units: one entry per (session, unit) it gathers
+        self.unit_session, self.unit = [], []
+        unit_index = {}
+        sizes = {}
+
+        for i, ((course_id, level_id, group, _), (room, instructor, timeslot)) in enumerate(entries.items()):
+            course = courses_m.get(course_id)
+            level = levels_m.get(level_id)
+            self.room.append(room_index[room])
+            self.instructor.append(instructor_index[instructor])
+            self.slot.append(slot_index.get(timeslot, -1))
+
+            room_type = ROOM_TYPE_FOR_COURSE.get(course.type.lower()) if course else None
+            self.need_type.append(type_index.get(room_type, -1))
+            self.qualified.append(course is not None and instructor in course.course_instructors)
+
+            if course is None or level is None:
+                self.size.append(0)
+                continue
+            if (course_id, level_id) not in sizes:
+                sizes[(course_id, level_id)] = dict(session_units(course, level))
+            self.size.append(sizes[(course_id, level_id)].get(group, 0))
+
+            for unit in group_student_units(group, level):
+                self.unit_session.append(i)
+                self.unit.append(unit_index.setdefault((level_id, unit), len(unit_index)))
+
+
+def _duplicates(np, keys) -> list:
+    """Groups (lists of positions) of equal keys appearing more than once, negative keys are ignored."""
+    if np is not None:
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(keys):
+            return []
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        counts = np.diff(np.r_[starts, len(keys)])
+        clashing = (counts > 1) & (sorted_keys[starts] >= 0)
+        return [order[start:start + count].tolist()
+                for start, count in zip(starts[clashing].tolist(), counts[clashing].tolist())]
+
+    positions = {}
+    for i, key in enumerate(keys):
+        if key >= 0:
+            positions.setdefault(key, []).append(i)
+    return [group for group in positions.values() if len(group) > 1]
+
+
+def _where(np, mask) -> list:
+    if np is not None:
+        return np.flatnonzero(mask).tolist()
+    return [i for i, flag in enumerate(mask) if flag]
+
+
+def validate(solution, courses: list, levels: list, instructors: list, rooms: list, slots: list[str] = None,
+             use_numpy: bool = None) -> ValidationReport:
+    """
+        Check every rule of the timetable and report every violation:
+            room_clash, instructor_clash, student_clash: two sessions in the same room / with the same
+                instructor / sharing students at the same timeslot.
+            room_capacity, room_type: the room is too small or of the wrong type for the session.
+            unknown_room, unknown_slot, unqualified_instructor: ids that are not valid for the session.
+            missing_session: a session the courses need but the timetable doesn't have.
+        use_numpy: None = when installed.
+    """
+    start = time.perf_counter()
+    np = _numpy() if use_numpy is not False else None
+    if use_numpy and np is None:
+        raise ImportError("validate(use_numpy=True) needs numpy")
+
+    slots = default_time_slots if slots is None else slots
+    courses_m = {course.code: course for course in courses}
+    levels_m = {level.id: level for level in levels}
+    instructors_m = {instructor.instructor_id: instructor for instructor in instructors}
+    columns = _Columns(solution.entries, courses_m, levels_m, rooms, slots)
+    keys = columns.keys
+    n_slots = len(slots)
+    violations = []
+    reported = set()
+
+    def clashes(kind, entity_ids, entity, slot, sessions):
+        # combined key entity * slots + slot, -1 when the slot is unknown (reported separately).
+        if np is not None:
+            entity, slot = np.asarray(entity, dtype=np.int64), np.asarray(slot, dtype=np.int64)
+            combined = np.where(slot >= 0, entity * n_slots + slot, -1)
+        else:
+            combined = [e * n_slots + s if s >= 0 else -1 for e, s in zip(entity, slot)]
+        for group in _duplicates(np, combined):
+            first = group[0]
+            found = sorted({keys[sessions[i]] for i in group})
+            # a lecture clashing with a lecture of the same group shows up once per section it gathers.
+            if len(found) > 1 and (kind, tuple(found)) not in reported:
+                reported.add((kind, tuple(found)))
+                violations.append(Violation(kind, found, f"{entity_ids[first]} at {slots[slot[first]]}"))
+
+    identity = range(len(keys))
+    clashes("room_clash", [columns.room_ids[r] for r in columns.room], columns.room, columns.slot, identity)
+    clashes("instructor_clash", [columns.instructor_ids[i] for i in columns.instructor],
+            columns.instructor, columns.slot, identity)
+    unit_slots = [columns.slot[i] for i in columns.unit_session]
+    clashes("student_clash", [keys[i][1] for i in columns.unit_session],
+            columns.unit, unit_slots, columns.unit_session)
+
+    if np is not None:
+        room = np.asarray(columns.room, dtype=np.int64)
+        capacity = np.asarray(columns.room_capacity, dtype=np.int64)[room]
+        room_type = np.asarray(columns.room_type, dtype=np.int64)[room]
+        need_type = np.asarray(columns.need_type, dtype=np.int64)
+        size = np.asarray(columns.size, dtype=np.int64)
+        unknown_room = capacity < 0
+        too_small = ~unknown_room & (capacity < size)
+        wrong_type = ~unknown_room & (need_type >= 0) & (room_type != need_type)
+        unknown_slot = np.asarray(columns.slot, dtype=np.int64) < 0
+        unqualified = ~np.asarray(columns.qualified, dtype=bool)
+    else:
+        capacity = [columns.room_capacity[r] for r in columns.room]
+        room_type = [columns.room_type[r] for r in columns.room]
+        unknown_room = [c < 0 for c in capacity]
+        too_small = [c >= 0 and c < s for c, s in zip(capacity, columns.size)]
+        wrong_type = [c >= 0 and need >= 0 and t != need
+                      for c, t, need in zip(capacity, room_type, columns.need_type)]
+        unknown_slot = [s < 0 for s in columns.slot]
+        unqualified = [not q for q in columns.qualified]
+
+    for i in _where(np, unknown_room):
+        violations.append(Violation("unknown_room", [keys[i]], solution.entries[keys[i]][0]))
+    for i in _where(np, too_small):
+        violations.append(Violation("room_capacity", [keys[i]],
+                                    f"{solution.entries[keys[i]][0]} has {capacity[i]} seats, needs {columns.size[i]}"))
+    for i in _where(np, wrong_type):
+        violations.append(Violation("room_type", [keys[i]], solution.entries[keys[i]][0]))
+    for i in _where(np, unknown_slot):
+        violations.append(Violation("unknown_slot", [keys[i]], solution.entries[keys[i]][2]))
+    for i in _where(np, unqualified):
+        instructor = solution.entries[keys[i]][1]
+        if instructor in instructors_m and instructors_m[instructor].is_qualified_for(keys[i][0]):
+            continue
+        violations.append(Violation("unqualified_instructor", [keys[i]], instructor))
+
+    present = set(keys)
+    for course in courses:
+        if ROOM_TYPE_FOR_COURSE.get(course.type.lower()) is None:
+            continue
+        for level_id in sorted(course.course_levels):
+            level = levels_m.get(level_id)
+            if level is None:
+                continue
+            missing = [(course.code, level_id, group, i) for group, _ in session_units(course, level)
+                       for i in range(int(course.time_slots)) if (course.code, level_id, group, i) not in present]
+            if missing:
+                violations.append(Violation("missing_session", missing, f"{len(missing)} session(s)"))
+
+    return ValidationReport(violations, len(keys), time.perf_counter() - start)
+
+
+def validate_assignment(csp, assignment: dict, courses: list, levels: list, instructors: list, rooms: list,
+                        slots: list[str] = None, use_numpy: bool = None) -> ValidationReport:
+    """validate() for an assignment returned by a solver (variable name -> (room, instructor, timeslot))."""
+    from models.solution import Solution
+    return validate(Solution.from_assignment("", csp, assignment), courses, levels, instructors, rooms, slots,
+                    use_numpy)
@@ -0,0 +1,31 @@
+from models.solution import Solution
+
+
+def hints_from_solution(csp, solution: Solution) -> dict:
+    """
+        Map a previous solution onto the current variables.
+            sessions are matched by (course code, level, group/section, session index),
+            values that are not in the current domain anymore (closed room, instructor left, ...) are dropped.
+    """
+    hints = {}
+    for var in csp.variables:
+        value = solution.entries.get((var.course_id, var.level_id, var.group, var.session_index))
+        if value is not None and value in csp.domains[var.name]:
+            hints[var.name] = value
+    return hints
+
+
+def apply_warm_start(csp, solution: Solution) -> int:
+    """
+        Use the previous solution as the value ordering hint of order_domain_values.
+            returns how many sessions got a hint, the rest fall back to the normal LCV ordering.
+    """
+    csp.value_hints = hints_from_solution(csp, solution)
+    return len(csp.value_hints)
+
+
+def load_previous_solution(cur=None, semester: str = None, path: str = None):
+    """Load the previous timetable from the Solutions table or from a JSON file written by Solution.write_file."""
+    if path is not None:
+        return Solution.load_file(path)
+    return Solution.load_db(cur, semester)
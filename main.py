@@ -0,0 +1,239 @@
+"""
+    Headless timetable generator.
+
+    examples:
+        python3 main.py --db timetable.db --out results/
+        python3 main.py --csv data/ --scenarios scenarios/ --workers 4 --time-budget 120 --out results/
+        python3 main.py --db timetable.db --export csv,html --out results/
+        python3 main.py --db timetable.db --profile --out results/
+        python3 main.py --db timetable.db --consistency sac,rpc --consistency-time 20 --out results/
+
+    A scenario is a JSON file describing a what-if variant of the base data:
+        {
+            "close_rooms": ["R101"],                    # rooms that can't be used
+            "add_sections": {"L1": 1},                  # extra sections per level
+            "add_groups": {"L2": 1},                    # extra lecture groups per level
+            "remove_instructors": ["I7"]                # instructors that are not available
+        }
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# NOTE: the solver (and anything heavy it pulls in) is imported inside the functions,
+# so `--help` and argument errors return without loading it.
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate timetables from the database or the CSV files.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", default="timetable.db", help="SQLite database to load (default: timetable.db)")
+    source.add_argument("--csv", metavar="DIR", help="load the CSV files from DIR instead of the database")
+    parser.add_argument("--scenarios", metavar="DIR", help="directory of scenario JSON files to solve")
+    parser.add_argument("--no-base", action="store_true", help="don't solve the unchanged base data")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parallel solver processes")
+    parser.add_argument("--time-budget", type=float, help="seconds allowed per scenario")
+    parser.add_argument("--node-budget", type=int, help="search nodes allowed per scenario")
+    parser.add_argument("--no-ac3", action="store_true", help="skip the AC-3 preprocessing")
+    parser.add_argument("--consistency", metavar="PASSES", default="",
+                        help="stronger preprocessing after AC-3: sac (singleton arc consistency), "
+                             "rpc (restricted path consistency), e.g. sac,rpc")
+    parser.add_argument("--consistency-time", type=float, default=10.0,
+                        help="seconds allowed per consistency pass (default: 10)")
+    parser.add_argument("--ordering", choices=("mrv", "dom/wdeg"), default="mrv",
+                        help="variable ordering, dom/wdeg runs with restarts (default: mrv)")
+    parser.add_argument("--out", metavar="DIR", default="results", help="where the results are written")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile the constraints, writes <out>/<scenario>.profile.txt and .folded")
+    parser.add_argument("--export", metavar="FORMATS", default="",
+                        help="also write per level / instructor / room timetables, e.g. csv,json,html")
+    args = parser.parse_args(argv)
+    args.export = tuple(fmt for fmt in args.export.split(",") if fmt)
+    unknown = set(args.export) - {"csv", "json", "html"}
+    if unknown:
+        parser.error(f"unknown export format(s): {', '.join(sorted(unknown))}")
+    args.consistency = tuple(name for name in args.consistency.split(",") if name)
+    unknown = set(args.consistency) - {"sac", "rpc"}
+    if unknown:
+        parser.error(f"unknown consistency pass(es): {', '.join(sorted(unknown))}")
+    return args
+
+
+def load_dataset(args):
+    """Returns (courses, levels, instructors, rooms)."""
+    if args.csv:
+        from scripts.read_data_from_csv import load_data
+        return load_data(args.csv)
+
+    if not os.path.exists(args.db):
+        sys.exit(f"Database not found: {args.db}")
+
+    from core.solver_service import load_models
+    return load_models(args.db)
+
+
+def load_scenarios(directory: str) -> dict:
+    scenarios = {}
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".json"):
+            with open(os.path.join(directory, file_name)) as f:
+                scenarios[os.path.splitext(file_name)[0]] = json.load(f)
+    return scenarios
+
+
+# the base CSP of a worker process, its scenarios are solved on forks of it (core/scenarios.py).
+_scenario_base = None
+
+
+def init_worker(instance_name: str, dataset):
+    """
+        Pool initializer: the base CSP is compiled once by the parent into a shared memory block
+        (core/shared_state.py), every worker reads its domains from there instead of compiling its own.
+            dataset: the models, which the scenarios are applied to (small next to the domains).
+    """
+    global _scenario_base
+    from core.scenarios import ScenarioBase
+    from core.shared_state import attach_worker, shared_csp
+    _scenario_base = ScenarioBase(dataset, csp=shared_csp(attach_worker(instance_name)))
+
+
+def solve_scenario(name: str, scenario: dict, time_budget, node_budget, ac3: bool,
+                   export_formats=(), out_dir: str = None, ordering: str = "mrv", profile: bool = False,
+                   consistency=(), consistency_time: float = None) -> dict:
+    """
+        Runs in a worker process: fork the base CSP of the worker (init_worker) for the scenario and solve it.
+            only the scenario is sent with the job, the dataset is the one the worker's base was built from.
+            export_formats: the solved timetable views are written to <out_dir>/<name>/ (core/export.py).
+            ordering: "mrv", or "dom/wdeg" with restarts.
+            profile: the cost per constraint type and (course, level) is written to <out_dir>/<name>.profile.txt,
+                     with the flame graph input in <out_dir>/<name>.folded (core/profiler.py).
+            consistency: passes run after AC-3 ("sac", "rpc", core/consistency.py), consistency_time seconds each;
+                         their reports are in the result next to the search time.
+    """
+    from core.anytime import solve_with_budget, solve_with_restarts
+    from core.csp_solver import apply_ac3
+    from core.feasibility import analyze
+
+    if _scenario_base is None:
+        raise RuntimeError("solve_scenario runs in a worker set up by init_worker(dataset)")
+
+    start = time.perf_counter()
+    csp, (courses, levels, instructors, rooms) = _scenario_base.fork(scenario)
+
+    report = analyze(courses, levels, instructors, rooms)
+    if not report.feasible:
+        return {
+            "scenario": name,
+            "status": "infeasible",
+            "bottlenecks": [b.to_dict() for b in report.bottlenecks],
+            "total_seconds": round(time.perf_counter() - start, 3),
+        }
+
+    build_time = time.perf_counter() - start
+
+    profiler = None
+    if profile:
+        from core.profiler import ConstraintProfiler
+        profiler = ConstraintProfiler()
+        profiler.attach(csp)
+
+    reports = []
+    consistent = not ac3 or apply_ac3(csp)
+    if consistent and consistency:
+        from core.consistency import preprocess
+        reports = preprocess(csp, consistency, consistency_time)
+        consistent = reports[-1].consistent
+    search_start = time.perf_counter()
+
+    if not consistent:
+        status, assignment, score, nodes = "infeasible", {}, 0, 0
+    else:
+        if ordering == "dom/wdeg":
+            final = solve_with_restarts(csp, time_budget, node_budget)
+        else:
+            final = solve_with_budget(csp, time_budget, node_budget)
+        status, assignment, score, nodes = final.status, final.best_partial, final.score, final.nodes
+    search_time = time.perf_counter() - search_start
+
+    if profiler is not None:
+        profiler.detach(csp)
+        with open(os.path.join(out_dir, f"{name}.profile.txt"), "w") as f:
+            f.write(profiler.report(by="type") + "\n\n" + profiler.report(by="type_group", limit=50) + "\n")
+        profiler.write_folded(os.path.join(out_dir, f"{name}.folded"))
+
+    if export_formats and status == "solved":
+        from core.export import export_solution
+        from models.solution import Solution
+        export_solution(Solution.from_assignment(name, csp, assignment), os.path.join(out_dir, name), export_formats)
+
+    return {
+        "scenario": name,
+        "status": status,
+        "sessions": len(csp.variables),
+        "assigned": len(assignment),
+        "score": score,
+        "nodes": nodes,
+        "ordering": ordering,
+        "build_seconds": round(build_time, 3),
+        "preprocessing": [report.to_dict() for report in reports],
+        "search_seconds": round(search_time, 3),
+        "total_seconds": round(time.perf_counter() - start, 3),
+        "assignment": {var: list(value) for var, value in sorted(assignment.items())},
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from core.scenarios import ScenarioBase
+    from core.shared_state import SharedInstance
+
+    dataset = load_dataset(args)
+    scenarios = {} if args.no_base else {"base": {}}
+    if args.scenarios:
+        scenarios.update(load_scenarios(args.scenarios))
+    if not scenarios:
+        sys.exit("Nothing to solve.")
+
+    os.makedirs(args.out, exist_ok=True)
+    start = time.perf_counter()
+    summary = []
+
+    # the base CSP is compiled once, here, into shared memory: the workers map it instead of building their own.
+    with SharedInstance(ScenarioBase(dataset).csp) as instance, ProcessPoolExecutor(
+            max_workers=min(args.workers or 1, len(scenarios)),
+            initializer=init_worker, initargs=(instance.name, dataset)) as pool:
+        futures = {
+            pool.submit(solve_scenario, name, scenario,
+                        args.time_budget, args.node_budget, not args.no_ac3, args.export, args.out, args.ordering,
+                        args.profile, args.consistency, args.consistency_time): name
+            for name, scenario in scenarios.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"scenario": name, "status": "error", "error": str(e)}
+
+            with open(os.path.join(args.out, f"{name}.json"), "w") as f:
+                json.dump(result, f, indent=2)
+
+            result.pop("assignment", None)
+            summary.append(result)
+            print(f"{name}: {result['status']} "
+                  f"({result.get('assigned', 0)}/{result.get('sessions', 0)} sessions, "
+                  f"{result.get('total_seconds', 0)}s)")
+
+    summary.sort(key=lambda r: r["scenario"])
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump({"wall_seconds": round(time.perf_counter() - start, 3), "scenarios": summary}, f, indent=2)
+
+    return 0 if all(r["status"] == "solved" for r in summary) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import json
+import sqlite3
+
+
+class Change:
+    """One row change recorded by the ChangeLog triggers (models/database.py)."""
+    __slots__ = ("version", "table", "key", "op")
+
+    def __init__(self, version: int, table: str, key: tuple, op: str):
+        self.version = version
+        self.table = table
+        self.key = key
+        self.op = op
+
+    def __repr__(self):
+        return f"Change({self.version}, {self.op} {self.table}{list(self.key)})"
+
+
+class ChangeLog:
+    """
+        Reader of the ChangeLog table.
+
+        Every insert / update / delete on the model tables appends a row with a strictly increasing version,
+        so a consumer (re-solver, cache, GUI) remembers the last version it saw and only reloads what changed:
+
+            version = ChangeLog.latest_version(cur)
+            ...
+            for table, keys in ChangeLog.changed_keys(ChangeLog.changes_since(cur, version)).items(): ...
+    """
+
+    @classmethod
+    def latest_version(cls, cur: sqlite3.Cursor) -> int:
+        try:
+            cur.execute("SELECT MAX(version) FROM ChangeLog;")
+            return cur.fetchone()[0] or 0
+        except sqlite3.Error as e:
+            print("Error (latest_version):", e)
+            return 0
+
+    @classmethod
+    def changes_since(cls, cur: sqlite3.Cursor, version: int, tables: list[str] = None) -> list[Change]:
+        """Changes with a version greater than `version`, oldest first."""
+        query = "SELECT version, table_name, row_key, op FROM ChangeLog WHERE version > ?"
+        params = [version]
+        if tables:
+            query += f" AND table_name IN ({','.join('?' * len(tables))})"
+            params.extend(tables)
+        try:
+            cur.execute(query + " ORDER BY version;", params)
+            return [Change(v, table, tuple(json.loads(key)), op) for v, table, key, op in cur.fetchall()]
+        except sqlite3.Error as e:
+            print("Error (changes_since):", e)
+            return []
+
+    @classmethod
+    def changed_keys(cls, changes: list[Change]) -> dict:
+        """
+            Collapse changes per row: dict[table][key] = last op.
+                a row inserted then deleted in the range shows as "delete", the consumer just drops it.
+        """
+        keys = {}
+        for change in changes:
+            keys.setdefault(change.table, {})[change.key] = change.op
+        return keys
+
+    @classmethod
+    def prune(cls, cur: sqlite3.Cursor, version: int):
+        """Drop the changes up to `version` once every consumer has seen them (versions are never reused)."""
+        try:
+            cur.execute("DELETE FROM ChangeLog WHERE version <= ?;", (version,))
+        except sqlite3.Error as e:
+            print("Error (prune):", e)
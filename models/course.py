@@ -1,6 +1,12 @@
 import sqlite3
 
+from models.database import (ChangeSummary, savepoint, stage, apply_staged_rows, apply_staged_links,
+                             delete_staged)
+
 class Course:
+    __slots__ = ("code", "name", "type", "time_slots", "course_levels", "course_instructors",
+                 "course_assigned_instructors")
+
     def __init__(self, code: str, name: str, type: str, time_slots: int, course_levels : set[str], 
                 course_instructors : set[str]):
         self.code = code
@@ -45,7 +51,7 @@ class Course:
                 cur.execute("""
                 DELETE FROM CourseLevels 
                         WHERE course_id = ?;
-                """, (self.code))
+                """, (self.code,))
 
             for level_id in self.course_levels:
                 cur.execute("""
@@ -75,6 +81,44 @@ class Course:
         except sqlite3.Error as e:
             print("Error: ", e)
 
+    @classmethod
+    def update_many(cls, cur: sqlite3.Cursor, courses: list["Course"]):
+        """
+            Bulk update_db: the courses and their levels are staged in temp tables and applied with
+            a few set-based statements in one transaction. Returns a ChangeSummary (None on error).
+        """
+        summary = ChangeSummary("Courses")
+        try:
+            with savepoint(cur):
+                stage(cur, "StagedCourses", ("id", "title", "type", "time_slots"),
+                      [(c.code, c.name, c.type, c.time_slots) for c in courses])
+                stage(cur, "StagedCourseLevels", ("course_id", "level_id"),
+                      [(c.code, level_id) for c in courses for level_id in c.course_levels], key_size=2)
+
+                apply_staged_rows(cur, "Courses", "StagedCourses", "id", ("title", "type", "time_slots"), summary)
+                apply_staged_links(cur, "CourseLevels", "StagedCourseLevels", "course_id", "level_id",
+                                   "Courses", "StagedCourses", summary)
+            return summary
+
+        except sqlite3.Error as e:
+            print("Error (update_many):", e)
+            return None
+
+    @classmethod
+    def delete_many(cls, cur: sqlite3.Cursor, codes: list[str]):
+        """Bulk delete_db, returns a ChangeSummary (None on error)."""
+        summary = ChangeSummary("Courses")
+        try:
+            with savepoint(cur):
+                stage(cur, "StagedIds", ("id",), [(code,) for code in codes])
+                delete_staged(cur, "Courses", "StagedIds", ("CourseLevels", "course_id", "level_id"),
+                              (("InstructorCourses", "course_id"),), summary)
+            return summary
+
+        except sqlite3.Error as e:
+            print("Error (delete_many):", e)
+            return None
+
     @classmethod
     def load_db(cls, cur: sqlite3.Cursor):
         query = """
@@ -0,0 +1,292 @@
+"""
+    SQLite access layer shared by the models.
+
+    connect(path) opens a connection with the PRAGMAs below, get_connection(path) returns one pooled
+    connection per database (and per thread), migrate(conn) brings the schema to the latest version.
+    The set-based helpers at the end back the bulk update / delete methods of the models.
+
+    The schema version is stored in PRAGMA user_version, each migration runs once in its own transaction.
+    A database created before the migrations existed (user_version 0) gets migration 1 as a no-op since
+    every statement uses IF NOT EXISTS.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config.settings import DB_PATH, DB_CACHE_SIZE_KB, DB_MMAP_SIZE
+
+PRAGMAS = (
+    "PRAGMA foreign_keys = ON;",
+    "PRAGMA journal_mode = WAL;",               # readers don't block the writer (ignored by :memory:)
+    "PRAGMA synchronous = NORMAL;",             # safe with WAL, fsync only at checkpoints
+    f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB};",
+    f"PRAGMA mmap_size = {DB_MMAP_SIZE};",
+    "PRAGMA temp_store = MEMORY;",
+)
+
+MIGRATIONS = [
+    # 1: base schema
+    """
+    CREATE TABLE IF NOT EXISTS Levels (
+        id TEXT PRIMARY KEY,
+        groups INTEGER,
+        sections INTEGER,
+        max_members_per_section INTEGER,
+        students_count INTEGER DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS Courses (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        type TEXT CHECK(type IN ('Lecture', 'Lab', 'Tutorial', 'Graduation', 'Japanese')),
+        time_slots INTEGER
+    );
+
+    CREATE TABLE IF NOT EXISTS CourseLevels (
+        course_id TEXT,
+        level_id TEXT,
+        PRIMARY KEY (course_id, level_id),
+        FOREIGN KEY (course_id) REFERENCES Courses(id) ON DELETE CASCADE,
+        FOREIGN KEY (level_id) REFERENCES Levels(id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS Instructors (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        role TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS InstructorCourses (
+        instructor_id TEXT,
+        course_id TEXT,
+        PRIMARY KEY (instructor_id, course_id),
+        FOREIGN KEY (instructor_id) REFERENCES Instructors(id) ON DELETE CASCADE,
+        FOREIGN KEY (course_id) REFERENCES Courses(id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS Rooms (
+        id TEXT PRIMARY KEY,
+        type TEXT CHECK(type IN ('Lecture', 'Lab', 'Tutorial')),
+        capacity INTEGER
+    );
+
+    CREATE TABLE IF NOT EXISTS Solutions (
+        semester TEXT,
+        course_id TEXT,
+        level_id TEXT,
+        group_id TEXT,
+        session_index INTEGER,
+        room_id TEXT,
+        instructor_id TEXT,
+        timeslot TEXT,
+        PRIMARY KEY (semester, course_id, level_id, group_id, session_index)
+    );
+    """,
+
+    # 2: covering indexes for the reverse lookups of the association tables (the primary keys only cover
+    # course -> levels and instructor -> courses) and for the per-room / per-instructor timetable queries.
+    """
+    CREATE INDEX IF NOT EXISTS idx_course_levels_level ON CourseLevels (level_id, course_id);
+    CREATE INDEX IF NOT EXISTS idx_instructor_courses_course ON InstructorCourses (course_id, instructor_id);
+    CREATE INDEX IF NOT EXISTS idx_solutions_room ON Solutions (semester, room_id, timeslot);
+    CREATE INDEX IF NOT EXISTS idx_solutions_instructor ON Solutions (semester, instructor_id, timeslot);
+    """,
+]
+
+# change data capture (models/changelog.py): table -> primary key columns, logged as a JSON array.
+TRACKED_TABLES = {
+    "Levels": ("id",),
+    "Courses": ("id",),
+    "CourseLevels": ("course_id", "level_id"),
+    "Instructors": ("id",),
+    "InstructorCourses": ("instructor_id", "course_id"),
+    "Rooms": ("id",),
+    "Solutions": ("semester", "course_id", "level_id", "group_id", "session_index"),
+}
+
+
+def _changelog_migration() -> str:
+    script = ["""
+    CREATE TABLE IF NOT EXISTS ChangeLog (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_key TEXT NOT NULL,
+        op TEXT CHECK(op IN ('insert', 'update', 'delete'))
+    );
+    """]
+    for table, key in TRACKED_TABLES.items():
+        old_key = f"json_array({', '.join('OLD.' + column for column in key)})"
+        new_key = f"json_array({', '.join('NEW.' + column for column in key)})"
+        script.append(f"""
+    CREATE TRIGGER IF NOT EXISTS changelog_{table}_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO ChangeLog (table_name, row_key, op) VALUES ('{table}', {new_key}, 'insert');
+    END;
+    CREATE TRIGGER IF NOT EXISTS changelog_{table}_update AFTER UPDATE ON {table} BEGIN
+        INSERT INTO ChangeLog (table_name, row_key, op) SELECT '{table}', {old_key}, 'delete'
+            WHERE {old_key} <> {new_key};
+        INSERT INTO ChangeLog (table_name, row_key, op) VALUES ('{table}', {new_key},
+            CASE WHEN {old_key} <> {new_key} THEN 'insert' ELSE 'update' END);
+    END;
+    CREATE TRIGGER IF NOT EXISTS changelog_{table}_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO ChangeLog (table_name, row_key, op) VALUES ('{table}', {old_key}, 'delete');
+    END;
+    """)
+    return "".join(script)
+
+
+# 3: change log filled by triggers
+MIGRATIONS.append(_changelog_migration())
+
+# every thread has its own pool: a sqlite3 connection can only be used by the thread that opened it.
+_local = threading.local()
+
+
+def connect(path: str = DB_PATH) -> sqlite3.Connection:
+    """New connection with the PRAGMAs applied."""
+    # the statement cache keeps the prepared model queries across calls on the same connection.
+    conn = sqlite3.connect(path, cached_statements=256)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply the pending migrations, returns the schema version."""
+    version = schema_version(conn)
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        # executescript commits first, so BEGIN / COMMIT make each migration atomic.
+        conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;")
+    return schema_version(conn)
+
+
+def _thread_pool() -> dict:
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = _local.pool = {}
+    return pool
+
+
+def get_connection(path: str = DB_PATH) -> sqlite3.Connection:
+    """
+        Pooled connection to the database, migrated on first use.
+            the same connection is returned for every call in this thread (and process), don't close it
+            (see close_all). The connections of a thread are closed when it ends.
+    """
+    pool = _thread_pool()
+    key = (os.getpid(), os.path.abspath(path) if path != ":memory:" else path)
+    conn = pool.get(key)
+    if conn is None:
+        conn = pool[key] = connect(path)
+        migrate(conn)
+    return conn
+
+
+def close_all():
+    """Close the pooled connections of this thread."""
+    pool = _thread_pool()
+    for key in [key for key in pool if key[0] == os.getpid()]:
+        pool.pop(key).close()
+
+
+class ChangeSummary:
+    """
+        What a bulk operation changed in one table and its association table.
+            updated / deleted: ids of the main rows, links_added / links_removed: (id, other id) pairs.
+    """
+
+    def __init__(self, table: str):
+        self.table = table
+        self.updated = set()
+        self.deleted = set()
+        self.links_added = set()
+        self.links_removed = set()
+
+    @property
+    def changed_ids(self) -> set:
+        """Ids of every main row touched in any way."""
+        return (self.updated | self.deleted
+                | {owner for owner, _ in self.links_added} | {owner for owner, _ in self.links_removed})
+
+    def __bool__(self):
+        return bool(self.updated or self.deleted or self.links_added or self.links_removed)
+
+    def __repr__(self):
+        return (f"ChangeSummary({self.table}: {len(self.updated)} updated, {len(self.deleted)} deleted, "
+                f"+{len(self.links_added)}/-{len(self.links_removed)} links)")
+
+    def to_dict(self) -> dict:
+        return {"table": self.table, "updated": sorted(self.updated), "deleted": sorted(self.deleted),
+                "links_added": sorted(self.links_added), "links_removed": sorted(self.links_removed)}
+
+
+@contextmanager
+def savepoint(cur: sqlite3.Cursor, name: str = "bulk"):
+    """All or nothing block, nested in the caller's transaction if one is open."""
+    cur.execute(f"SAVEPOINT {name};")
+    try:
+        yield
+    except BaseException:
+        cur.execute(f"ROLLBACK TO {name};")
+        cur.execute(f"RELEASE {name};")
+        raise
+    cur.execute(f"RELEASE {name};")
+
+
+def stage(cur: sqlite3.Cursor, name: str, columns: tuple, rows, key_size: int = 1):
+    """(Re)create the temp table `name` keyed on its first key_size columns and fill it with rows."""
+    cur.execute(f"DROP TABLE IF EXISTS temp.{name};")
+    cur.execute(f"CREATE TEMP TABLE {name} ({', '.join(columns)}, "
+                f"PRIMARY KEY ({', '.join(columns[:key_size])})) WITHOUT ROWID;")
+    cur.executemany(f"INSERT OR IGNORE INTO temp.{name} VALUES ({', '.join('?' * len(columns))});", rows)
+
+
+def apply_staged_rows(cur: sqlite3.Cursor, table: str, staged: str, key: str, columns: tuple,
+                      summary: ChangeSummary):
+    """UPDATE ... FROM the staged rows, only the rows whose values differ are written (RETURNING feeds the summary)."""
+    differs = " OR ".join(f"{table}.{column} IS NOT s.{column}" for column in columns)
+    assignments = ", ".join(f"{column} = s.{column}" for column in columns)
+    cur.execute(f"UPDATE {table} SET {assignments} FROM temp.{staged} s "
+                f"WHERE {table}.{key} = s.{key} AND ({differs}) RETURNING {table}.{key};")
+    summary.updated.update(row[0] for row in cur.fetchall())
+
+
+def apply_staged_links(cur: sqlite3.Cursor, table: str, staged: str, owner: str, other: str,
+                       owners_table: str, owners: str, summary: ChangeSummary):
+    """
+        Make the links of every staged owner equal to the staged links:
+            one DELETE ... WHERE NOT EXISTS and one INSERT ... SELECT, whatever the number of owners.
+    """
+    missing = (f"{table}.{owner} IN (SELECT id FROM temp.{owners}) AND NOT EXISTS ("
+               f"SELECT 1 FROM temp.{staged} s WHERE s.{owner} = {table}.{owner} AND s.{other} = {table}.{other})")
+    cur.execute(f"DELETE FROM {table} WHERE {missing} RETURNING {owner}, {other};")
+    summary.links_removed.update(cur.fetchall())
+
+    cur.execute(f"INSERT INTO {table} ({owner}, {other}) "
+                f"SELECT s.{owner}, s.{other} FROM temp.{staged} s WHERE s.{owner} IN (SELECT id FROM {owners_table}) "
+                f"AND NOT EXISTS (SELECT 1 FROM {table} WHERE {table}.{owner} = s.{owner} AND {table}.{other} = s.{other}) "
+                f"RETURNING {owner}, {other};")
+    summary.links_added.update(cur.fetchall())
+
+
+def delete_staged(cur: sqlite3.Cursor, table: str, staged: str, links: tuple, cascades: tuple,
+                  summary: ChangeSummary):
+    """
+        Delete the staged ids from `table` with their rows in the association tables.
+            links: (association table, owner column, other column) whose removed pairs go in the summary.
+            cascades: (table, column) pairs of the other tables referencing the ids.
+    """
+    link_table, owner, other = links
+    cur.execute(f"DELETE FROM {link_table} WHERE {owner} IN (SELECT id FROM temp.{staged}) RETURNING {owner}, {other};")
+    summary.links_removed.update(cur.fetchall())
+
+    # the schema cascades these deletes, done explicitly in case foreign keys are off on the connection.
+    for cascade_table, column in cascades:
+        cur.execute(f"DELETE FROM {cascade_table} WHERE {column} IN (SELECT id FROM temp.{staged});")
+
+    cur.execute(f"DELETE FROM {table} WHERE id IN (SELECT id FROM temp.{staged}) RETURNING id;")
+    summary.deleted.update(row[0] for row in cur.fetchall())
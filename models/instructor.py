@@ -1,12 +1,16 @@
 import sqlite3
 
 from models.course import Course
+from models.database import (ChangeSummary, savepoint, stage, apply_staged_rows, apply_staged_links,
+                             delete_staged)
 from models.levels import Level
 import heapq
 from typing import List, Tuple
 
 
 class Instructor:
+    __slots__ = ("instructor_id", "name", "role", "qualified_courses", "assigned_courses", "time_slots_assigned")
+
     def __init__(self, instructor_id: int, name: str, role: str, qualified_courses: set[str]):
         self.instructor_id = instructor_id
         self.name = name
@@ -81,6 +85,45 @@ class Instructor:
         except sqlite3.Error as e:
             print("Error (delete_db):", e)
 
+    @classmethod
+    def update_many(cls, cur: sqlite3.Cursor, instructors: list["Instructor"]):
+        """
+            Bulk update_db: the instructors and their qualified courses are staged in temp tables and applied
+            with a few set-based statements in one transaction. Returns a ChangeSummary (None on error).
+        """
+        summary = ChangeSummary("Instructors")
+        try:
+            with savepoint(cur):
+                stage(cur, "StagedInstructors", ("id", "name", "role"),
+                      [(i.instructor_id, i.name, i.role) for i in instructors])
+                stage(cur, "StagedInstructorCourses", ("instructor_id", "course_id"),
+                      [(i.instructor_id, course_id) for i in instructors for course_id in i.qualified_courses],
+                      key_size=2)
+
+                apply_staged_rows(cur, "Instructors", "StagedInstructors", "id", ("name", "role"), summary)
+                apply_staged_links(cur, "InstructorCourses", "StagedInstructorCourses", "instructor_id",
+                                   "course_id", "Instructors", "StagedInstructors", summary)
+            return summary
+
+        except sqlite3.Error as e:
+            print("Error (update_many):", e)
+            return None
+
+    @classmethod
+    def delete_many(cls, cur: sqlite3.Cursor, instructor_ids: list[str]):
+        """Bulk delete_db, returns a ChangeSummary (None on error)."""
+        summary = ChangeSummary("Instructors")
+        try:
+            with savepoint(cur):
+                stage(cur, "StagedIds", ("id",), [(instructor_id,) for instructor_id in instructor_ids])
+                delete_staged(cur, "Instructors", "StagedIds",
+                              ("InstructorCourses", "instructor_id", "course_id"), (), summary)
+            return summary
+
+        except sqlite3.Error as e:
+            print("Error (delete_many):", e)
+            return None
+
     @classmethod
     def load_db(cls, cur: sqlite3.Cursor):
         query = """
@@ -1,6 +1,8 @@
 import sqlite3
 
 class Level:
+    __slots__ = ("id", "groups", "sections", "max_members_per_section", "students_count")
+
     def __init__(self, id: str, groups: int, sections: int, max_members_per_section: int, students_count: int):
         self.id = id
         self.groups = groups
@@ -1,6 +1,8 @@
 import sqlite3
 
 class Room:
+    __slots__ = ("id", "type", "capacity")
+
     def __init__(self, id: str, type: str, capacity: int):
         self.id = id
         self.type = type
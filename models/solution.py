@@ -0,0 +1,91 @@
+import json
+import sqlite3
+
+
+class Solution:
+    """
+        A solved timetable of one semester.
+            entries[(course_id, level_id, group_id, session_index)] = (room_id, instructor_id, timeslot)
+    """
+
+    def __init__(self, semester: str, entries: dict = None):
+        self.semester = semester
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def from_assignment(cls, semester: str, csp, assignment: dict):
+        """Build a Solution from the assignment returned by the solver."""
+        entries = {}
+        for var in csp.variables:
+            if var.name in assignment:
+                key = (var.course_id, var.level_id, var.group, var.session_index)
+                entries[key] = tuple(assignment[var.name])
+        return cls(semester, entries)
+
+    def write_to_db(self, cur: sqlite3.Cursor):
+        try:
+            cur.execute("""
+                DELETE FROM Solutions WHERE semester = ?;
+            """, (self.semester,))
+
+            cur.executemany("""
+                INSERT INTO Solutions (semester, course_id, level_id, group_id, session_index,
+                                       room_id, instructor_id, timeslot)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+            """, [(self.semester, *key, *value) for key, value in self.entries.items()])
+
+        except sqlite3.Error as e:
+            print("Error (write_to_db):", e)
+
+    def delete_db(self, cur: sqlite3.Cursor):
+        try:
+            cur.execute("""
+                DELETE FROM Solutions WHERE semester = ?;
+            """, (self.semester,))
+
+        except sqlite3.Error as e:
+            print("Error (delete_db):", e)
+
+    @classmethod
+    def load_db(cls, cur: sqlite3.Cursor, semester: str):
+        """Load the solution of a semester, returns None if there is no stored solution."""
+        try:
+            cur.execute("""
+                SELECT course_id, level_id, group_id, session_index, room_id, instructor_id, timeslot
+                FROM Solutions
+                WHERE semester = ?;
+            """, (semester,))
+
+            rows = cur.fetchall()
+            if not rows:
+                return None
+
+            return cls(semester, {tuple(row[:4]): tuple(row[4:]) for row in rows})
+
+        except sqlite3.Error as e:
+            print("Error (load_db):", e)
+            return None
+
+    def write_file(self, path: str):
+        rows = [
+            {
+                "course_id": course_id, "level_id": level_id, "group_id": group_id,
+                "session_index": session_index, "room_id": room_id,
+                "instructor_id": instructor_id, "timeslot": timeslot,
+            }
+            for (course_id, level_id, group_id, session_index), (room_id, instructor_id, timeslot)
+            in sorted(self.entries.items())
+        ]
+        with open(path, "w") as f:
+            json.dump({"semester": self.semester, "sessions": rows}, f, indent=2)
+
+    @classmethod
+    def load_file(cls, path: str):
+        with open(path) as f:
+            data = json.load(f)
+
+        entries = {}
+        for row in data["sessions"]:
+            key = (row["course_id"], row["level_id"], row["group_id"], int(row["session_index"]))
+            entries[key] = (row["room_id"], row["instructor_id"], row["timeslot"])
+        return cls(data.get("semester", ""), entries)
@@ -0,0 +1,63 @@
+"""
+    Memory used by the solver representations on a large synthetic instance.
+
+        python3 -m scripts.bench_memory
+"""
+import gc
+import tracemalloc
+
+from core.csp_builder import build_variables
+from core.csp_solver import Variable
+from core.model_store import ModelStore
+from scripts.synthetic_data import make_synthetic_dataset
+
+
+class _DictVariable:
+    # the Variable class as it was before __slots__, kept here to compare against.
+    def __init__(self, name, course_id, level_id, session_index, group=None):
+        self.name = name
+        self.course_id = course_id
+        self.level_id = level_id
+        self.session_index = session_index
+        self.group = group
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    dataset = make_synthetic_dataset(levels_count=16, groups=3, sections=9, courses_per_level=10,
+                                     instructors_count=80, rooms_per_type=20)
+    variables, domains = build_variables(*dataset)
+    values = sum(len(d) for d in domains.values())
+    print(f"{len(variables)} sessions, {values} domain values")
+
+    specs = [(v.name, v.course_id, v.level_id, v.session_index, v.group) for v in variables]
+    dict_vars, _ = _measure(lambda: [_DictVariable(*spec) for spec in specs])
+    slot_vars, _ = _measure(lambda: [Variable(*spec) for spec in specs])
+    print(f"variables:  dict {dict_vars / 1e6:8.2f} MB | __slots__ {slot_vars / 1e6:8.2f} MB")
+
+    # a fresh tuple per value, the way domains were built before the values were interned.
+    plain, _ = _measure(lambda: {name: [(r, i, s) for r, i, s in vals] for name, vals in domains.items()})
+    interned, _ = _measure(lambda: {name: list(vals) for name, vals in domains.items()})
+    # the shared tuples themselves are allocated once for the whole instance.
+    interned += _measure(lambda: [(r, i, s) for r, i, s in {v for vals in domains.values() for v in vals}])[0]
+
+    class _Csp:
+        pass
+    csp = _Csp()
+    csp.variables, csp.domains = variables, domains
+    store_size, _ = _measure(lambda: ModelStore.from_csp(csp))
+
+    print(f"domains:    tuples {plain / 1e6:8.2f} MB | interned {interned / 1e6:8.2f} MB "
+          f"| ModelStore {store_size / 1e6:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,35 @@
 import csv
-import glob
+import os
 from models.course import *
+from models.levels import *
 from models.room import *
 from models.instructor import *
 
 
-courses :list[Course]         = []
-instructors :list[Instructor] = []
-rooms :list[Room]             = []
+def load_data(data_dir: str = "."):
+    courses :list[Course]         = []
+    instructors :list[Instructor] = []
+    rooms :list[Room]             = []
+    levels :list[Level]           = []
 
+    # -------- Load Levels --------
+    try:
+        with open(os.path.join(data_dir, "Levels.csv"), newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)  # skip header
+
+            for row in reader:
+                # Format: LevelID,Groups,Sections,MaxMembersPerSection,StudentsCount
+                if len(row) < 5:
+                    continue
+
+                levels.append(Level(row[0].strip(), int(row[1]), int(row[2]), int(row[3]), int(row[4])))
+
+        print(f"Total levels loaded: {len(levels)}")
+
+    except FileNotFoundError:
+        print("File not found: Levels.csv")
 
-def load_data():
     # -------- Load Courses --------
     course_files = [
         "level_1_courses.csv",
@@ -29,22 +48,21 @@ def load_data():
     total_courses = 0
     for file_path in course_files:
         try:
-            with open(file_path, newline='') as f:
+            with open(os.path.join(data_dir, file_path), newline='') as f:
                 reader = csv.reader(f)
                 header = next(reader, None)  # skip header line
 
                 for row in reader:
-                    # Expected: CourseID, CourseName, Type, Capacity_Per_Section
-                    # We ignore Capacity_Per_Section.
-                    if len(row) < 3:
+                    # Expected: CourseID, CourseName, Type, TimeSlots, Levels
+                    if len(row) < 5:
                         continue
 
                     course_id = row[0].strip()
                     name = row[1].strip()
                     type_ = row[2].strip()
-                    time_slots = row[3]
-                    levels = [level.strip() for level in row[4].split(",")]
-                    course = Course(course_id, name, type_, time_slots, levels)
+                    time_slots = int(row[3])
+                    levels_ids = {level.strip() for level in row[4].split(",")}
+                    course = Course(course_id, name, type_, time_slots, levels_ids, set())
                     courses.append(course)
                     total_courses += 1
 
@@ -57,7 +75,7 @@ def load_data():
 
     # -------- Load Instructors --------
     try:
-        with open("Instructors.csv", newline='') as f:
+        with open(os.path.join(data_dir, "Instructors.csv"), newline='') as f:
             reader = csv.reader(f)
             header = next(reader, None)  # skip header
 
@@ -70,9 +88,8 @@ def load_data():
                 instructor_id = row[0].strip()
                 name = row[1].strip()
                 role = row[2].strip()
-                not_pref = row[3].lower()
-                qualified_courses = [r.strip() for r in row[4:] if r.strip()]
-                instructor = Instructor(instructor_id, name, role, not_pref, qualified_courses)
+                qualified_courses = {r.strip() for r in row[4:] if r.strip()}
+                instructor = Instructor(instructor_id, name, role, qualified_courses)
                 instructors.append(instructor)
                 line_count += 1
 
@@ -81,9 +98,16 @@ def load_data():
     except FileNotFoundError:
         print("File not found: Instructors.csv")
 
+    # the CSVs only list the qualified courses per instructor, fill the other direction.
+    courses_by_code = {course.code: course for course in courses}
+    for instructor in instructors:
+        for course_id in instructor.qualified_courses:
+            if course_id in courses_by_code:
+                courses_by_code[course_id].course_instructors.add(instructor.instructor_id)
+
     # -------- Load Rooms --------
     try:
-        with open("Rooms.csv", newline='') as f:
+        with open(os.path.join(data_dir, "Rooms.csv"), newline='') as f:
             reader = csv.reader(f)
             header = next(reader, None)
 
@@ -102,4 +126,4 @@ def load_data():
     except FileNotFoundError:
         print("File not found: Rooms.csv")
 
-    return courses, instructors, rooms
+    return courses, levels, instructors, rooms
@@ -0,0 +1,37 @@
+import random
+
+from models.course import Course
+from models.instructor import Instructor
+from models.levels import Level
+from models.room import Room
+
+
+def make_synthetic_dataset(levels_count: int = 8, groups: int = 2, sections: int = 6, courses_per_level: int = 8,
+                           instructors_count: int = 40, rooms_per_type: int = 12, seed: int = 0):
+    """
+        Random dataset with the same shape as the real one, used by the benchmarks.
+            returns (courses, levels, instructors, rooms)
+    """
+    rng = random.Random(seed)
+
+    levels = [Level(f"L{l}", groups, sections, 30, groups * 60) for l in range(1, levels_count + 1)]
+
+    rooms = []
+    for type_, capacity in (("Lecture", 150), ("Lab", 30), ("Tutorial", 40)):
+        rooms += [Room(f"{type_[:3].upper()}{r}", type_, capacity) for r in range(1, rooms_per_type + 1)]
+
+    instructors = [Instructor(f"I{i}", f"Instructor {i}", rng.choice(["Prof", "TA"]), set())
+                   for i in range(1, instructors_count + 1)]
+
+    courses = []
+    for level in levels:
+        for c in range(1, courses_per_level + 1):
+            type_ = rng.choice(["Lecture", "Lecture", "Lab", "Tutorial"])
+            qualified = rng.sample(instructors, 4)
+            course = Course(f"{level.id}C{c}", f"{level.id} course {c}", type_, rng.choice([1, 2]),
+                            {level.id}, {inst.instructor_id for inst in qualified})
+            for inst in qualified:
+                inst.qualified_courses.add(course.code)
+            courses.append(course)
+
+    return courses, levels, instructors, rooms
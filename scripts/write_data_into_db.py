@@ -1,11 +1,16 @@
-import sqlite3
+from config.settings import DB_PATH
+from models.database import connect, migrate
 from scripts.read_data_from_csv import load_data
 
 def write_to_db():
-    conn = sqlite3.connect("timetable.db")
+    conn = connect(DB_PATH)
+    migrate(conn)
     cur = conn.cursor()    
 
-    courses, instructors, rooms  = load_data()
+    courses, levels, instructors, rooms  = load_data()
+
+    for level in levels:
+        level.write_to_db(cur)
 
     for course in courses:
         course.write_to_db(cur)
@@ -1,5 +1,10 @@
+import io
+import os
+import tempfile
 import unittest
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
 import heapq
 
 # --- Import all your model classes
@@ -8,6 +13,9 @@ from models.levels import Level
 from models.room import Room
 from models.course import Course
 from models.instructor import Instructor
+from models.solution import Solution
+from models import database
+from models.changelog import ChangeLog
 
 # --- Database Schema
 # The exact schema from your script, to be created in-memory
@@ -49,6 +57,17 @@ CREATE TABLE IF NOT EXISTS Rooms (
     type TEXT CHECK(type IN ('Lecture', 'Lab', 'Tutorial')),
     capacity INTEGER
 );
+CREATE TABLE IF NOT EXISTS Solutions (
+    semester TEXT,
+    course_id TEXT,
+    level_id TEXT,
+    group_id TEXT,
+    session_index INTEGER,
+    room_id TEXT,
+    instructor_id TEXT,
+    timeslot TEXT,
+    PRIMARY KEY (semester, course_id, level_id, group_id, session_index)
+);
 """
 
 class TestModelBase(unittest.TestCase):
@@ -256,6 +275,58 @@ class TestCourseModel(TestModelBase):
         res_inst_course = self.cur.execute("SELECT * FROM InstructorCourses").fetchall()
         self.assertEqual(len(res_inst_course), 0)
 
+    def test_course_update_many(self):
+        course2 = Course("C102", "CS Lab", "Lab", 1, {"L1"}, set())
+        self.course1.write_to_db(self.cur)
+        course2.write_to_db(self.cur)
+        self.conn.commit()
+
+        summary = Course.update_many(self.cur, [
+            Course("C101", "Advanced CS", "Lecture", 3, {"L2"}, set()),
+            Course("C102", "CS Lab", "Lab", 1, {"L1", "L2"}, set()),
+            Course("C999", "Unknown", "Lab", 1, {"L1"}, set()),   # not in the db, ignored
+        ])
+        self.conn.commit()
+
+        self.assertEqual(summary.updated, {"C101"})
+        self.assertEqual(summary.links_removed, {("C101", "L1")})
+        self.assertEqual(summary.links_added, {("C101", "L2"), ("C102", "L2")})
+        self.assertEqual(summary.changed_ids, {"C101", "C102"})
+
+        res_levels = self.cur.execute("SELECT course_id, level_id FROM CourseLevels ORDER BY 1, 2").fetchall()
+        self.assertEqual(res_levels, [("C101", "L2"), ("C102", "L1"), ("C102", "L2")])
+        self.assertEqual(self.cur.execute("SELECT title FROM Courses WHERE id='C101'").fetchone()[0], "Advanced CS")
+
+        # nothing changes the second time
+        self.assertFalse(Course.update_many(self.cur, [Course("C101", "Advanced CS", "Lecture", 3, {"L2"}, set())]))
+
+    def test_course_update_many_rolls_back(self):
+        self.course1.write_to_db(self.cur)
+        self.conn.commit()
+
+        # the title is updated first, then linking the unknown level L9 breaks the foreign key:
+        # nothing of the batch may stay.
+        with redirect_stdout(io.StringIO()):
+            self.assertIsNone(Course.update_many(self.cur, [
+                Course("C101", "Renamed", "Lecture", 3, {"L9"}, set()),
+            ]))
+        self.conn.commit()
+        self.assertEqual(self.cur.execute("SELECT title FROM Courses WHERE id='C101'").fetchone()[0], "Intro to CS")
+        self.assertEqual(self.cur.execute("SELECT level_id FROM CourseLevels").fetchall(), [("L1",)])
+
+    def test_course_delete_many(self):
+        self.course1.write_to_db(self.cur)
+        self.inst1.write_to_db(self.cur)
+        self.conn.commit()
+
+        summary = Course.delete_many(self.cur, ["C101", "C999"])
+        self.conn.commit()
+
+        self.assertEqual(summary.deleted, {"C101"})
+        self.assertEqual(summary.links_removed, {("C101", "L1")})
+        self.assertEqual(self.cur.execute("SELECT * FROM Courses").fetchall(), [])
+        self.assertEqual(self.cur.execute("SELECT * FROM InstructorCourses").fetchall(), [])
+
 class TestInstructorModel(TestModelBase):
     """Tests for the Instructor model. Needs to manage relations."""
     
@@ -337,8 +408,176 @@ class TestInstructorModel(TestModelBase):
         res_link = self.cur.execute("SELECT * FROM InstructorCourses").fetchall()
         self.assertEqual(len(res_link), 0)
 
+    def test_instructor_update_many(self):
+        inst2 = Instructor("I102", "TA B", "TA", {"C102"})
+        self.inst1.write_to_db(self.cur)
+        inst2.write_to_db(self.cur)
+        self.conn.commit()
+
+        summary = Instructor.update_many(self.cur, [
+            Instructor("I101", "Dr. A", "Prof", {"C101", "C102"}),
+            Instructor("I102", "Dr. B", "Prof", set()),
+        ])
+        self.conn.commit()
+
+        self.assertEqual(summary.updated, {"I102"})
+        self.assertEqual(summary.links_added, {("I101", "C102")})
+        self.assertEqual(summary.links_removed, {("I102", "C102")})
+
+        res_links = self.cur.execute("SELECT instructor_id, course_id FROM InstructorCourses ORDER BY 1, 2").fetchall()
+        self.assertEqual(res_links, [("I101", "C101"), ("I101", "C102")])
+
+    def test_instructor_delete_many(self):
+        self.inst1.write_to_db(self.cur)
+        self.conn.commit()
+
+        summary = Instructor.delete_many(self.cur, ["I101"])
+        self.conn.commit()
+
+        self.assertEqual(summary.deleted, {"I101"})
+        self.assertEqual(summary.links_removed, {("I101", "C101")})
+        self.assertEqual(self.cur.execute("SELECT * FROM InstructorCourses").fetchall(), [])
+
+class TestSolutionModel(TestModelBase):
+    """Tests for the Solution model."""
+
+    def test_solution_write_and_load(self):
+        solution = Solution("2025-fall", {
+            ("C101", "L1", "G1", 0): ("R101", "I101", "SUN-10:45"),
+            ("C102", "L1", "S2", 1): ("LAB1", "I102", "MON-9:00"),
+        })
+        solution.write_to_db(self.cur)
+        self.conn.commit()
+
+        loaded = Solution.load_db(self.cur, "2025-fall")
+        self.assertEqual(loaded.entries, solution.entries)
+        self.assertIsNone(Solution.load_db(self.cur, "2026-spring"))
+
+    def test_solution_rewrite_replaces_rows(self):
+        Solution("2025-fall", {("C101", "L1", "G1", 0): ("R101", "I101", "SUN-10:45")}).write_to_db(self.cur)
+        Solution("2025-fall", {("C101", "L1", "G1", 0): ("R102", "I101", "MON-10:45")}).write_to_db(self.cur)
+        self.conn.commit()
+
+        loaded = Solution.load_db(self.cur, "2025-fall")
+        self.assertEqual(loaded.entries, {("C101", "L1", "G1", 0): ("R102", "I101", "MON-10:45")})
+
 # --- Algorithm Logic Tests ---
 
+class TestDatabase(unittest.TestCase):
+    """Tests for the connection layer and the schema migrations."""
+
+    def setUp(self):
+        self.conn = database.connect(':memory:')
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_migrate_to_latest_version(self):
+        self.assertEqual(database.migrate(self.conn), len(database.MIGRATIONS))
+        # running it again is a no-op
+        self.assertEqual(database.migrate(self.conn), len(database.MIGRATIONS))
+
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+        self.assertTrue({"Levels", "Courses", "CourseLevels", "Instructors",
+                         "InstructorCourses", "Rooms", "Solutions"} <= tables)
+
+    def test_reverse_lookups_use_covering_index(self):
+        database.migrate(self.conn)
+        plan = self.conn.execute("""
+            EXPLAIN QUERY PLAN SELECT course_id FROM CourseLevels WHERE level_id = ?;
+        """, ("L1",)).fetchall()
+        self.assertIn("COVERING INDEX idx_course_levels_level", plan[0][-1])
+
+        plan = self.conn.execute("""
+            EXPLAIN QUERY PLAN SELECT instructor_id FROM InstructorCourses WHERE course_id = ?;
+        """, ("C1",)).fetchall()
+        self.assertIn("COVERING INDEX idx_instructor_courses_course", plan[0][-1])
+
+    def test_pragmas(self):
+        self.assertEqual(self.conn.execute("PRAGMA foreign_keys;").fetchone()[0], 1)
+        self.assertEqual(self.conn.execute("PRAGMA temp_store;").fetchone()[0], 2)
+
+    def test_pooled_connection(self):
+        conn = database.get_connection(':memory:')
+        try:
+            self.assertIs(database.get_connection(':memory:'), conn)
+            self.assertEqual(database.schema_version(conn), len(database.MIGRATIONS))
+        finally:
+            database.close_all()
+        self.assertIsNot(database.get_connection(':memory:'), conn)
+        database.close_all()
+
+    def test_pooled_connection_per_thread(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pool.db")
+            conn = database.get_connection(path)
+            conn.execute("INSERT INTO Rooms VALUES ('R1', 'Lecture', 100);")
+            conn.commit()
+            try:
+                def read_rooms(_):
+                    pooled = database.get_connection(path)
+                    return pooled is conn, pooled.execute("SELECT id FROM Rooms;").fetchall()
+
+                # e.g. the executor threads of SolverService.load_models.
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    for same, rows in executor.map(read_rooms, range(2)):
+                        self.assertFalse(same)
+                        self.assertEqual(rows, [("R1",)])
+                self.assertIs(database.get_connection(path), conn)
+            finally:
+                database.close_all()
+
+
+class TestChangeLog(unittest.TestCase):
+    """Tests for the trigger based change log."""
+
+    def setUp(self):
+        self.conn = database.connect(':memory:')
+        database.migrate(self.conn)
+        self.cur = self.conn.cursor()
+
+        Level("L1", 1, 2, 30, 60).write_to_db(self.cur)
+        Course("C101", "Intro to CS", "Lecture", 3, {"L1"}, set()).write_to_db(self.cur)
+        self.conn.commit()
+
+    def tearDown(self):
+        self.cur.close()
+        self.conn.close()
+
+    def test_writes_are_logged(self):
+        changes = ChangeLog.changes_since(self.cur, 0)
+        self.assertEqual([(c.table, c.key, c.op) for c in changes], [
+            ("Levels", ("L1",), "insert"),
+            ("Courses", ("C101",), "insert"),
+            ("CourseLevels", ("C101", "L1"), "insert"),
+        ])
+        self.assertEqual([c.version for c in changes], sorted(c.version for c in changes))
+        self.assertEqual(ChangeLog.latest_version(self.cur), changes[-1].version)
+
+    def test_changes_since_version(self):
+        version = ChangeLog.latest_version(self.cur)
+
+        Room("R1", "Lecture", 100).write_to_db(self.cur)
+        Course("C101", "Advanced CS", "Lecture", 3, set(), set()).update_db(self.cur)
+        self.conn.commit()
+
+        keys = ChangeLog.changed_keys(ChangeLog.changes_since(self.cur, version))
+        self.assertEqual(keys, {
+            "Rooms": {("R1",): "insert"},
+            "Courses": {("C101",): "update"},
+            "CourseLevels": {("C101", "L1"): "delete"},
+        })
+        self.assertEqual(ChangeLog.changes_since(self.cur, version, tables=["Rooms"])[0].key, ("R1",))
+
+    def test_prune_keeps_versions_increasing(self):
+        version = ChangeLog.latest_version(self.cur)
+        ChangeLog.prune(self.cur, version)
+        self.assertEqual(ChangeLog.changes_since(self.cur, 0), [])
+
+        Room("R1", "Lecture", 100).write_to_db(self.cur)
+        self.assertGreater(ChangeLog.latest_version(self.cur), version)
+
+
 class TestInstructorMapping(unittest.TestCase):
     """
     Tests the Instructor.map_instructors_to_courses algorithm.
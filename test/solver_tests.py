@@ -0,0 +1,1015 @@
+import asyncio
+import csv
+import json
+import os
+import pickle
+import tempfile
+import time
+import unittest
+
+from models.levels import Level
+from models.room import Room
+from models.course import Course
+from models.instructor import Instructor
+
+from core.csp_builder import build_csp, build_variables, different_slot
+from core.anytime import solve_anytime, solve_with_budget, solve_with_restarts
+from core.csp_solver import backtrack
+from core.csp_solver import CSP, Variable, apply_ac3
+from core.consistency import preprocess, restricted_path_consistency, singleton_arc_consistency
+from core.distributed import allocate, faculties, partition_dataset, solve_distributed
+from core.lazy_domain import LazyDomain
+from core.export import FORMATS, export_solution, render_view
+from core.scenarios import ScenarioBase, apply_scenario, mapped_scenario
+from core.feasibility import analyze
+from core.lns import optimize, repair
+from core.occupancy import OccupancyGrid
+from core.profiler import ConstraintProfiler, constraint_type
+from core.two_phase import assign_rooms, build_phase1, solve_two_phase
+from core.validator import validate, validate_assignment
+from core.global_constraints import AllDifferent, Capacity, max_matching
+from core.model_store import ModelStore
+from core.snapshot import Snapshot, load_snapshot, save_snapshot
+from core.shared_state import SharedInstance, attach, shared_csp
+from core.solver_service import SolverService
+from core.solution_cache import SolutionCache, dataset_hash, solve_cached
+from core.warm_start import apply_warm_start
+from models.solution import Solution
+
+SLOTS = ['SUN-10:45', 'SUN-11:30', 'MON-10:45', 'MON-11:30', 'TUE-10:45', 'TUE-11:30']
+
+
+def make_dataset():
+    """Small dataset: 2 levels, 3 courses, 3 instructors and 4 rooms."""
+    levels = [
+        Level("L1", 1, 2, 30, 60),
+        Level("L2", 1, 1, 40, 40),
+    ]
+    courses = [
+        Course("C101", "Intro to CS", "Lecture", 2, {"L1"}, {"I1"}),
+        Course("C102", "CS Lab", "Lab", 1, {"L1"}, {"I2", "I3"}),
+        Course("C201", "Data Struct", "Lecture", 2, {"L2"}, {"I1", "I3"}),
+    ]
+    instructors = [
+        Instructor("I1", "Dr. A", "Prof", {"C101", "C201"}),
+        Instructor("I2", "TA B", "TA", {"C102"}),
+        Instructor("I3", "Dr. C", "Prof", {"C102", "C201"}),
+    ]
+    rooms = [
+        Room("R1", "Lecture", 100),
+        Room("R2", "Lecture", 50),
+        Room("R3", "Lecture", 80),
+        Room("LAB1", "Lab", 30),
+    ]
+    return courses, levels, instructors, rooms
+
+
+def assert_valid(test, csp, assignment):
+    """Every constraint holds between every pair of assigned sessions."""
+    test.assertEqual(len(assignment), len(csp.variables))
+    for var in csp.variables:
+        test.assertIn(assignment[var.name], csp.domains[var.name] or [assignment[var.name]])
+        for neighbor, fn in csp.constraints[var.name]:
+            test.assertTrue(fn(assignment[var.name], assignment[neighbor.name]))
+
+
+class TestBuildCSP(unittest.TestCase):
+
+    def test_variables_and_domains(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+
+        # C101: 2 sessions * 1 group, C102: 1 session * 2 sections, C201: 2 sessions * 1 group
+        self.assertEqual(len(csp.variables), 6)
+
+        lab = [v for v in csp.variables if v.course_id == "C102"]
+        self.assertEqual({v.group for v in lab}, {"S1", "S2"})
+        for var in lab:
+            self.assertTrue(all(room == "LAB1" for room, _, _ in csp.domains[var.name]))
+
+        # L2 lecture has 40 students: all 3 lecture rooms fit, I1 and I3 can teach it.
+        c201 = [v for v in csp.variables if v.course_id == "C201"][0]
+        self.assertEqual(len(csp.domains[c201.name]), 3 * 2 * len(SLOTS))
+
+    def test_lecture_and_its_sections_clash(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        lecture = next(v for v in csp.variables if v.course_id == "C101")
+        neighbors = {n.name for n in csp.neighbors(lecture)}
+        self.assertIn("C102_L1_S1_0", neighbors)
+        self.assertIn("C102_L1_S2_0", neighbors)
+
+    def test_constraint_index(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        lecture = csp.variables[csp.index["C101_L1_G1_0"]]
+
+        for neighbor in csp.neighbors(lecture):
+            fns = csp.arc_constraints[(lecture.name, neighbor.name)]
+            self.assertEqual(len(fns), len([fn for n, fn in csp.constraints[lecture.name] if n is neighbor]))
+            self.assertIn(csp.index[neighbor.name], csp.neighbor_ids[csp.index[lecture.name]])
+
+        stats = csp.graph_stats()
+        self.assertEqual(stats["variables"], 6)
+        self.assertEqual(stats["max_degree"], max(csp.degree(v) for v in csp.variables))
+        # I1 and I3 can teach both lectures, so L1 and L2 sessions are linked into one component.
+        self.assertEqual(stats["components"], 1)
+
+
+def identity(value):
+    return value
+
+
+class TestGlobalConstraints(unittest.TestCase):
+
+    def make_csp(self, domains):
+        variables = [Variable(name, "C", "L", 0, "G1") for name in domains]
+        return CSP(variables, dict(domains), {name: [] for name in domains})
+
+    def test_max_matching(self):
+        matching = max_matching({"x": ["a", "b"], "y": ["a"], "z": ["b", "c"]})
+        self.assertEqual(len(matching), 3)
+        self.assertEqual(len(set(matching.values())), 3)
+
+    def test_all_different_pigeonhole(self):
+        csp = self.make_csp({"x": ["a", "b"], "y": ["a", "b"], "z": ["a", "b"]})
+        csp.add_global(AllDifferent(["x", "y", "z"], identity))
+        self.assertFalse(apply_ac3(csp))
+
+    def test_all_different_regin_filtering(self):
+        csp = self.make_csp({"x": ["a"], "y": ["a", "b"], "z": ["a", "b", "c"]})
+        csp.add_global(AllDifferent(["x", "y", "z"], identity))
+        self.assertTrue(apply_ac3(csp))
+        self.assertEqual(csp.domains, {"x": ["a"], "y": ["b"], "z": ["c"]})
+
+    def test_all_different_after_backtrack(self):
+        # b, c and d pairwise different with 2 values: found by search only after backtracking past the first
+        # assignment, which restores values pruned when the constraints first saw the domains.
+        domains = {"a": ["n", "k", "m"], "b": ["m", "k"], "c": ["m", "k"], "d": ["k", "m"]}
+        scopes = [["a", "d"], ["b", "c"], ["b", "d"], ["c", "d"]]
+        for indexed in (False, True):
+            csp = self.make_csp(domains)
+            for scope in scopes:
+                csp.add_global(AllDifferent(scope, identity, domains=domains if indexed else None))
+            self.assertIsNone(backtrack({}, csp))
+
+    def test_capacity(self):
+        csp = self.make_csp({"x": ["a"], "y": ["a"], "z": ["a", "b"]})
+        csp.add_global(Capacity(["x", "y", "z"], identity, 2))
+        self.assertTrue(apply_ac3(csp))
+        self.assertEqual(csp.domains["z"], ["b"])
+
+    def test_global_model_matches_binary_model(self):
+        dataset = make_dataset()
+        csp = build_csp(*dataset, slots=SLOTS, use_globals=True)
+        self.assertEqual(len(csp.arc_constraints), 0)
+        self.assertTrue(apply_ac3(csp))
+        assert_valid(self, build_csp(*dataset, slots=SLOTS), backtrack({}, csp))
+
+    def test_global_model_fails_before_search(self):
+        # 3 lab sessions of L1 (one per section) but 1 lab room and 1 timeslot.
+        courses, levels, instructors, rooms = make_dataset()
+        levels[0].sections = 3
+        csp = build_csp(courses, levels, instructors, rooms, slots=SLOTS[:1], use_globals=True)
+        self.assertFalse(apply_ac3(csp))
+
+
+class TestFeasibility(unittest.TestCase):
+
+    def test_feasible_dataset(self):
+        report = analyze(*make_dataset(), slots=SLOTS)
+        self.assertTrue(report.feasible)
+
+    def test_bottlenecks(self):
+        courses, levels, instructors, rooms = make_dataset()
+        levels[0].sections = 7                          # 7 lab sessions, 1 lab room x 6 slots
+        levels[1].students_count = 500                  # no lecture room is that big
+        courses.append(Course("C103", "Maths", "Lecture", 5, {"L1"}, {"I1"}))  # L1: 2 + 5 + 1 > 6
+
+        kinds = {(b.kind, b.subject) for b in analyze(courses, levels, instructors, rooms, SLOTS).bottlenecks}
+        self.assertIn(("room_capacity", "Lab rooms >= 30 seats"), kinds)
+        self.assertIn(("no_room", "Lecture rooms >= 500 seats"), kinds)
+        self.assertIn(("instructor_load", "I1"), kinds)
+        self.assertIn(("student_load", "L1 S1"), kinds)
+
+    def test_no_instructor_once_per_course(self):
+        courses, levels, instructors, rooms = make_dataset()
+        instructors = [i for i in instructors if i.instructor_id == "I1"]     # C102 (2 lab sections) has no one
+
+        bottlenecks = [b for b in analyze(courses, levels, instructors, rooms, SLOTS).bottlenecks
+                       if b.kind == "no_instructor"]
+        self.assertEqual([(b.subject, b.required) for b in bottlenecks], [("C102", 2)])
+
+    def test_shared_course_load(self):
+        # 25 lab sections x 2 sessions taken by the 2 instructors mapped to the course: 50 sessions,
+        # map_instructors_to_courses gives each of them the full load of 50 but they share it.
+        slots = [f"D{day}-{hour}" for day in range(5) for hour in range(6)]
+        levels = [Level("L1", 1, 25, 20, 500)]
+        courses = [Course("C102", "CS Lab", "Lab", 2, {"L1"}, {"I2", "I3"})]
+        instructors = [Instructor("I2", "TA B", "TA", {"C102"}), Instructor("I3", "Dr. C", "Prof", {"C102"})]
+        rooms = [Room("LAB1", "Lab", 30), Room("LAB2", "Lab", 30), Room("LAB3", "Lab", 30)]
+        Instructor.map_instructors_to_courses({i.instructor_id: i for i in instructors},
+                                              {c.code: c for c in courses}, {lv.id: lv for lv in levels})
+        self.assertEqual([i.time_slots_assigned for i in instructors], [50, 50])
+
+        self.assertTrue(analyze(courses, levels, instructors, rooms, slots).feasible)
+        csp = build_csp(courses, levels, instructors, rooms, slots=slots)
+        assert_valid(self, csp, backtrack({}, csp))
+
+        kinds = {(b.kind, b.subject) for b in analyze(courses, levels, instructors, rooms, slots[:24]).bottlenecks}
+        self.assertEqual(kinds, {("instructor_load", "I2 + I3")})
+
+
+class TestModelStore(unittest.TestCase):
+
+    def test_round_trip(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        store = ModelStore.from_csp(csp)
+
+        self.assertEqual(store.to_domains(), csp.domains)
+        value = csp.domains["C201_L2_G1_0"][7]
+        code = store.encode(value)
+        self.assertEqual(store.rooms[store.room_of(code)], value[0])
+        self.assertEqual(store.instructors[store.instructor_of(code)], value[1])
+        self.assertEqual(store.slots[store.slot_of(code)], value[2])
+
+    def test_models_have_no_instance_dict(self):
+        courses, levels, instructors, rooms = make_dataset()
+        csp = build_csp(courses, levels, instructors, rooms, slots=SLOTS)
+        for obj in (courses[0], levels[0], instructors[0], rooms[0], csp.variables[0]):
+            self.assertFalse(hasattr(obj, "__dict__"))
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "instance.snap")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_same_csp(self, csp, loaded):
+        self.assertEqual([v.name for v in loaded.variables], [v.name for v in csp.variables])
+        self.assertEqual([v.group for v in loaded.variables], [v.group for v in csp.variables])
+        self.assertEqual(loaded.domains, csp.domains)
+        self.assertEqual(loaded.arc_constraints, csp.arc_constraints)
+        self.assertEqual([(g.name, g.variables) for g in loaded.global_constraints],
+                         [(g.name, g.variables) for g in csp.global_constraints])
+
+    def test_round_trip(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        save_snapshot(csp, self.path)
+        self.assert_same_csp(csp, load_snapshot(self.path))
+
+    def test_round_trip_with_globals(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS, use_globals=True)
+        save_snapshot(csp, self.path)
+        loaded = load_snapshot(self.path)
+        self.assert_same_csp(csp, loaded)
+        self.assertIsNotNone(backtrack({}, loaded))
+
+    def test_zero_copy_views(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        save_snapshot(csp, self.path)
+        with Snapshot.open(self.path) as snapshot:
+            codes = snapshot.domain_codes(0)
+            self.assertIsInstance(codes, memoryview)
+            self.assertEqual(snapshot.decode(codes[0]), csp.domains[csp.variables[0].name][0])
+            del codes
+
+
+def solve_attached(name):
+    with attach(name) as snapshot:
+        csp = shared_csp(snapshot)
+        return backtrack({}, csp)
+
+
+class TestSharedState(unittest.TestCase):
+
+    def test_domains_read_from_shared_block(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        with SharedInstance(csp) as instance, attach(instance.name) as snapshot:
+            shared = shared_csp(snapshot)
+            for var in csp.variables:
+                self.assertEqual(list(shared.domains[var.name]), csp.domains[var.name])
+            self.assertEqual(shared.arc_constraints, csp.arc_constraints)
+            self.assertEqual(shared.domains.local, {})
+
+    def test_worker_changes_stay_local(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        name = csp.variables[0].name
+        with SharedInstance(csp) as instance:
+            with attach(instance.name) as snapshot:
+                shared = shared_csp(snapshot)
+                initial = shared.domains[name]
+                shared.domains[name] = initial[:1]
+                self.assertEqual(len(shared.domains[name]), 1)
+                # a trail restore goes back to the shared domain, local only holds the current changes.
+                shared.domains[name] = initial
+                self.assertEqual(shared.domains.local, {})
+                del initial
+            with attach(instance.name) as snapshot:
+                self.assertEqual(len(shared_csp(snapshot).domains[name]), len(csp.domains[name]))
+
+    def test_solve_in_worker_process(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        csp = build_csp(*make_dataset(), slots=SLOTS, use_globals=True)
+        with SharedInstance(csp) as instance, ProcessPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(solve_attached, [instance.name] * 2))
+
+        for assignment in results:
+            assert_valid(self, csp, assignment)
+
+
+class TestSolutionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SolutionCache(":memory:", max_entries=2)
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_hash_is_order_independent(self):
+        courses, levels, instructors, rooms = make_dataset()
+        h1 = dataset_hash(courses, levels, instructors, rooms, SLOTS)
+        h2 = dataset_hash(courses[::-1], levels[::-1], instructors[::-1], rooms[::-1], SLOTS)
+        self.assertEqual(h1, h2)
+
+        rooms[0].capacity = 10
+        self.assertNotEqual(h1, dataset_hash(courses, levels, instructors, rooms, SLOTS))
+        self.assertNotEqual(h1, dataset_hash(*make_dataset(), SLOTS, config={"ac3": False}))
+
+    def test_solve_cached_hit(self):
+        dataset = make_dataset()
+        assignment = solve_cached(*dataset, slots=SLOTS, cache=self.cache)
+        assert_valid(self, build_csp(*dataset, slots=SLOTS), assignment)
+
+        key = dataset_hash(*dataset, SLOTS, {"ac3": True})
+        cached_assignment, domains = self.cache.get(key)
+        self.assertEqual(cached_assignment, assignment)
+        self.assertEqual(len(domains), 6)
+        self.assertEqual(solve_cached(*dataset, slots=SLOTS, cache=self.cache), assignment)
+
+    def test_lru_eviction(self):
+        self.cache.put("a", None, {})
+        self.cache.put("b", None, {})
+        self.cache.get("a")
+        self.cache.put("c", None, {})
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+
+
+class TestWarmStart(unittest.TestCase):
+
+    def test_previous_solution_is_reused(self):
+        dataset = make_dataset()
+        csp = build_csp(*dataset, slots=SLOTS)
+        previous = backtrack({}, csp)
+        solution = Solution.from_assignment("2025-fall", csp, previous)
+
+        csp = build_csp(*dataset, slots=SLOTS[::-1])
+        self.assertEqual(apply_warm_start(csp, solution), len(csp.variables))
+        self.assertEqual(backtrack({}, csp), previous)
+
+    def test_invalid_values_fall_back_to_search(self):
+        courses, levels, instructors, rooms = make_dataset()
+        csp = build_csp(courses, levels, instructors, rooms, slots=SLOTS)
+        solution = Solution.from_assignment("2025-fall", csp, backtrack({}, csp))
+
+        # close the room used by the first lecture session.
+        closed = solution.entries[("C101", "L1", "G1", 0)][0]
+        rooms = [r for r in rooms if r.id != closed]
+        csp = build_csp(courses, levels, instructors, rooms, slots=SLOTS)
+        self.assertLess(apply_warm_start(csp, solution), len(csp.variables))
+
+        assignment = backtrack({}, csp)
+        assert_valid(self, build_csp(courses, levels, instructors, rooms, slots=SLOTS), assignment)
+
+
+class TestAnytimeSolver(unittest.TestCase):
+
+    def test_solves_and_reports_progress(self):
+        dataset = make_dataset()
+        csp = build_csp(*dataset, slots=SLOTS)
+        events = list(solve_anytime(csp, report_every=1))
+
+        self.assertTrue(all(not e.done for e in events[:-1]))
+        final = events[-1]
+        self.assertEqual(final.status, "solved")
+        self.assertEqual(final.assigned, final.total)
+        assert_valid(self, build_csp(*dataset, slots=SLOTS), final.best_partial)
+
+    def test_node_budget_returns_best_partial(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        domains = {name: list(values) for name, values in csp.domains.items()}
+
+        final = solve_with_budget(csp, node_budget=3)
+        self.assertEqual(final.status, "node_limit")
+        self.assertEqual(len(final.best_partial), 3)
+        # the interrupted search leaves the CSP as it found it.
+        self.assertEqual(csp.domains, domains)
+
+    def test_infeasible(self):
+        courses, levels, instructors, rooms = make_dataset()
+        rooms = [r for r in rooms if r.type != "Lab"]
+        final = solve_with_budget(build_csp(courses, levels, instructors, rooms, slots=SLOTS), time_budget=5)
+        self.assertEqual(final.status, "infeasible")
+
+    def test_dom_wdeg_with_restarts(self):
+        dataset = make_dataset()
+        csp = build_csp(*dataset, slots=SLOTS)
+        final = solve_with_restarts(csp, time_budget=5, first_cutoff=2)
+        self.assertEqual(final.status, "solved")
+        # the ordering only applies to the restarted runs.
+        self.assertEqual(csp.variable_ordering, "mrv")
+        assert_valid(self, build_csp(*dataset, slots=SLOTS), final.best_partial)
+
+    def test_failures_raise_constraint_weights(self):
+        # each L1 section has 3 sessions (2 lectures, 1 lab) for 2 timeslots: the search keeps wiping domains out.
+        csp = build_csp(*make_dataset(), slots=SLOTS[:2])
+        final = solve_with_restarts(csp, node_budget=50, first_cutoff=5)
+        self.assertIn(final.status, ("infeasible", "node_limit"))
+        self.assertTrue(csp.constraint_weights)
+        self.assertTrue(all(weight > 0 for weight in csp.constraint_weights.values()))
+
+
+class TestLNS(unittest.TestCase):
+    # the early and late slots cost 1 each, a timetable packed into them has room to improve.
+    LATE = ['SUN-9:00', 'SUN-2:00', 'MON-9:00', 'MON-2:00', 'TUE-9:00', 'TUE-2:00']
+
+    def setUp(self):
+        self.dataset = make_dataset()
+        self.initial = backtrack({}, build_csp(*self.dataset, slots=self.LATE))
+        self.csp = build_csp(*self.dataset, slots=self.LATE + SLOTS)
+
+    def test_optimize_lowers_the_score(self):
+        for workers in (0, 2):
+            result = optimize(self.csp, self.initial, time_budget=5, workers=workers, seed=1)
+            self.assertGreater(result.initial_score, 0)
+            self.assertLess(result.score, result.initial_score)
+            assert_valid(self, build_csp(*self.dataset, slots=self.LATE + SLOTS), result.assignment)
+
+    def test_repair_keeps_the_rest_fixed(self):
+        domains = {name: list(values) for name, values in self.csp.domains.items()}
+        names = [name for name in self.initial if name.startswith("C101_")]
+        repaired = repair(self.csp, self.initial, names, node_limit=200, seed=0)
+
+        self.assertIsNotNone(repaired)
+        self.assertEqual(self.csp.domains, domains)
+        for name, value in self.initial.items():
+            if name not in names:
+                self.assertEqual(repaired[name], value)
+        assert_valid(self, self.csp, repaired)
+
+
+class TestOccupancy(unittest.TestCase):
+
+    def test_assign_and_unassign(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        grid = csp.occupancy
+        grid.assign("C101_L1_G1_0", ("R1", "I1", "SUN-10:45"))
+
+        self.assertTrue(grid.room_busy("R1", "SUN-10:45"))
+        self.assertTrue(grid.instructor_busy("I1", "SUN-10:45"))
+        self.assertFalse(grid.room_busy("R1", "SUN-11:30"))
+        # a section of the group shares its students, another level doesn't.
+        self.assertFalse(grid.allows("C102_L1_S1_0", ("LAB1", "I2", "SUN-10:45")))
+        self.assertTrue(grid.allows("C201_L2_G1_0", ("R2", "I3", "SUN-10:45")))
+        self.assertFalse(grid.allows("C201_L2_G1_0", ("R2", "I1", "SUN-10:45")))
+        self.assertEqual(grid.free_rooms("SUN-10:45"), ["LAB1", "R2", "R3"])
+
+        grid.unassign("C101_L1_G1_0")
+        self.assertFalse(grid.room_busy("R1", "SUN-10:45"))
+        self.assertEqual(grid.free_slots("R1", "I1"), SLOTS)
+
+    def test_empty_copy_pickles(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        csp.occupancy.assign("C101_L1_G1_0", ("R1", "I1", "SUN-10:45"))
+        grid = pickle.loads(pickle.dumps(csp.occupancy.empty()))
+
+        self.assertEqual(grid.assigned, {})
+        self.assertFalse(grid.room_busy("R1", "SUN-10:45"))
+        self.assertTrue(csp.occupancy.room_busy("R1", "SUN-10:45"))
+        grid.assign("C101_L1_G1_0", ("R1", "I1", "SUN-10:45"))
+        self.assertFalse(grid.allows("C102_L1_S1_0", ("LAB1", "I2", "SUN-10:45")))
+
+    def test_grid_search_matches_constraint_functions(self):
+        dataset = make_dataset()
+        with_grid = build_csp(*dataset, slots=SLOTS)
+        without = build_csp(*dataset, slots=SLOTS, occupancy=False)
+        self.assertIsNone(without.occupancy)
+
+        assignment = backtrack({}, with_grid)
+        self.assertEqual(assignment, backtrack({}, without))
+        assert_valid(self, without, assignment)
+        self.assertEqual(with_grid.occupancy.assigned, assignment)
+
+        # a second search starts from an empty grid.
+        final = solve_with_budget(with_grid, time_budget=5)
+        self.assertEqual(final.best_partial, assignment)
+
+    def test_from_solution(self):
+        dataset = make_dataset()
+        csp = build_csp(*dataset, slots=SLOTS)
+        solution = Solution.from_assignment("S1", csp, backtrack({}, csp))
+        grid = OccupancyGrid.from_solution(solution, dataset[1], SLOTS)
+
+        for (room, iid, slot) in solution.entries.values():
+            self.assertTrue(grid.room_busy(room, slot))
+            self.assertTrue(grid.instructor_busy(iid, slot))
+            self.assertNotIn(room, grid.free_rooms(slot))
+        self.assertEqual(sum(map(sum, grid.as_arrays()["rooms"])), len(solution.entries))
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_constraint_types(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        self.assertEqual(constraint_type(csp.arc_constraints[("C101_L1_G1_0", "C102_L1_S1_0")]), "binary:students")
+        self.assertEqual(constraint_type(csp.arc_constraints[("C101_L1_G1_0", "C201_L2_G1_0")]),
+                         "binary:instructor+room")
+        self.assertEqual(constraint_type(identity), "binary:identity")
+
+        globals_csp = build_csp(*make_dataset(), slots=SLOTS, use_globals=True)
+        self.assertEqual({constraint_type(c) for c in globals_csp.global_constraints},
+                         {"all_different:room", "all_different:instructor", "all_different:students",
+                          "capacity:room", "capacity:instructor", "capacity:rooms"})
+
+    def test_profile_binary_model(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        profiler = ConstraintProfiler()
+        with profiler.attached(csp):
+            apply_ac3(csp)
+            backtrack({}, csp)
+        self.assertIsNone(csp.profiler)
+
+        totals = profiler.totals("type")
+        self.assertIn("binary:students", totals)
+        self.assertGreater(sum(stats.checks for stats in totals.values()), 0)
+        self.assertGreater(sum(stats.pruned for stats in totals.values()), 0)
+        self.assertEqual(set(profiler.totals("phase")), {"ac3", "search"})
+        self.assertIn(("C102", "L1"), profiler.totals("group"))
+
+        lines = profiler.report(by="type", sort="checks").splitlines()
+        checks = [int(line.split()[2]) for line in lines[1:]]
+        self.assertEqual(checks, sorted(checks, reverse=True))
+        for line in profiler.folded():
+            stack, micros = line.rsplit(" ", 1)
+            self.assertEqual(len(stack.split(";")), 4)
+            self.assertGreater(int(micros), 0)
+
+    def test_profile_global_constraints(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS, use_globals=True)
+        profiler = ConstraintProfiler()
+        with profiler.attached(csp):
+            backtrack({}, csp)
+        totals = profiler.totals("type")
+        self.assertGreater(totals["all_different:students"].pruned, 0)
+        self.assertEqual(totals["all_different:room"].calls, len(csp.variables))
+
+
+class TestConsistency(unittest.TestCase):
+
+    def make_csp(self, slots):
+        """Sessions of the same students (pairwise different_slot), slots[name] = their timeslots."""
+        variables = [Variable(name, "C", "L", 0, "G1") for name in slots]
+        domains = {name: [(f"R{name}", f"I{name}", slot) for slot in slots[name]] for name in slots}
+        constraints = {var.name: [(other, different_slot) for other in variables if other is not var]
+                       for var in variables}
+        return CSP(variables, domains, constraints)
+
+    def test_sac_removes_what_ac3_keeps(self):
+        csp = self.make_csp({"x": SLOTS[:3], "y": SLOTS[:2], "z": SLOTS[:2]})
+        self.assertTrue(apply_ac3(csp))
+        self.assertEqual(len(csp.domains["x"]), 3)
+
+        report = singleton_arc_consistency(csp)
+        self.assertTrue(report.consistent)
+        self.assertFalse(report.timed_out)
+        self.assertEqual((report.values_ac3, report.values_after, report.removed), (7, 5, 2))
+        self.assertEqual(csp.domains["x"], [("Rx", "Ix", SLOTS[2])])
+        self.assertEqual(len(csp.domains["y"]), 2)
+
+    def test_sac_proves_inconsistency(self):
+        # three sessions of the same students, two timeslots: arc consistent, but no solution.
+        csp = self.make_csp({"x": SLOTS[:2], "y": SLOTS[:2], "z": SLOTS[:2]})
+        self.assertTrue(apply_ac3(csp))
+        self.assertFalse(singleton_arc_consistency(csp).consistent)
+
+    def test_rpc_on_high_degree_variables(self):
+        csp = self.make_csp({"x": SLOTS[:3], "y": SLOTS[:2], "z": SLOTS[:2]})
+        report = restricted_path_consistency(csp, min_degree=3)
+        self.assertEqual((report.removed, report.checks), (0, 0))
+
+        report = restricted_path_consistency(csp)
+        self.assertEqual(report.removed, 2)
+        self.assertEqual(csp.domains["x"], [("Rx", "Ix", SLOTS[2])])
+
+    def test_time_cap(self):
+        csp = self.make_csp({"x": SLOTS[:3], "y": SLOTS[:2], "z": SLOTS[:2]})
+        report = singleton_arc_consistency(csp, time_limit=0)
+        self.assertTrue(report.timed_out)
+        self.assertEqual(report.removed, 0)
+        self.assertEqual(report.to_dict()["values_after"], 7)
+
+    def test_preprocess_keeps_solutions(self):
+        for use_globals in (False, True):
+            csp = build_csp(*make_dataset(), slots=SLOTS, use_globals=use_globals)
+            reports = preprocess(csp, ("sac", "rpc"))
+            self.assertEqual([report.method for report in reports], ["sac", "rpc"])
+            self.assertTrue(all(report.consistent for report in reports))
+            assert_valid(self, build_csp(*make_dataset(), slots=SLOTS), backtrack({}, csp))
+
+
+class TestDistributed(unittest.TestCase):
+
+    def test_partition_by_faculty(self):
+        data = mapped_scenario(make_dataset(), {})
+        parts, shared_rooms, shared_instructors = partition_dataset(data)
+        self.assertEqual([part.part_id for part in parts], ["L1", "L2"])
+        self.assertEqual(shared_rooms, {"R1", "R2", "R3", "LAB1"})
+        self.assertEqual(shared_instructors, {"I3"})
+        self.assertEqual([part.sessions for part in parts], [4, 2])
+
+        # a course of both levels puts them in one faculty.
+        courses, levels, _, _ = make_dataset()
+        courses[0].course_levels = {"L1", "L2"}
+        self.assertEqual(faculties(courses, levels), {"L1": "L1", "L2": "L1"})
+
+        # rooms of one faculty are not shared.
+        parts, shared_rooms, _ = partition_dataset(data, {"L1": "A", "L2": "B", "LAB1": "A"})
+        self.assertEqual(shared_rooms, {"R1", "R2", "R3"})
+        self.assertNotIn("LAB1", [room.id for room in parts[1].data[3]])
+
+    def test_allocate_deals_every_timeslot_once(self):
+        data = mapped_scenario(make_dataset(), {})
+        parts, shared_rooms, shared_instructors = partition_dataset(data)
+        quota = allocate(parts, data[3], shared_rooms, shared_instructors, SLOTS)
+        l1_rooms, l1_instructors = quota["L1"]
+        l2_rooms, l2_instructors = quota["L2"]
+        self.assertFalse(l1_rooms & l2_rooms or l1_instructors & l2_instructors)
+        self.assertEqual(len(l1_rooms | l2_rooms), 3 * len(SLOTS) + len(SLOTS))
+        # only L1 has lab sessions.
+        self.assertEqual({room_id for room_id, _ in l2_rooms}, {"R1", "R2", "R3"})
+        self.assertEqual(len(l1_instructors), len(l2_instructors))
+
+    def test_solve_distributed(self):
+        for scenario, slots in (({}, SLOTS), ({"add_groups": {"L2": 1}}, SLOTS[:4])):
+            data = mapped_scenario(make_dataset(), scenario)
+            result = solve_distributed(data, time_budget=30, workers=2, slots=slots)
+            self.assertEqual(result.status, "solved")
+            self.assertEqual(result.conflicts, 0)
+            assert_valid(self, build_csp(*data, slots=slots), result.assignment)
+        # the quota split of the second one doesn't work, the parts negotiate.
+        self.assertGreater(result.rounds, 1)
+
+    def test_infeasible_part(self):
+        # the lecture and the labs of L1 can't fit in 3 timeslots with one lab room.
+        data = mapped_scenario(make_dataset(), {})
+        result = solve_distributed(data, time_budget=30, workers=1, slots=SLOTS[:3])
+        self.assertEqual(result.status, "infeasible")
+
+    def test_worker_lost(self):
+        import socket
+        import threading
+        from multiprocessing.connection import Client
+
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            address = sock.getsockname()
+        results = []
+        coordinator = threading.Thread(target=lambda: results.append(solve_distributed(
+            mapped_scenario(make_dataset(), {}), time_budget=30, workers=1, slots=SLOTS, address=address,
+            authkey=b"test")))
+        coordinator.start()
+        for _ in range(100):
+            try:
+                conn = Client(address, authkey=b"test")
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+        # the worker dies after getting its parts, before answering.
+        self.assertEqual(conn.recv()[0], "part")
+        conn.close()
+        coordinator.join(10)
+        self.assertFalse(coordinator.is_alive())
+        self.assertEqual(results[0].status, "worker_lost")
+
+
+class TestLazyDomain(unittest.TestCase):
+
+    def test_size_and_exclusions(self):
+        domain = LazyDomain(["R1", "R2"], ["I1", "I2"], SLOTS[:3])
+        self.assertEqual(len(domain), 12)
+        self.assertEqual(domain[0], ("R1", "I1", SLOTS[0]))
+        self.assertEqual(domain[-1], ("R2", "I2", SLOTS[2]))
+
+        smaller = domain.exclude(slots=[SLOTS[0]], rooms=[("R1", SLOTS[1])], instructors=[("I2", SLOTS[2])])
+        self.assertEqual(len(domain), 12)
+        self.assertEqual(len(smaller), 2 + 2)
+        self.assertEqual(len(smaller), len(list(smaller)))
+        self.assertNotIn(("R1", "I1", SLOTS[0]), smaller)
+        self.assertNotIn(("R1", "I2", SLOTS[1]), smaller)
+        self.assertIn(("R2", "I1", SLOTS[2]), smaller)
+        self.assertIs(smaller.exclude(rooms=[("R9", SLOTS[1])]), smaller)
+        self.assertEqual(smaller.slot_counts(), {SLOTS[1]: 2, SLOTS[2]: 2})
+        self.assertEqual(smaller.instructor_counts()[("I1", SLOTS[1])], 1)
+
+    def test_same_values_as_the_lists(self):
+        variables, domains = build_variables(*make_dataset(), slots=SLOTS)
+        _, lazy = build_variables(*make_dataset(), slots=SLOTS, lazy=True)
+        for var in variables:
+            self.assertIsInstance(lazy[var.name], LazyDomain)
+            self.assertEqual(lazy[var.name], domains[var.name])
+        # the sessions of a group share one domain.
+        self.assertIs(lazy["C101_L1_G1_0"], lazy["C101_L1_G1_1"])
+
+    def test_grid_restrict_matches_allows(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS, lazy=True)
+        grid = csp.occupancy
+        grid.assign("C101_L1_G1_0", ("R1", "I1", SLOTS[0]))
+        grid.assign("C201_L2_G1_0", ("R2", "I3", SLOTS[1]))
+        for name in ("C101_L1_G1_1", "C102_L1_S1_0", "C201_L2_G1_1"):
+            domain = csp.domains[name]
+            self.assertEqual(list(grid.restrict(name, domain)), [v for v in domain if grid.allows(name, v)])
+
+    def test_lazy_search_matches_lists(self):
+        for use_globals in (False, True):
+            eager = build_csp(*make_dataset(), slots=SLOTS, use_globals=use_globals)
+            lazy = build_csp(*make_dataset(), slots=SLOTS, use_globals=use_globals, lazy=True)
+            self.assertEqual(eager.arc_constraints.keys(), lazy.arc_constraints.keys())
+            self.assertTrue(apply_ac3(lazy))
+            assignment = backtrack({}, lazy)
+            self.assertEqual(assignment, backtrack({}, eager))
+            assert_valid(self, build_csp(*make_dataset(), slots=SLOTS), assignment)
+
+    def test_pickle(self):
+        domain = LazyDomain(["R1"], ["I1", "I2"], SLOTS).exclude(slots=[SLOTS[0]])
+        self.assertEqual(pickle.loads(pickle.dumps(domain)), domain)
+
+
+class TestSolverService(unittest.TestCase):
+
+    def test_async_solve(self):
+        dataset = make_dataset()
+
+        async def run():
+            async with SolverService(max_workers=1) as service:
+                return await service.solve(*dataset, slots=SLOTS, time_budget=30)
+
+        final = asyncio.run(run())
+        self.assertEqual(final.status, "solved")
+        assert_valid(self, build_csp(*dataset, slots=SLOTS), final.best_partial)
+
+    def test_cancel_running_solve(self):
+        # 12 lab sessions for 11 timeslots of one lab room: without AC-3 the search runs for a long time.
+        courses, levels, instructors, rooms = make_dataset()
+        levels[0].sections = 12
+        slots = [f"D{i}-10:45" for i in range(11)]
+
+        async def run():
+            async with SolverService(max_workers=1) as service:
+                solving = asyncio.create_task(service.solve(courses, levels, instructors, rooms, slots=slots,
+                                                            ac3=False))
+                await asyncio.sleep(1)
+                self.assertFalse(solving.done())
+                service.cancel()
+                started = time.perf_counter()
+                final = await asyncio.wait_for(solving, 5)
+                return final, time.perf_counter() - started
+
+        final, elapsed = asyncio.run(run())
+        self.assertEqual(final.status, "cancelled")
+        self.assertLess(elapsed, 2)
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        self.solution = Solution.from_assignment("2025-fall", csp, backtrack({}, csp))
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_export_every_view(self):
+        paths = export_solution(self.solution, self.tmp.name, formats=FORMATS, slots=SLOTS)
+
+        rooms = {room for room, _, _ in self.solution.entries.values()}
+        instructors = {instructor for _, instructor, _ in self.solution.entries.values()}
+        self.assertEqual(len(paths), (2 + len(rooms) + len(instructors)) * len(FORMATS))
+
+        with open(os.path.join(self.tmp.name, "level", "L1.csv"), newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), sum(1 for key in self.solution.entries if key[1] == "L1"))
+        self.assertEqual([row["timeslot"] for row in rows],
+                         sorted((row["timeslot"] for row in rows), key=SLOTS.index))
+
+        with open(os.path.join(self.tmp.name, "level", "L2.json")) as f:
+            data = json.load(f)
+        self.assertEqual(data["entity"], "L2")
+        self.assertEqual({row["course_id"] for row in data["sessions"]}, {"C201"})
+
+    def test_sanitised_names_are_unique(self):
+        rooms = sorted({room for room, _, _ in self.solution.entries.values()})[:2]
+        renamed = dict(zip(rooms, ("A/B", "A_B")))
+        for key, (room, instructor, slot) in self.solution.entries.items():
+            self.solution.entries[key] = (renamed.get(room, room), instructor, slot)
+
+        paths = export_solution(self.solution, self.tmp.name, formats=("json",), views=("room",), slots=SLOTS)
+        self.assertEqual(len(set(paths)), len(paths))
+        self.assertIn(os.path.join(self.tmp.name, "room", "A_B.json"), paths)
+        entities = set()
+        for path in paths:
+            with open(path) as f:
+                entities.add(json.load(f)["entity"])
+        self.assertTrue({"A/B", "A_B"} <= entities)
+
+    def test_render_view(self):
+        page = render_view(self.solution, "instructor", "I1", "html", slots=SLOTS)
+        self.assertIn("<table", page)
+        self.assertIn("C101", page)
+        self.assertNotIn("C102", page)
+
+
+class TestTwoPhase(unittest.TestCase):
+
+    def test_solve(self):
+        dataset = make_dataset()
+        csp = build_csp(*dataset, slots=SLOTS)
+        for use_globals in (False, True):
+            assignment = solve_two_phase(*dataset, slots=SLOTS, use_globals=use_globals)
+            assert_valid(self, csp, assignment)
+
+    def test_phase1_domains_have_no_rooms(self):
+        dataset = make_dataset()
+        phase1, options = build_phase1(*dataset, slots=SLOTS)
+        full = build_csp(*dataset, slots=SLOTS)
+        name = "C101_L1_G1_0"
+        self.assertEqual(len(phase1.domains[name]), len(full.domains[name]) // len(options[name]))
+        # smallest room first: R3 (80) before R1 (100), R2 (50) is too small for 60 students.
+        self.assertEqual(options[name], ["R3", "R1"])
+
+    def test_room_counts(self):
+        # two lab sections and a single lab room: at most one lab per timeslot.
+        dataset = make_dataset()
+        phase1, options = build_phase1(*dataset, slots=SLOTS)
+        labs = next(c for c in phase1.global_constraints if c.name == "rooms_Lab_30")
+        self.assertEqual((labs.capacity, len(labs.variables)), (1, 2))
+
+        # phase 2 alone can't place them once the count is broken.
+        crowded = {name: (None, "I2", SLOTS[0]) for name in labs.variables}
+        self.assertIsNone(assign_rooms(crowded, options))
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestValidator(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = make_dataset()
+        csp = build_csp(*self.dataset, slots=SLOTS)
+        self.solution = Solution.from_assignment("", csp, backtrack({}, csp))
+        self.csp = csp
+
+    def kinds(self, report):
+        return sorted(v.kind for v in report.violations)
+
+    def test_solver_output_is_valid(self):
+        csp = build_csp(*self.dataset, slots=SLOTS, use_globals=True)
+        report = validate_assignment(csp, backtrack({}, csp), *self.dataset, slots=SLOTS, use_numpy=False)
+        self.assertTrue(report.valid, str(report))
+
+    def test_detects_every_violation(self):
+        entries = self.solution.entries
+        lab = next(key for key in entries if key[0] == "C102")
+        lectures = [key for key in entries if key[0] == "C101"]
+        other = next(key for key in entries if key[0] == "C201")
+
+        # both C101 sessions of L1/G1 in R2 (50 seats < 60 students) at the same slot
+        entries[lectures[0]] = ("R2", "I1", "SUN-10:45")
+        entries[lectures[1]] = ("R2", "I1", "SUN-10:45")
+        entries[lab] = ("R1", "I9", "FRI-8:00")
+        entries[other] = ("R2", "I3", "SUN-10:45")
+        del entries[next(key for key in entries if key[0] == "C102" and key != lab)]
+
+        report = validate(self.solution, *self.dataset, slots=SLOTS, use_numpy=False)
+        kinds = self.kinds(report)
+        for kind in ("room_clash", "instructor_clash", "student_clash", "room_capacity", "room_type",
+                     "unknown_slot", "unqualified_instructor", "missing_session"):
+            self.assertIn(kind, kinds)
+
+        room_clash = next(v for v in report.violations if v.kind == "room_clash")
+        self.assertEqual(room_clash.sessions, sorted(lectures + [other]))
+        self.assertEqual(kinds.count("student_clash"), 1)
+
+    @unittest.skipUnless(numpy, "numpy is not installed")
+    def test_numpy_matches_plain_python(self):
+        entries = self.solution.entries
+        keys = list(entries)
+        entries[keys[1]] = entries[keys[0]]
+        plain = validate(self.solution, *self.dataset, slots=SLOTS, use_numpy=False)
+        vectorized = validate(self.solution, *self.dataset, slots=SLOTS, use_numpy=True)
+        self.assertEqual([v.to_dict() for v in plain.violations], [v.to_dict() for v in vectorized.violations])
+
+
+class TestScenarios(unittest.TestCase):
+
+    def test_apply_scenario_copies_dataset(self):
+        dataset = make_dataset()
+        courses, levels, instructors, rooms = apply_scenario(dataset, {
+            "close_rooms": ["R1"], "add_sections": {"L1": 1}, "remove_instructors": ["I3"],
+        })
+
+        self.assertEqual({r.id for r in rooms}, {"R2", "R3", "LAB1"})
+        self.assertEqual(next(l for l in levels if l.id == "L1").sections, 3)
+        self.assertNotIn("I3", next(c for c in courses if c.code == "C102").course_instructors)
+        # the base data is untouched.
+        self.assertEqual(len(dataset[3]), 4)
+        self.assertEqual(dataset[1][0].sections, 2)
+
+    def test_fork_shares_the_base(self):
+        csp = build_csp(*make_dataset(), slots=SLOTS)
+        fork = csp.fork()
+        self.assertIs(fork.arc_constraints, csp.arc_constraints)
+
+        removed = fork.remove_values(lambda value: value[0] == "R1")
+        self.assertGreater(removed, 0)
+        self.assertTrue(all(value[0] != "R1" for values in fork.domains.values() for value in values))
+        self.assertTrue(any(value[0] == "R1" for values in csp.domains.values() for value in values))
+
+        domains = {name: list(values) for name, values in csp.domains.items()}
+        apply_ac3(fork)
+        assert_valid(self, fork, backtrack({}, fork))
+        # solving the fork writes into the fork only.
+        self.assertEqual({name: list(values) for name, values in csp.domains.items()}, domains)
+
+    def test_fork_matches_rebuild(self):
+        dataset = make_dataset()
+        base = ScenarioBase(dataset, slots=SLOTS)
+        scenario = {"close_rooms": ["R1"], "add_sections": {"L1": 1}, "remove_instructors": ["I3"]}
+        fork, _ = base.fork(scenario)
+        rebuilt = build_csp(*mapped_scenario(dataset, scenario), slots=SLOTS)
+
+        self.assertEqual({var.name for var in fork.variables}, {var.name for var in rebuilt.variables})
+        for var in rebuilt.variables:
+            self.assertEqual(set(fork.domains[var.name]), set(rebuilt.domains[var.name]))
+            arcs = {(other.name, fn) for other, fn in fork.constraints[var.name]}
+            self.assertLessEqual({(other.name, fn) for other, fn in rebuilt.constraints[var.name]}, arcs)
+
+        # the base keeps its two sections.
+        self.assertNotIn("C102_L1_S3_0", base.csp.domains)
+        self.assertIn("C102_L1_S3_0", fork.domains)
+
+        # one more section rebuilds the sections, the lectures of the level keep the domains of the base.
+        fork, _ = base.fork({"add_sections": {"L1": 1}})
+        self.assertIn("C102_L1_S3_0", fork.domains.local)
+        self.assertNotIn("C101_L1_G1_0", fork.domains.local)
+
+    def test_fork_with_global_constraints(self):
+        dataset = make_dataset()
+        base = ScenarioBase(dataset, slots=SLOTS, use_globals=True)
+        fork, _ = base.fork({"add_sections": {"L1": 1}})
+        labs = next(c for c in fork.global_constraints if c.name == "rooms_Lab")
+        self.assertEqual(len(labs.variables), 3)
+        self.assertEqual(len(next(c for c in base.csp.global_constraints if c.name == "rooms_Lab").variables), 2)
+        assert_valid(self, build_csp(*mapped_scenario(dataset, {"add_sections": {"L1": 1}}), slots=SLOTS),
+                     backtrack({}, fork))
+
+    def test_fork_of_shared_base(self):
+        dataset = make_dataset()
+        base = ScenarioBase(dataset, slots=SLOTS)
+        scenario = {"close_rooms": ["R3"], "add_sections": {"L1": 1}}
+        expected, _ = base.fork(scenario)
+        with SharedInstance(base.csp, SLOTS) as instance, attach(instance.name) as snapshot:
+            shared = ScenarioBase(dataset, slots=SLOTS, csp=shared_csp(snapshot))
+            self.assertIsNotNone(shared.csp.occupancy)
+            fork, _ = shared.fork(scenario)
+            self.assertEqual([var.name for var in fork.variables], [var.name for var in expected.variables])
+            for var in fork.variables:
+                self.assertEqual(list(fork.domains[var.name]), list(expected.domains[var.name]))
+                self.assertEqual([n.name for n in fork.neighbors(var)], [n.name for n in expected.neighbors(var)])
+            assert_valid(self, build_csp(*mapped_scenario(dataset, scenario), slots=SLOTS), backtrack({}, fork))
+            del shared, fork
+
+    def test_solve_scenario_on_worker_base(self):
+        import main
+
+        dataset = make_dataset()
+        with SharedInstance(ScenarioBase(dataset).csp) as instance:
+            main.init_worker(instance.name, dataset)
+            try:
+                result = main.solve_scenario("closed", {"close_rooms": ["R3"]}, 5, None, True)
+            finally:
+                main._scenario_base = None
+        self.assertEqual(result["status"], "solved")
+        self.assertTrue(all(room != "R3" for room, _, _ in result["assignment"].values()))
+
+
+if __name__ == '__main__':
+    unittest.main()